@@ -0,0 +1,21 @@
+-- ============================================
+-- AgenticOS - Account usage stats RPC
+-- Execute no Supabase SQL Editor
+-- ============================================
+
+-- Returns today / last-hour DM counts for many accounts in a single query.
+-- Used by AccountManager.get_tenant_accounts (POST /rest/v1/rpc/account_usage_stats).
+CREATE OR REPLACE FUNCTION account_usage_stats(usernames TEXT[])
+RETURNS TABLE(account_used TEXT, today BIGINT, last_hour BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        d.account_used::TEXT,
+        COUNT(*) FILTER (WHERE d.sent_at >= date_trunc('day', NOW())) AS today,
+        COUNT(*) FILTER (WHERE d.sent_at >= NOW() - INTERVAL '1 hour') AS last_hour
+    FROM agentic_instagram_dm_sent d
+    WHERE d.account_used = ANY(usernames)
+      AND d.sent_at >= LEAST(date_trunc('day', NOW()), NOW() - INTERVAL '1 hour')
+    GROUP BY d.account_used
+$$;
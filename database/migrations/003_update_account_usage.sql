@@ -0,0 +1,16 @@
+-- ============================================
+-- AgenticOS - Batched account usage updates
+-- Execute no Supabase SQL Editor
+-- ============================================
+
+-- Sets last_used_at for many accounts in a single UPDATE.
+-- Used by AccountManager.flush_usage (POST /rest/v1/rpc/update_account_usage).
+CREATE OR REPLACE FUNCTION update_account_usage(ids BIGINT[], used_at TIMESTAMPTZ[])
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    UPDATE instagram_accounts a
+    SET last_used_at = u.used_at
+    FROM unnest(ids, used_at) AS u(id, used_at)
+    WHERE a.id = u.id
+$$;
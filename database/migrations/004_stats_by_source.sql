@@ -0,0 +1,16 @@
+-- ============================================
+-- AgenticOS - Lead counts by source RPC
+-- Execute no Supabase SQL Editor
+-- ============================================
+
+-- Returns one row per lead source with its count, so /api/stats doesn't pull every lead.
+-- Used by GET /api/stats (POST /rest/v1/rpc/stats_by_source).
+CREATE OR REPLACE FUNCTION stats_by_source()
+RETURNS TABLE(source TEXT, count BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE(l.source, 'unknown')::TEXT, COUNT(*)
+    FROM agentic_instagram_leads l
+    GROUP BY 1
+$$;
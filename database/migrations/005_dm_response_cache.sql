@@ -0,0 +1,67 @@
+-- ============================================
+-- AgenticOS - Semantic cache de respostas sugeridas (DMs)
+-- Execute no Supabase SQL Editor
+-- ============================================
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- One row per generated suggested response, keyed by the embedding of the inbound DM.
+-- Scoped per tenant (each tenant has its own persona / offer); the lead's
+-- username and name are stored as placeholders, never the literal values.
+-- Used by implementation/semantic_cache.py (webhook_inbound_dm).
+CREATE TABLE IF NOT EXISTS dm_response_cache (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    message TEXT NOT NULL,
+    embedding vector(1536) NOT NULL,           -- OpenAI text-embedding-3-small
+    score_bucket SMALLINT NOT NULL,            -- floor(score / 20)
+    is_business BOOLEAN NOT NULL DEFAULT FALSE,
+    response TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Tables created before tenant scoping: drop the unscoped rows, they may carry another tenant's pitch
+ALTER TABLE dm_response_cache ADD COLUMN IF NOT EXISTS tenant_id TEXT;
+DELETE FROM dm_response_cache WHERE tenant_id IS NULL;
+ALTER TABLE dm_response_cache ALTER COLUMN tenant_id SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_dm_response_cache_embedding
+    ON dm_response_cache USING hnsw (embedding vector_cosine_ops);
+
+CREATE INDEX IF NOT EXISTS idx_dm_response_cache_tenant
+    ON dm_response_cache (tenant_id, score_bucket, is_business);
+
+-- Closest cached response for the same tenant / score bucket / business flag above the similarity threshold.
+-- Used by SemanticResponseCache.lookup (POST /rest/v1/rpc/match_dm_response).
+DROP FUNCTION IF EXISTS match_dm_response(vector, SMALLINT, BOOLEAN, FLOAT);
+
+CREATE OR REPLACE FUNCTION match_dm_response(
+    query_embedding vector(1536),
+    p_tenant_id TEXT,
+    p_score_bucket SMALLINT,
+    p_is_business BOOLEAN,
+    match_threshold FLOAT DEFAULT 0.92
+)
+RETURNS TABLE(id BIGINT, response TEXT, similarity FLOAT)
+LANGUAGE sql
+AS $$
+    WITH best AS (
+        SELECT c.id, c.response, 1 - (c.embedding <=> query_embedding) AS similarity
+        FROM dm_response_cache c
+        WHERE c.tenant_id = p_tenant_id
+          AND c.score_bucket = p_score_bucket
+          AND c.is_business = p_is_business
+        ORDER BY c.embedding <=> query_embedding
+        LIMIT 1
+    ), hit AS (
+        UPDATE dm_response_cache c
+        SET hits = c.hits + 1
+        FROM best
+        WHERE c.id = best.id AND best.similarity >= match_threshold
+        RETURNING c.id
+    )
+    SELECT best.id, best.response, best.similarity
+    FROM best
+    WHERE best.similarity >= match_threshold
+$$;
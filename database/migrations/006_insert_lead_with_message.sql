@@ -0,0 +1,53 @@
+-- ============================================
+-- AgenticOS - Lead + received message in one call
+-- Execute no Supabase SQL Editor
+-- ============================================
+
+-- Inserts a crm_leads row and its first inbound socialfy_messages row in one transaction
+-- (both or neither) and returns the new lead. Only the keys present in the JSON are
+-- inserted, so columns the caller leaves out keep their table defaults.
+-- Used by SocialfyAgentIntegration.save_discovered_lead_with_message
+-- (POST /rest/v1/rpc/insert_lead_with_message).
+CREATE OR REPLACE FUNCTION insert_lead_with_message(lead JSONB, message JSONB)
+RETURNS SETOF crm_leads
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    lead_cols TEXT;
+    message_cols TEXT;
+    new_lead crm_leads;
+BEGIN
+    -- Column lists from the JSON keys that are real columns (quoted, never raw input)
+    SELECT string_agg(quote_ident(a.attname), ', ')
+    INTO lead_cols
+    FROM pg_attribute a
+    WHERE a.attrelid = 'crm_leads'::regclass
+      AND a.attnum > 0 AND NOT a.attisdropped
+      AND lead ? a.attname;
+
+    IF lead_cols IS NULL THEN
+        RAISE EXCEPTION 'insert_lead_with_message: lead has no crm_leads columns';
+    END IF;
+
+    SELECT string_agg(quote_ident(a.attname), ', ')
+    INTO message_cols
+    FROM pg_attribute a
+    WHERE a.attrelid = 'socialfy_messages'::regclass
+      AND a.attnum > 0 AND NOT a.attisdropped
+      AND message ? a.attname
+      AND a.attname NOT IN ('lead_id', 'created_at');
+
+    EXECUTE format(
+        'INSERT INTO crm_leads (%1$s) SELECT %1$s FROM jsonb_populate_record(NULL::crm_leads, $1) RETURNING *',
+        lead_cols
+    ) INTO new_lead USING lead;
+
+    EXECUTE format(
+        'INSERT INTO socialfy_messages (lead_id, created_at%1$s) '
+        'SELECT $2, NOW()%1$s FROM jsonb_populate_record(NULL::socialfy_messages, $1)',
+        COALESCE(', ' || message_cols, '')
+    ) USING message, new_lead.id;
+
+    RETURN NEXT new_lead;
+END;
+$$;
@@ -0,0 +1,23 @@
+-- ============================================
+-- AgenticOS - Atomic daily stats increment
+-- Execute no Supabase SQL Editor
+-- ============================================
+
+-- Adds a run's sent/failed counts to the (date, account_used) row, creating it if needed,
+-- in one statement (relies on UNIQUE(date, account_used) from setup_supabase.py).
+-- Used by SupabaseDB.update_daily_stats (POST /rest/v1/rpc/increment_daily_stats).
+CREATE OR REPLACE FUNCTION increment_daily_stats(
+    p_date DATE,
+    p_account TEXT,
+    p_dms_sent INTEGER,
+    p_dms_failed INTEGER
+)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO agentic_instagram_daily_stats AS s (date, account_used, dms_sent, dms_failed)
+    VALUES (p_date, p_account, p_dms_sent, p_dms_failed)
+    ON CONFLICT (date, account_used) DO UPDATE
+    SET dms_sent = s.dms_sent + EXCLUDED.dms_sent,
+        dms_failed = s.dms_failed + EXCLUDED.dms_failed
+$$;
@@ -0,0 +1,18 @@
+-- ============================================
+-- AgenticOS - RAG knowledge counts by category RPC
+-- Execute no Supabase SQL Editor
+-- ============================================
+
+-- Returns one row per rag_knowledge category with its count (largest first),
+-- so the categories endpoint doesn't pull every knowledge row.
+-- Used by GET /webhook/rag-categories (POST /rest/v1/rpc/rag_category_counts).
+CREATE OR REPLACE FUNCTION rag_category_counts()
+RETURNS TABLE(category TEXT, count BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT k.category::TEXT, COUNT(*)
+    FROM rag_knowledge k
+    GROUP BY 1
+    ORDER BY 2 DESC
+$$;
@@ -4,6 +4,9 @@ Run this once to create the necessary tables
 """
 
 import os
+import threading
+from typing import Optional
+
 import requests
 from dotenv import load_dotenv
 
@@ -13,12 +16,31 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
+# Shared HTTP session (created on first use)
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
 
-def get_create_tables_sql():
+
+def get_supabase_session() -> requests.Session:
     """
-    SQL to create tables - Run this in Supabase SQL Editor
+    Return the shared Supabase REST session.
+    Built once and reused so repeated calls keep the same pooled connection.
     """
-    return """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers.update({
+                    "apikey": SUPABASE_KEY,
+                    "Authorization": f"Bearer {SUPABASE_KEY}",
+                })
+                _session = session
+    return _session
+
+
+# SQL to create tables - Run this in Supabase SQL Editor
+CREATE_TABLES_SQL = """
 -- ============================================
 -- AgenticOS - Instagram DM Agent Tables
 -- Run this in Supabase SQL Editor
@@ -28,7 +50,7 @@ def get_create_tables_sql():
 -- Table: agentic_instagram_leads
 -- Stores all leads to be contacted
 CREATE TABLE IF NOT EXISTS agentic_instagram_leads (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     username VARCHAR(255) NOT NULL UNIQUE,
     full_name VARCHAR(255),
     bio TEXT,
@@ -46,7 +68,7 @@ CREATE TABLE IF NOT EXISTS agentic_instagram_leads (
 -- Table: agentic_instagram_dm_sent
 -- Tracks all DMs sent
 CREATE TABLE IF NOT EXISTS agentic_instagram_dm_sent (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     lead_id BIGINT REFERENCES agentic_instagram_leads(id),
     username VARCHAR(255) NOT NULL,
     message_template VARCHAR(100),
@@ -60,7 +82,7 @@ CREATE TABLE IF NOT EXISTS agentic_instagram_dm_sent (
 -- Table: agentic_instagram_dm_runs
 -- Tracks each agent run session
 CREATE TABLE IF NOT EXISTS agentic_instagram_dm_runs (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     started_at TIMESTAMPTZ DEFAULT NOW(),
     ended_at TIMESTAMPTZ,
     total_leads INTEGER DEFAULT 0,
@@ -75,7 +97,7 @@ CREATE TABLE IF NOT EXISTS agentic_instagram_dm_runs (
 -- Table: agentic_instagram_daily_stats
 -- Daily aggregated stats
 CREATE TABLE IF NOT EXISTS agentic_instagram_daily_stats (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     date DATE NOT NULL,
     account_used VARCHAR(255) NOT NULL,
     dms_sent INTEGER DEFAULT 0,
@@ -90,7 +112,11 @@ CREATE INDEX IF NOT EXISTS idx_agentic_leads_username ON agentic_instagram_leads
 CREATE INDEX IF NOT EXISTS idx_agentic_leads_source ON agentic_instagram_leads(source);
 CREATE INDEX IF NOT EXISTS idx_agentic_dm_sent_username ON agentic_instagram_dm_sent(username);
 CREATE INDEX IF NOT EXISTS idx_agentic_dm_sent_date ON agentic_instagram_dm_sent(sent_at);
-CREATE INDEX IF NOT EXISTS idx_agentic_runs_status ON agentic_instagram_dm_runs(status);
+-- Per-account quota counts (account_used = X AND sent_at >= T)
+CREATE INDEX IF NOT EXISTS idx_dm_sent_account_sent_at ON agentic_instagram_dm_sent(account_used, sent_at DESC);
+-- Partial indexes on the hot (rare) status values instead of the whole low-cardinality column
+CREATE INDEX IF NOT EXISTS idx_agentic_dm_sent_not_sent ON agentic_instagram_dm_sent(sent_at DESC) WHERE status <> 'sent';
+CREATE INDEX IF NOT EXISTS idx_agentic_runs_running ON agentic_instagram_dm_runs(started_at DESC) WHERE status = 'running';
 CREATE INDEX IF NOT EXISTS idx_agentic_daily_stats_date ON agentic_instagram_daily_stats(date);
 
 -- Sample leads for testing
@@ -106,6 +132,13 @@ SELECT 'AgenticOS tables created successfully!' as status;
 """
 
 
+def get_create_tables_sql():
+    """
+    SQL to create tables - Run this in Supabase SQL Editor
+    """
+    return CREATE_TABLES_SQL
+
+
 def test_connection():
     """Test Supabase connection using REST API"""
     print("🔧 Testing Supabase connection...")
@@ -116,14 +149,8 @@ def test_connection():
         return False
 
     try:
-        headers = {
-            "apikey": SUPABASE_KEY,
-            "Authorization": f"Bearer {SUPABASE_KEY}",
-        }
-
-        response = requests.get(
+        response = get_supabase_session().get(
             f"{SUPABASE_URL}/rest/v1/agentic_instagram_leads?select=count",
-            headers=headers,
             timeout=10
         )
 
@@ -115,9 +115,8 @@ def test_connection():
         return False
 
 
-def get_create_tables_sql():
-    """Return SQL to create tables"""
-    return """
+# SQL to create tables - Run this in Supabase SQL Editor
+CREATE_TABLES_SQL = """
 -- ============================================
 -- AgenticOS - Instagram DM Agent Tables
 -- Copie e cole no Supabase SQL Editor
@@ -198,5 +197,10 @@ SELECT 'AgenticOS tables created successfully!' as status;
 """
 
 
+def get_create_tables_sql():
+    """Return SQL to create tables"""
+    return CREATE_TABLES_SQL
+
+
 if __name__ == "__main__":
     test_connection()
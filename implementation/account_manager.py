@@ -11,12 +11,16 @@ Each tenant can have multiple Instagram accounts with:
 """
 
 import os
+import atexit
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
+import httpx
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -36,10 +40,76 @@ except ImportError:
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
+# Fallback account config (read once at import)
+INSTAGRAM_USERNAME = os.getenv("INSTAGRAM_USERNAME")
+INSTAGRAM_SESSION_ID = os.getenv("INSTAGRAM_SESSION_ID")
+INSTAGRAM_DM_PER_DAY = int(os.getenv("INSTAGRAM_DM_PER_DAY", 200))
+INSTAGRAM_DM_PER_HOUR = int(os.getenv("INSTAGRAM_DM_PER_HOUR", 10))
+
+# Max parallel per-account stat queries when the usage RPC is unavailable
+STATS_FANOUT_WORKERS = 8
+
+# Seconds to buffer record_usage calls before writing them in one batch
+USAGE_FLUSH_INTERVAL = 5
+
+# Per-process cache of get_tenant_accounts results (shared by all AccountManager instances)
+ACCOUNTS_CACHE_TTL = 30  # seconds
+_accounts_cache: Dict[tuple, tuple] = {}
+_accounts_cache_lock = threading.Lock()
+
+
+def _get_cached_accounts(key: tuple) -> Optional[List["InstagramAccount"]]:
+    """Return cached accounts for key if still fresh"""
+    with _accounts_cache_lock:
+        entry = _accounts_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, accounts = entry
+        if expires_at < time.monotonic():
+            del _accounts_cache[key]
+            return None
+        return list(accounts)
+
+
+def _set_cached_accounts(key: tuple, accounts: List["InstagramAccount"]):
+    with _accounts_cache_lock:
+        _accounts_cache[key] = (time.monotonic() + ACCOUNTS_CACHE_TTL, list(accounts))
+
+
+# Pooled HTTP/2 client shared by all AccountManager instances (api_server
+# creates one manager per request, so the pool must outlive them)
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+
+
+def _get_http_client(base_url: str, headers: Dict[str, str]) -> httpx.Client:
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    base_url=base_url,
+                    headers=headers,
+                    timeout=30,
+                    http2=True,
+                    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+                )
+    return _http_client
+
+
+def invalidate_accounts_cache():
+    """Drop all cached tenant accounts (called after any account mutation)"""
+    with _accounts_cache_lock:
+        _accounts_cache.clear()
+
 
 @dataclass
 class InstagramAccount:
-    """Represents an Instagram account for a tenant"""
+    """
+    Represents an Instagram account for a tenant.
+    last_used_at_iso is the stored value (raw ISO text from Supabase, sorts
+    chronologically); last_used_at is the same value parsed to datetime on read.
+    """
     id: int
     tenant_id: str
     username: str
@@ -48,7 +118,6 @@ class InstagramAccount:
     status: str
     daily_limit: int
     hourly_limit: int
-    last_used_at: Optional[datetime]
     blocked_until: Optional[datetime]
     dms_sent_today: int = 0
     dms_sent_last_hour: int = 0
@@ -56,6 +125,13 @@ class InstagramAccount:
     warmup_stage: Optional[str] = None
     warmup_day: int = 0
     warmup_ready: bool = True  # Default True para contas sem warmup
+    # Raw ISO timestamp from Supabase; read last_used_at for a datetime
+    last_used_at_iso: Optional[str] = None
+
+    @property
+    def last_used_at(self) -> Optional[datetime]:
+        """last_used_at_iso parsed to datetime (None if never used)"""
+        return datetime.fromisoformat(self.last_used_at_iso) if self.last_used_at_iso else None
 
     @property
     def effective_daily_limit(self) -> int:
@@ -76,9 +152,13 @@ class InstagramAccount:
     @property
     def is_available(self) -> bool:
         """Check if account is available for use"""
+        return self.is_available_at(datetime.now())
+
+    def is_available_at(self, now: datetime) -> bool:
+        """Same as is_available, with a caller-supplied clock (compute once per batch)"""
         if self.status != 'active':
             return False
-        if self.blocked_until and self.blocked_until > datetime.now():
+        if self.blocked_until and self.blocked_until > now:
             return False
         if self.dms_sent_today >= self.effective_daily_limit:
             return False
@@ -124,91 +204,155 @@ class AccountManager:
             "Prefer": "return=representation"
         }
 
-    def _request(self, method: str, endpoint: str, params: dict = None, data: dict = None) -> Any:
-        """Make request to Supabase REST API"""
-        url = f"{self.base_url}/{endpoint}"
-        response = requests.request(
-            method=method,
-            url=url,
-            headers=self.headers,
+        self._client = _get_http_client(self.base_url, self.headers)
+
+        # Buffered last_used_at updates (account_id -> ISO timestamp)
+        self._pending_usage: Dict[int, str] = {}
+        self._usage_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+
+    def _request(self, method: str, endpoint: str, params: dict = None, data: dict = None,
+                 prefer: str = "return=representation") -> Any:
+        """
+        Make request to Supabase REST API.
+        Pass prefer="return=minimal" for writes whose result is not used.
+        """
+        response = self._client.request(
+            method,
+            endpoint,
             params=params,
             json=data,
-            timeout=30
+            headers={"Prefer": prefer} if prefer != "return=representation" else None
         )
         response.raise_for_status()
         return response.json() if response.text else []
 
-    def get_tenant_accounts(self, tenant_id: str) -> List[InstagramAccount]:
-        """Get all Instagram accounts for a tenant"""
-        try:
-            data = self._request("GET", "instagram_accounts", params={
-                "tenant_id": f"eq.{tenant_id}",
-                "select": "*"
-            })
-
-            accounts = []
-            for row in data:
-                # Get usage stats
-                stats = self._get_account_stats(row['username'])
+    def get_tenant_accounts(self, tenant_id: str, active_stats_only: bool = False) -> List[InstagramAccount]:
+        """
+        Get all Instagram accounts for a tenant.
 
-                # Get warmup status if available
-                warmup_stage = None
-                warmup_day = 0
-                warmup_ready = True
+        Args:
+            tenant_id: ID do tenant
+            active_stats_only: Se True, só busca contagem de DMs das contas ativas.
+                               Contas bloqueadas/inativas não podem ser usadas e ficam com 0.
+        """
+        cache_key = (tenant_id, active_stats_only)
+        cached = _get_cached_accounts(cache_key)
+        if cached is not None:
+            return cached
 
-                if WARMUP_AVAILABLE:
-                    try:
-                        warmup = WarmupManager()
-                        warmup_status = warmup.get_account_status(row['id'], row['username'])
-                        warmup_stage = warmup_status.stage.value
-                        warmup_day = warmup_status.current_day
-                        warmup_ready = warmup_status.is_ready
-                    except Exception as e:
-                        logger.warning(f"Erro ao buscar warmup para {row['username']}: {e}")
-
-                accounts.append(InstagramAccount(
-                    id=row['id'],
-                    tenant_id=row['tenant_id'],
-                    username=row['username'],
-                    session_id=row.get('session_id'),
-                    session_data=row.get('session_data'),
-                    status=row['status'],
-                    daily_limit=row.get('daily_limit', 50),
-                    hourly_limit=row.get('hourly_limit', 10),
-                    last_used_at=datetime.fromisoformat(row['last_used_at']) if row.get('last_used_at') else None,
-                    blocked_until=datetime.fromisoformat(row['blocked_until']) if row.get('blocked_until') else None,
-                    dms_sent_today=stats.get('today', 0),
-                    dms_sent_last_hour=stats.get('last_hour', 0),
-                    warmup_stage=warmup_stage,
-                    warmup_day=warmup_day,
-                    warmup_ready=warmup_ready
-                ))
-
-            return accounts
+        try:
+            accounts = list(self._iter_tenant_accounts(tenant_id, active_stats_only=active_stats_only))
         except Exception as e:
             logger.error(f"Error fetching tenant accounts: {e}")
             return []
 
+        _set_cached_accounts(cache_key, accounts)
+        return accounts
+
+    def _iter_tenant_accounts(self, tenant_id: str, active_stats_only: bool = False,
+                              active_only: bool = False) -> Iterator[InstagramAccount]:
+        """
+        Yield a tenant's accounts, least recently used first.
+        Each account (including its warmup lookup) is only built when consumed,
+        so callers can stop early.
+        """
+        params = {
+            "tenant_id": f"eq.{tenant_id}",
+            "select": "*",
+            "order": "last_used_at.asc.nullsfirst"
+        }
+        if active_only:
+            params["status"] = "eq.active"
+        data = self._request("GET", "instagram_accounts", params=params)
+
+        # Usage stats for every account in one round trip
+        usernames = [
+            row['username'] for row in data
+            if not active_stats_only or row.get('status') == 'active'
+        ]
+        usage = self._get_usage_stats(usernames)
+        windows = self._stats_windows()
+        if not usage and len(usernames) > 1:
+            # RPC unavailable: run the per-account counts concurrently
+            with ThreadPoolExecutor(max_workers=min(STATS_FANOUT_WORKERS, len(usernames))) as executor:
+                counts = executor.map(lambda username: self._get_account_stats(username, windows), usernames)
+                usage = dict(zip(usernames, counts))
+
+        for row in data:
+            # Get usage stats
+            stats = usage.get(row['username'])
+            if stats is None:
+                if row['username'] in usernames:
+                    stats = self._get_account_stats(row['username'], windows)
+                else:
+                    stats = {'today': 0, 'last_hour': 0}
+
+            # Get warmup status if available
+            warmup_stage = None
+            warmup_day = 0
+            warmup_ready = True
+
+            if WARMUP_AVAILABLE:
+                try:
+                    warmup = WarmupManager()
+                    warmup_status = warmup.get_account_status(row['id'], row['username'])
+                    warmup_stage = warmup_status.stage.value
+                    warmup_day = warmup_status.current_day
+                    warmup_ready = warmup_status.is_ready
+                except Exception as e:
+                    logger.warning(f"Erro ao buscar warmup para {row['username']}: {e}")
+
+            yield InstagramAccount(
+                id=row['id'],
+                tenant_id=row['tenant_id'],
+                username=row['username'],
+                session_id=row.get('session_id'),
+                session_data=row.get('session_data'),
+                status=row['status'],
+                daily_limit=row.get('daily_limit', 50),
+                hourly_limit=row.get('hourly_limit', 10),
+                last_used_at_iso=row.get('last_used_at'),
+                blocked_until=datetime.fromisoformat(row['blocked_until']) if row.get('blocked_until') else None,
+                dms_sent_today=stats.get('today', 0),
+                dms_sent_last_hour=stats.get('last_hour', 0),
+                warmup_stage=warmup_stage,
+                warmup_day=warmup_day,
+                warmup_ready=warmup_ready
+            )
+
     def get_available_account(self, tenant_id: str) -> Optional[InstagramAccount]:
         """
         Get the best available account for a tenant.
         Prioritizes accounts with:
         1. More remaining daily quota
         2. Least recently used
+
+        Accounts with different daily limits (or warmup caps) can have different
+        remaining quotas at 0 sent, so every available account is compared.
         """
-        accounts = self.get_tenant_accounts(tenant_id)
+        # ISO 8601 strings from Supabase sort chronologically, so no parsing needed
+        def priority(a: InstagramAccount):
+            return (-a.remaining_today, a.last_used_at_iso or '')
 
-        # Filter available accounts
-        available = [a for a in accounts if a.is_available]
+        best_account = None
+        try:
+            now = datetime.now()
+            accounts = _get_cached_accounts((tenant_id, True))
+            if accounts is None:
+                accounts = self._iter_tenant_accounts(tenant_id, active_stats_only=True, active_only=True)
+            for account in accounts:
+                if not account.is_available_at(now):
+                    continue
+                if best_account is None or priority(account) < priority(best_account):
+                    best_account = account
+        except Exception as e:
+            logger.error(f"Error fetching tenant accounts: {e}")
 
-        if not available:
+        if not best_account:
             logger.warning(f"No available accounts for tenant {tenant_id}")
             return None
 
-        # Sort by remaining quota (desc) then by last_used (asc)
-        available.sort(key=lambda a: (-a.remaining_today, a.last_used_at or datetime.min))
-
-        best_account = available[0]
         logger.info(f"Selected account @{best_account.username} for tenant {tenant_id} "
                    f"(remaining: {best_account.remaining_today} today, {best_account.remaining_this_hour} this hour)")
 
@@ -238,7 +382,7 @@ class AccountManager:
                 status=row['status'],
                 daily_limit=row.get('daily_limit', 50),
                 hourly_limit=row.get('hourly_limit', 10),
-                last_used_at=datetime.fromisoformat(row['last_used_at']) if row.get('last_used_at') else None,
+                last_used_at_iso=row.get('last_used_at'),
                 blocked_until=datetime.fromisoformat(row['blocked_until']) if row.get('blocked_until') else None,
                 dms_sent_today=stats.get('today', 0),
                 dms_sent_last_hour=stats.get('last_hour', 0)
@@ -247,32 +391,63 @@ class AccountManager:
             logger.error(f"Error fetching account: {e}")
             return None
 
-    def _get_account_stats(self, username: str) -> Dict[str, int]:
-        """Get DM stats for an account"""
+    def _get_usage_stats(self, usernames: List[str]) -> Dict[str, Dict[str, int]]:
+        """
+        Get DM stats for several accounts with the account_usage_stats RPC.
+        Accounts without DMs in the window get zero counts. Returns an empty
+        dict if the RPC is unavailable so callers fall back to per-account queries.
+        """
+        if not usernames:
+            return {}
         try:
+            rows = self._request("POST", "rpc/account_usage_stats", data={"usernames": usernames})
+            stats = {username: {'today': 0, 'last_hour': 0} for username in usernames}
+            for row in rows:
+                stats[row['account_used']] = {
+                    'today': int(row.get('today') or 0),
+                    'last_hour': int(row.get('last_hour') or 0)
+                }
+            return stats
+        except Exception as e:
+            logger.warning(f"account_usage_stats RPC indisponível, usando contagem por conta: {e}")
+            return {}
+
+    @staticmethod
+    def _stats_windows() -> tuple:
+        """PostgREST sent_at filters for today and the last hour, computed once per batch"""
+        now = datetime.now()
+        today_gte = f"gte.{now.date().isoformat()}T00:00:00"
+        hour_gte = f"gte.{(now - timedelta(hours=1)).isoformat()}"
+        return today_gte, hour_gte
+
+    def _get_account_stats(self, username: str, windows: tuple = None) -> Dict[str, int]:
+        """
+        Get DM stats for an account (HEAD + count=exact, no response body).
+        windows: precomputed (today_gte, hour_gte) from _stats_windows when looping over accounts.
+        """
+        try:
+            today_gte, hour_gte = windows or self._stats_windows()
+            account_filter = f"eq.{username}"
+
             # Today's count
-            today = datetime.now().date().isoformat()
-            today_response = requests.get(
-                f"{self.base_url}/agentic_instagram_dm_sent",
-                headers={**self.headers, "Prefer": "count=exact"},
+            today_response = self._client.head(
+                "agentic_instagram_dm_sent",
+                headers={"Prefer": "count=exact"},
                 params={
-                    "select": "*",
-                    "account_used": f"eq.{username}",
-                    "sent_at": f"gte.{today}T00:00:00"
+                    "account_used": account_filter,
+                    "sent_at": today_gte
                 },
                 timeout=10
             )
             today_count = int(today_response.headers.get('content-range', '*/0').split('/')[-1])
 
             # Last hour count
-            one_hour_ago = (datetime.now() - timedelta(hours=1)).isoformat()
-            hour_response = requests.get(
-                f"{self.base_url}/agentic_instagram_dm_sent",
-                headers={**self.headers, "Prefer": "count=exact"},
+            hour_response = self._client.head(
+                "agentic_instagram_dm_sent",
+                headers={"Prefer": "count=exact"},
                 params={
-                    "select": "*",
-                    "account_used": f"eq.{username}",
-                    "sent_at": f"gte.{one_hour_ago}"
+                    "account_used": account_filter,
+                    "sent_at": hour_gte
                 },
                 timeout=10
             )
@@ -284,14 +459,49 @@ class AccountManager:
             return {'today': 0, 'last_hour': 0}
 
     def record_usage(self, account_id: int):
-        """Record that account was used"""
+        """
+        Record that account was used.
+        Writes are buffered and flushed in one batch every USAGE_FLUSH_INTERVAL
+        seconds (and at interpreter exit), instead of one PATCH per DM.
+        """
+        invalidate_accounts_cache()
+        with self._usage_lock:
+            self._pending_usage[account_id] = datetime.now().isoformat()
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(USAGE_FLUSH_INTERVAL, self.flush_usage)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+                atexit.register(self.flush_usage)
+
+    def flush_usage(self):
+        """Write all buffered last_used_at updates to Supabase"""
+        with self._usage_lock:
+            pending, self._pending_usage = self._pending_usage, {}
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+                atexit.unregister(self.flush_usage)
+
+        if not pending:
+            return
+
         try:
-            self._request("PATCH", "instagram_accounts",
-                params={"id": f"eq.{account_id}"},
-                data={"last_used_at": datetime.now().isoformat()}
-            )
+            self._request("POST", "rpc/update_account_usage", data={
+                "ids": list(pending.keys()),
+                "used_at": list(pending.values())
+            })
         except Exception as e:
-            logger.error(f"Error recording usage: {e}")
+            logger.warning(f"update_account_usage RPC indisponível, atualizando conta a conta: {e}")
+            for account_id, used_at in pending.items():
+                try:
+                    self._request("PATCH", "instagram_accounts",
+                        params={"id": f"eq.{account_id}"},
+                        data={"last_used_at": used_at},
+                        prefer="return=minimal"
+                    )
+                except Exception as patch_error:
+                    logger.error(f"Error recording usage: {patch_error}")
+        invalidate_accounts_cache()
 
     def mark_blocked(self, account_id: int, hours: int = 24, reason: str = None, block_type: str = "unknown"):
         """Mark account as temporarily blocked"""
@@ -303,8 +513,10 @@ class AccountManager:
                     "status": "blocked",
                     "blocked_until": blocked_until.isoformat(),
                     "notes": f"Blocked: {reason}" if reason else None
-                }
+                },
+                prefer="return=minimal"
             )
+            invalidate_accounts_cache()
             logger.warning(f"Account {account_id} blocked until {blocked_until}")
 
             # Notificar WarmupManager sobre o bloqueio
@@ -326,8 +538,10 @@ class AccountManager:
                 data={
                     "status": "active",
                     "blocked_until": None
-                }
+                },
+                prefer="return=minimal"
             )
+            invalidate_accounts_cache()
             logger.info(f"Account {account_id} unblocked")
         except Exception as e:
             logger.error(f"Error unblocking account: {e}")
@@ -341,8 +555,10 @@ class AccountManager:
 
             self._request("PATCH", "instagram_accounts",
                 params={"id": f"eq.{account_id}"},
-                data=data
+                data=data,
+                prefer="return=minimal"
             )
+            invalidate_accounts_cache()
             logger.info(f"Session updated for account {account_id}")
         except Exception as e:
             logger.error(f"Error updating session: {e}")
@@ -382,6 +598,7 @@ class AccountManager:
                 "hourly_limit": hourly_limit
             })
 
+            invalidate_accounts_cache()
             if result:
                 account_id = result[0]['id']
                 logger.info(f"Created account @{username} for tenant {tenant_id}")
@@ -410,8 +627,10 @@ class AccountManager:
         """Delete an Instagram account"""
         try:
             self._request("DELETE", "instagram_accounts",
-                params={"id": f"eq.{account_id}"}
+                params={"id": f"eq.{account_id}"},
+                prefer="return=minimal"
             )
+            invalidate_accounts_cache()
             logger.info(f"Deleted account {account_id}")
         except Exception as e:
             logger.error(f"Error deleting account: {e}")
@@ -420,14 +639,18 @@ class AccountManager:
         """Get aggregated stats for a tenant"""
         accounts = self.get_tenant_accounts(tenant_id)
 
+        # Availability computed once per account with a single clock read
+        now = datetime.now()
+        availability = [a.is_available_at(now) for a in accounts]
+
         total_accounts = len(accounts)
         active_accounts = len([a for a in accounts if a.status == 'active'])
-        available_accounts = len([a for a in accounts if a.is_available])
+        available_accounts = sum(availability)
 
         # Usar limites efetivos (considerando warmup)
         total_daily_capacity = sum(a.effective_daily_limit for a in accounts if a.status == 'active')
         total_sent_today = sum(a.dms_sent_today for a in accounts)
-        total_remaining_today = sum(a.remaining_today for a in accounts if a.is_available)
+        total_remaining_today = sum(a.remaining_today for a, ok in zip(accounts, availability) if ok)
 
         # Contagem por estágio de warmup
         warmup_stats = {"new": 0, "warming": 0, "progressing": 0, "ready": 0}
@@ -450,7 +673,7 @@ class AccountManager:
                 {
                     "username": a.username,
                     "status": a.status,
-                    "is_available": a.is_available,
+                    "is_available": ok,
                     "remaining_today": a.remaining_today,
                     "remaining_this_hour": a.remaining_this_hour,
                     "warmup_stage": a.warmup_stage,
@@ -458,7 +681,7 @@ class AccountManager:
                     "warmup_ready": a.warmup_ready,
                     "effective_limit": a.effective_daily_limit
                 }
-                for a in accounts
+                for a, ok in zip(accounts, availability)
             ]
         }
 
@@ -498,8 +721,9 @@ class RoundRobinAccountRotator:
 
     def _refresh_accounts(self):
         """Atualiza lista de contas disponíveis"""
-        all_accounts = self.manager.get_tenant_accounts(self.tenant_id)
-        self.accounts = [a for a in all_accounts if a.is_available]
+        all_accounts = self.manager.get_tenant_accounts(self.tenant_id, active_stats_only=True)
+        now = datetime.now()
+        self.accounts = [a for a in all_accounts if a.is_available_at(now)]
 
         if not self.accounts:
             logger.warning(f"⚠️ Nenhuma conta disponível para tenant {self.tenant_id}")
@@ -584,8 +808,8 @@ def get_default_account() -> Optional[InstagramAccount]:
     Get default account from environment variables.
     Used when tenant doesn't have accounts configured.
     """
-    username = os.getenv("INSTAGRAM_USERNAME")
-    session_id = os.getenv("INSTAGRAM_SESSION_ID")
+    username = INSTAGRAM_USERNAME
+    session_id = INSTAGRAM_SESSION_ID
 
     if not username:
         logger.warning("No INSTAGRAM_USERNAME configured and no tenant account found")
@@ -598,8 +822,7 @@ def get_default_account() -> Optional[InstagramAccount]:
         session_id=session_id,
         session_data=None,
         status="active",
-        daily_limit=int(os.getenv("INSTAGRAM_DM_PER_DAY", 200)),
-        hourly_limit=int(os.getenv("INSTAGRAM_DM_PER_HOUR", 10)),
-        last_used_at=None,
+        daily_limit=INSTAGRAM_DM_PER_DAY,
+        hourly_limit=INSTAGRAM_DM_PER_HOUR,
         blocked_until=None
     )
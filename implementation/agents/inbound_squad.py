@@ -13,6 +13,7 @@ Agents:
 import os
 import sys
 import json
+import time
 import asyncio
 from typing import Any, Dict, List, Optional
 from datetime import datetime
@@ -31,6 +32,13 @@ import requests
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
+# (tenant_id, username) -> is known contact; unknown senders dominate, so "False" is cached too
+# Same env var and defaults as api_server: known contacts cached 10 min, "not known"
+# only 30s so a contact added to the whitelist shows up quickly
+KNOWN_CONTACT_CACHE_TTL = int(os.getenv("KNOWN_CONTACT_CACHE_TTL", "600"))
+KNOWN_CONTACT_NEGATIVE_TTL = 30
+KNOWN_CONTACT_CACHE_SIZE = 50_000
+
 
 class SupabaseClient:
     """Simple Supabase REST API client"""
@@ -43,28 +51,47 @@ class SupabaseClient:
             "Content-Type": "application/json",
             "Prefer": "return=representation"
         }
+        # Keep-alive session with the base headers set once; calls pass only deltas
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self._known_cache: Dict[tuple, tuple] = {}
 
     def is_known_contact(self, tenant_id: str, username: str) -> bool:
-        """Check if username is in whitelist"""
+        """Check if username is in whitelist (cached; failed lookups are not cached)"""
+        key = (tenant_id, username)
+        entry = self._known_cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
         try:
-            response = requests.get(
+            # HEAD + count=exact: só o header Content-Range ("0-0/N" ou "*/0"), sem corpo
+            response = self.session.head(
                 f"{self.base_url}/tenant_known_contacts",
-                headers=self.headers,
+                headers={"Prefer": "count=exact", "Range-Unit": "items", "Range": "0-0"},
                 params={
                     "tenant_id": f"eq.{tenant_id}",
                     "username": f"eq.{username}"
                 }
             )
-            return len(response.json()) > 0
+            if not response.ok:
+                return False
+            content_range = response.headers.get("Content-Range", "*/0")
+            is_known = int(content_range.rsplit("/", 1)[-1]) > 0
         except:
+            # Errors are not cached
             return False
 
+        if key not in self._known_cache and len(self._known_cache) >= KNOWN_CONTACT_CACHE_SIZE:
+            self._known_cache.pop(next(iter(self._known_cache)))
+        ttl = KNOWN_CONTACT_CACHE_TTL if is_known else KNOWN_CONTACT_NEGATIVE_TTL
+        self._known_cache[key] = (time.monotonic() + ttl, is_known)
+        return is_known
+
     def get_active_persona(self, tenant_id: str) -> Optional[Dict]:
         """Get active persona for tenant"""
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/tenant_personas",
-                headers=self.headers,
                 params={
                     "tenant_id": f"eq.{tenant_id}",
                     "is_active": "eq.true"
@@ -78,9 +105,8 @@ class SupabaseClient:
     def save_classified_lead(self, data: Dict) -> bool:
         """Save classified lead"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/classified_leads",
-                headers=self.headers,
                 json=data
             )
             response.raise_for_status()
@@ -25,22 +25,32 @@ Usage:
 """
 
 import os
+import re
 import sys
 import json
 import asyncio
 import logging
+import uuid
+import random
+import functools
+import hmac
+import hashlib
+from urllib.parse import urlsplit
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Set, Hashable
 from contextlib import asynccontextmanager
+from types import MappingProxyType
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Header, Request
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Header, Request, Response
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 import uvicorn
 from dotenv import load_dotenv
-import requests
+import httpx
+import orjson
 import time
 from collections import defaultdict
 import psutil
@@ -48,6 +58,11 @@ import psutil
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
+from instagram_api_scraper import InstagramAPIScraper
+from semantic_cache import SemanticResponseCache, depersonalize, personalize
+from scrape_jobs import SCRAPE_JOBS, scrape_job_id
+from supabase_integration import get_integration
+
 # Load .env but don't override existing env vars (Railway sets them)
 load_dotenv(override=False)
 
@@ -65,11 +80,84 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 API_SECRET_KEY = os.getenv("API_SECRET_KEY", "socialfy-secret-2024")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Semantic cache of suggested DM responses (needs OPENAI_API_KEY for embeddings; 0 disables)
+DM_RESPONSE_CACHE_THRESHOLD = float(os.getenv("DM_RESPONSE_CACHE_THRESHOLD", "0.92"))
+GHL_API_KEY = os.getenv("GHL_API_KEY") or os.getenv("GHL_ACCESS_TOKEN")
+CRON_SECRET = os.getenv("CRON_SECRET", "")
+# Redis for the scrape job queue (arq). Unset = scrapes run in-process as background tasks
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Inbound-DM callback_url mode: hosts allowed as callback targets (comma-separated, required
+# for callback mode) and the secret used to sign the callback body (X-Signature, HMAC-SHA256)
+INBOUND_DM_CALLBACK_HOSTS = frozenset(
+    host.strip().lower() for host in os.getenv("INBOUND_DM_CALLBACK_HOSTS", "").split(",") if host.strip()
+)
+INBOUND_DM_CALLBACK_SECRET = os.getenv("INBOUND_DM_CALLBACK_SECRET") or API_SECRET_KEY
+INBOUND_DM_CALLBACK_RETRIES = 4
 
 # Rate Limiting Configuration
 RATE_LIMIT_REQUESTS = int(os.getenv("RATE_LIMIT_REQUESTS", "60"))  # requests per window
 RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", "60"))  # window in seconds
 
+# Tenant/persona lookup cache (seconds). Misses are kept for a shorter time.
+TENANT_CACHE_TTL = int(os.getenv("TENANT_CACHE_TTL", "300"))
+TENANT_CACHE_NEGATIVE_TTL = 30
+# Known-contact (whitelist) cache; "not known" uses TENANT_CACHE_NEGATIVE_TTL so new contacts show up quickly
+KNOWN_CONTACT_CACHE_TTL = int(os.getenv("KNOWN_CONTACT_CACHE_TTL", "600"))
+KNOWN_CONTACT_CACHE_SIZE = 50_000
+# Whole whitelist per tenant, so most DMs check a set instead of querying. Whitelists with
+# KNOWN_CONTACT_SET_MAX+ rows (or capped by PostgREST max-rows) use per-username lookups
+KNOWN_CONTACT_SET_TTL = int(os.getenv("KNOWN_CONTACT_SET_TTL", "60"))
+KNOWN_CONTACT_SET_MAX = 1000
+
+# Instagram profiles scraped via the API scraper; concurrent requests for the same @ share one scrape
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "300"))
+PROFILE_CACHE_SIZE = 10_000
+
+# Browser contexts for scraping / DM endpoints: MIN warmed at startup, more opened
+# on demand (and kept) up to SIZE
+BROWSER_CONTEXT_POOL_SIZE = int(os.getenv("BROWSER_CONTEXT_POOL_SIZE", "10"))
+BROWSER_CONTEXT_POOL_MIN = int(os.getenv("BROWSER_CONTEXT_POOL_MIN", "1"))
+# Opt-in: local CDP port of the shared Chromium, only for running the arq scrape
+# worker on the same host (its BROWSER_CDP_URL=http://127.0.0.1:<port>). Off by
+# default: the debugging port gives full control of the logged-in browser.
+BROWSER_CDP_PORT = int(os.getenv("BROWSER_CDP_PORT", "0"))
+
+# Max Supabase requests in flight per process (HTTP/2 multiplexes them, so the pool alone doesn't cap them)
+SUPABASE_MAX_CONCURRENCY = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "20"))
+
+# Parallel profile fetches in /webhook/scrape-batch. The batch shares one sessionid, so request
+# starts stay BATCH_SCRAPE_INTERVAL seconds apart across all workers (Instagram blocks bursts);
+# concurrency only overlaps slow responses, it doesn't raise the request rate
+BATCH_SCRAPE_CONCURRENCY = int(os.getenv("BATCH_SCRAPE_CONCURRENCY", "3"))
+BATCH_SCRAPE_INTERVAL = 1.5
+# Rows per bulk POST when saving scraped leads (followers / hashtag / batch scrape)
+SCRAPED_LEADS_INSERT_CHUNK = 100
+
+# Max Gemini calls in flight per process; 429 (quota) answers are retried with backoff
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_MAX_RETRIES = 3
+# Per-attempt bound on a Gemini call (seconds), so a stuck request can't hold a slot
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "20"))
+# Streamed replies (/webhook/suggest-response/stream) have their own slots, so slow
+# clients can't starve webhook calls, and a whole-stream deadline (seconds)
+GEMINI_STREAM_MAX_CONCURRENCY = int(os.getenv("GEMINI_STREAM_MAX_CONCURRENCY", "4"))
+GEMINI_STREAM_TIMEOUT = float(os.getenv("GEMINI_STREAM_TIMEOUT", "60"))
+
+# n8n new_message events are classified together: up to N messages or after the window (seconds)
+CLASSIFY_BATCH_SIZE = int(os.getenv("CLASSIFY_BATCH_SIZE", "16"))
+CLASSIFY_BATCH_WINDOW = float(os.getenv("CLASSIFY_BATCH_WINDOW", "0.25"))
+# Messages waiting for a batch; when full, new events wait for room (backpressure)
+CLASSIFY_QUEUE_MAX = int(os.getenv("CLASSIFY_QUEUE_MAX", "1000"))
+# Shutdown: max seconds to classify what is still queued / in flight
+CLASSIFY_SHUTDOWN_TIMEOUT = 30
+
+# Fire-and-forget single-row inserts (classified leads, DM log) are flushed together:
+# up to N rows or after the window (seconds)
+DB_WRITE_BATCH_SIZE = 100
+DB_WRITE_BATCH_WINDOW = float(os.getenv("DB_WRITE_BATCH_WINDOW", "0.2"))
+
 # Server start time for uptime tracking
 SERVER_START_TIME = time.time()
 
@@ -83,6 +171,21 @@ request_metrics = {
     "last_request_time": None
 }
 
+# (epoch second, ISO string) of the last now_iso() call
+_now_iso_cache = (0, "")
+
+
+def now_iso() -> str:
+    """
+    Current local time as ISO string (second precision), formatted at most once per second.
+    For response stamps and metrics; values written to the database keep datetime.now().
+    """
+    global _now_iso_cache
+    second = int(time.time())
+    if second != _now_iso_cache[0]:
+        _now_iso_cache = (second, datetime.fromtimestamp(second).isoformat())
+    return _now_iso_cache[1]
+
 
 # ============================================
 # RATE LIMITER
@@ -282,6 +385,15 @@ class InboundDMRequest(BaseModel):
     username: str
     message: str
     tenant_id: Optional[str] = None
+    # Set -> answered 202 right away; the full InboundDMResponse is POSTed here when ready
+    callback_url: Optional[str] = None
+
+class SuggestResponseRequest(BaseModel):
+    username: str
+    message: str
+    profile: Optional[Dict[str, Any]] = None  # "profile" returned by /webhook/inbound-dm
+    score: int = 0
+    classification: str = "LEAD_COLD"
 
 class InboundDMResponse(BaseModel):
     success: bool
@@ -292,6 +404,7 @@ class InboundDMResponse(BaseModel):
     suggested_response: Optional[str] = None
     profile: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    dm_id: Optional[str] = None  # only in callback_url mode (ack + callback payload)
 
 class ScrapePostLikersRequest(BaseModel):
     post_url: str
@@ -301,6 +414,7 @@ class ScrapePostLikersRequest(BaseModel):
 
 class ScrapePostLikersResponse(BaseModel):
     success: bool
+    status: str = "started"  # or "already_queued" (same post already being scraped)
     total_scraped: int = 0
     leads_saved: int = 0
     post_url: str
@@ -361,9 +475,129 @@ class RAGCategoriesResponse(BaseModel):
 # SUPABASE CLIENT
 # ============================================
 
+_UUID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.IGNORECASE)
+
+
+def _is_uuid(value: str) -> bool:
+    """True se value for um UUID (id de tenant) e não um slug"""
+    # Regex em vez de uuid.UUID(): slugs (o caso comum) não pagam o custo de uma exceção
+    return _UUID_RE.fullmatch(str(value)) is not None
+
+
+def _eq(value: str) -> str:
+    """PostgREST equality filter value"""
+    return "eq." + value
+
+
+_CACHE_MISS = object()
+
+
+class _TTLCache:
+    """
+    Small in-memory TTL cache for the event loop (no awaits inside, so no lock).
+    None/False values are cached with negative_ttl so unknown keys are re-checked sooner.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, tuple] = {}
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return _CACHE_MISS
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            self._data.pop(key, None)
+            return _CACHE_MISS
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        if key not in self._data and len(self._data) >= self.maxsize:
+            # Evict the oldest entry
+            self._data.pop(next(iter(self._data)))
+        ttl = self.negative_ttl if value is None or value is False else self.ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    def pop(self, key: Hashable) -> Any:
+        entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+
+class _BoundedTransport(httpx.AsyncBaseTransport):
+    """
+    Transport wrapper that caps requests in flight with a semaphore, so
+    gather()-ed bulk inserts and DM bursts queue locally instead of tripping
+    Supabase's rate limits (503/429). The slot is held until the response
+    headers arrive; PostgREST bodies are small and read right after.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limit: int):
+        self._transport = transport
+        self._sem = asyncio.Semaphore(limit)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        async with self._sem:
+            return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+async def single_flight(inflight: Dict[Hashable, asyncio.Future], key: Hashable, fetch) -> Any:
+    """Run fetch() once per key; concurrent callers await the same in-flight task"""
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch())
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+    # shield: a cancelled caller must not cancel the work the others are waiting on
+    return await asyncio.shield(task)
+
+
+def _supabase_call(action: str, default: Any = None):
+    """
+    Error boundary for SupabaseClient methods: any exception is logged once
+    (lazy %-formatting) and the method returns its documented default.
+    A callable default (ex: set) is called to build a fresh value.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                logger.error("Error %s: %s", action, e)
+                return default() if callable(default) else default
+        return wrapper
+    return decorator
+
+
+def rpc_missing(response: httpx.Response) -> bool:
+    """
+    True when PostgREST answered that the called function doesn't exist
+    (404 / PGRST202: its migration wasn't run), so callers can fall back
+    to the query the RPC replaced.
+    """
+    return response.status_code == 404 or (
+        response.status_code >= 400 and b"PGRST202" in response.content
+    )
+
+
 class SupabaseClient:
     """Simple Supabase REST API client"""
 
+    # PostgREST paths (relative to the client's base_url)
+    _TENANTS = "/tenants"
+    _PERSONAS = "/tenant_personas"
+    _KNOWN_CONTACTS = "/tenant_known_contacts"
+    _LEADS = "/agentic_instagram_leads"
+    _CLASSIFIED_LEADS = "/classified_leads"
+    _DM_SENT = "/agentic_instagram_dm_sent"
+    _GROWTH_LEADS = "/growth_leads"
+
     def __init__(self):
         self.base_url = f"{SUPABASE_URL}/rest/v1"
         self.headers = {
@@ -372,205 +606,375 @@ class SupabaseClient:
             "Content-Type": "application/json",
             "Prefer": "return=representation"
         }
-
-    def get_tenant(self, tenant_id: str) -> Optional[Dict]:
-        """Get tenant by ID or slug"""
-        try:
-            # Try by UUID first
-            response = requests.get(
-                f"{self.base_url}/tenants",
-                headers=self.headers,
-                params={"id": f"eq.{tenant_id}"}
+        # Cliente async (HTTP/2) com pool keep-alive, usado pelos métodos abaixo e pelos endpoints
+        self.client: Optional[httpx.AsyncClient] = None
+        self._open_client()
+
+        # Tenants e personas mudam pouco: cache por tenant_id (UUID ou slug)
+        self._tenant_cache = _TTLCache(TENANT_CACHE_TTL, TENANT_CACHE_NEGATIVE_TTL)
+        self._persona_cache = _TTLCache(TENANT_CACHE_TTL, TENANT_CACHE_NEGATIVE_TTL)
+        # tenant_id -> frozenset of usernames, or None when the whitelist is too big to hold
+        self._known_set_cache = _TTLCache(KNOWN_CONTACT_SET_TTL, KNOWN_CONTACT_SET_TTL)
+        # (tenant_id, username) -> bool
+        self._known_contact_cache = _TTLCache(
+            KNOWN_CONTACT_CACHE_TTL, TENANT_CACHE_NEGATIVE_TTL, maxsize=KNOWN_CONTACT_CACHE_SIZE
+        )
+        # Lookups in flight, so concurrent cache misses for the same key share one request
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def _open_client(self):
+        if self.client is None or self.client.is_closed:
+            # Every db.client call (methods below and endpoints) goes through the concurrency cap
+            transport = _BoundedTransport(
+                httpx.AsyncHTTPTransport(
+                    http2=True,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+                ),
+                SUPABASE_MAX_CONCURRENCY
             )
-            if response.status_code == 200:
-                data = response.json()
-                if data:
-                    return data[0]
-
-            # Fallback to slug
-            response = requests.get(
-                f"{self.base_url}/tenants",
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
                 headers=self.headers,
-                params={"slug": f"eq.{tenant_id}"}
+                transport=transport,
+                timeout=10
             )
-            if response.status_code == 200:
-                data = response.json()
-                return data[0] if data else None
-            return None
-        except Exception as e:
-            logger.error(f"Error fetching tenant: {e}")
-            return None
 
-    def resolve_tenant_id(self, tenant_id: str, auto_create: bool = True) -> Optional[str]:
+    async def start(self):
+        """Open the async HTTP client (lifespan startup)"""
+        self._open_client()
+
+    async def close(self):
+        """Close the async client"""
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def _single_flight(self, key: Hashable, fetch) -> Any:
+        """Run fetch() once per key; concurrent callers await the same in-flight request"""
+        return await single_flight(self._inflight, key, fetch)
+
+    def _remember_tenant(self, tenant_id: str, tenant: Optional[Dict]):
+        """Cache a tenant under the key used to look it up and under its id/slug"""
+        self._tenant_cache.set(tenant_id, tenant)
+        if tenant:
+            for key in (tenant.get("id"), tenant.get("slug")):
+                if key and key != tenant_id:
+                    self._tenant_cache.set(key, tenant)
+
+    def invalidate_tenant(self, tenant_id: str):
+        """Drop cached tenant/persona data (call after any tenant mutation)"""
+        tenant = self._tenant_cache.pop(tenant_id)
+        keys = {tenant_id}
+        if tenant:
+            keys.update(k for k in (tenant.get("id"), tenant.get("slug")) if k)
+        for key in keys:
+            self._tenant_cache.pop(key)
+            self._persona_cache.pop(key)
+            self._known_set_cache.pop(key)
+
+    @_supabase_call("fetching tenant")
+    async def get_tenant(self, tenant_id: str) -> Optional[Dict]:
+        """Get tenant by ID or slug"""
+        cached = self._tenant_cache.get(tenant_id)
+        if cached is not _CACHE_MISS:
+            return cached
+
+        # UUID -> id or (rare) UUID-shaped slug in one query; anything else can only be a slug.
+        # Never send a non-UUID to id.eq. (PostgREST answers 400 on a malformed uuid)
+        if _is_uuid(tenant_id):
+            params = {"or": f"(id.eq.{tenant_id},slug.eq.{tenant_id})", "limit": "2"}
+        else:
+            params = {"slug": _eq(tenant_id), "limit": "1"}
+
+        response = await self.client.get(self._TENANTS, params=params)
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            # id match wins over a slug that happens to look like a UUID
+            tenant = next((t for t in data if t.get("id") == tenant_id), data[0] if data else None)
+            self._remember_tenant(tenant_id, tenant)
+            return tenant
+        return None
+
+    async def resolve_tenant_id(self, tenant_id: str, auto_create: bool = True) -> Optional[str]:
         """
         Resolve tenant_id (slug or UUID) to UUID.
         Se auto_create=True e o tenant não existir, cria automaticamente.
         """
-        tenant = self.get_tenant(tenant_id)
+        tenant = await self.get_tenant(tenant_id)
         if tenant:
             return tenant.get("id")
 
         # Tenant não existe - criar automaticamente se permitido
         if auto_create and tenant_id:
-            created_tenant = self.create_tenant_from_ghl_location(tenant_id)
+            created_tenant = await self.create_tenant_from_ghl_location(tenant_id)
             if created_tenant:
                 return created_tenant.get("id")
 
         return None
 
-    def create_tenant_from_ghl_location(self, location_id: str) -> Optional[Dict]:
+    @_supabase_call("creating tenant")
+    async def create_tenant_from_ghl_location(self, location_id: str) -> Optional[Dict]:
         """
         Cria um tenant automaticamente baseado no location_id do GHL.
         Isso permite que novos clientes sejam registrados automaticamente.
         """
-        try:
-            # Criar tenant com dados básicos
-            tenant_data = {
-                "name": f"GHL Location {location_id[:8]}",
-                "slug": location_id,  # Usar location_id como slug
-                "tier": "free",
-                "status": "active",
-                "settings": {
-                    "ghl_location_id": location_id,
-                    "auto_created": True,
-                    "created_from": "classify_lead_api"
-                }
+        # Criar tenant com dados básicos
+        tenant_data = {
+            "name": f"GHL Location {location_id[:8]}",
+            "slug": location_id,  # Usar location_id como slug
+            "tier": "free",
+            "status": "active",
+            "settings": {
+                "ghl_location_id": location_id,
+                "auto_created": True,
+                "created_from": "classify_lead_api"
             }
+        }
 
-            response = requests.post(
-                f"{self.base_url}/tenants",
-                headers=self.headers,
-                json=tenant_data
-            )
-
-            if response.status_code in [200, 201]:
-                created = response.json()
-                logger.info(f"✅ Auto-created tenant for GHL location: {location_id}")
-                return created[0] if isinstance(created, list) else created
-            else:
-                logger.error(f"❌ Failed to auto-create tenant: {response.status_code} - {response.text}")
-                return None
+        response = await self.client.post(
+            self._TENANTS,
+            json=tenant_data
+        )
 
-        except Exception as e:
-            logger.error(f"❌ Exception creating tenant: {e}")
+        if response.status_code in [200, 201]:
+            created = orjson.loads(response.content)
+            logger.info("✅ Auto-created tenant for GHL location: %s", location_id)
+            tenant = created[0] if isinstance(created, list) else created
+            self.invalidate_tenant(location_id)
+            self._remember_tenant(location_id, tenant)
+            return tenant
+        else:
+            logger.error("❌ Failed to auto-create tenant: %s - %s", response.status_code, response.text)
             return None
 
-    def get_active_persona(self, tenant_id: str) -> Optional[Dict]:
+    async def get_active_persona(self, tenant_id: str) -> Optional[Dict]:
         """Get active persona for tenant"""
-        try:
-            response = requests.get(
-                f"{self.base_url}/tenant_personas",
-                headers=self.headers,
-                params={
-                    "tenant_id": f"eq.{tenant_id}",
-                    "is_active": "eq.true"
-                }
-            )
-            data = response.json()
-            return data[0] if data else None
-        except Exception as e:
-            logger.error(f"Error fetching persona: {e}")
-            return None
+        cached = self._persona_cache.get(tenant_id)
+        if cached is not _CACHE_MISS:
+            return cached
+        return await self._single_flight(("persona", tenant_id), lambda: self._fetch_active_persona(tenant_id))
+
+    @_supabase_call("fetching persona")
+    async def _fetch_active_persona(self, tenant_id: str) -> Optional[Dict]:
+        """Query the active persona and cache it (found or not)"""
+        # Tenant (UUID or slug) resolved inside the same query via the embedded tenant
+        response = await self.client.get(
+            self._PERSONAS,
+            params={
+                "select": "*,tenant:tenants!inner(id)",
+                "is_active": "eq.true",
+                "limit": 1,
+                **self._tenant_filter(tenant_id)
+            }
+        )
+        data = orjson.loads(response.content)
+        persona = data[0] if data else None
+        if persona:
+            persona.pop("tenant", None)
+        self._persona_cache.set(tenant_id, persona)
+        return persona
 
-    def is_known_contact(self, tenant_id: str, username: str) -> bool:
+    @staticmethod
+    def _tenant_filter(tenant_id: str) -> Dict[str, str]:
+        """
+        Filtro PostgREST sobre o tenant embutido (tenant:tenants!inner),
+        aceitando UUID ou slug sem resolver o tenant antes.
+        """
+        if _is_uuid(tenant_id):
+            return {"tenant.or": f"(id.eq.{tenant_id},slug.eq.{tenant_id})"}
+        return {"tenant.slug": _eq(tenant_id)}
+
+    async def _known_contact_set(self, tenant_id: str) -> Optional[frozenset]:
+        """The tenant's whole whitelist (cached), or None -> fall back to per-username lookups"""
+        cached = self._known_set_cache.get(tenant_id)
+        if cached is not _CACHE_MISS:
+            return cached
+        return await self._single_flight(("known_set", tenant_id), lambda: self._fetch_known_contact_set(tenant_id))
+
+    @_supabase_call("fetching known contacts")
+    async def _fetch_known_contact_set(self, tenant_id: str) -> Optional[frozenset]:
+        """Load tenant_known_contacts usernames for a tenant (errors are not cached)"""
+        response = await self.client.get(
+            self._KNOWN_CONTACTS,
+            params={
+                "select": "username,tenant:tenants!inner(id)",
+                "limit": KNOWN_CONTACT_SET_MAX,
+                **self._tenant_filter(tenant_id)
+            }
+        )
+        response.raise_for_status()
+        rows = orjson.loads(response.content)
+        # A full page may be truncated: don't trust it as the whole whitelist
+        contacts = frozenset(row["username"] for row in rows) if len(rows) < KNOWN_CONTACT_SET_MAX else None
+        self._known_set_cache.set(tenant_id, contacts)
+        return contacts
+
+    async def is_known_contact(self, tenant_id: str, username: str) -> bool:
         """Check if username is a known contact"""
-        try:
-            # Resolve tenant_id to UUID if needed
-            resolved_id = self.resolve_tenant_id(tenant_id)
-            if not resolved_id:
-                logger.warning(f"Could not resolve tenant_id: {tenant_id}")
-                return False
-
-            response = requests.get(
-                f"{self.base_url}/tenant_known_contacts",
-                headers=self.headers,
-                params={
-                    "tenant_id": f"eq.{resolved_id}",
-                    "username": f"eq.{username}"
-                }
-            )
-            # Only count as known if response is successful and has data
-            if response.status_code != 200:
-                logger.error(f"Error checking known contact: {response.text}")
-                return False
-            data = response.json()
-            return isinstance(data, list) and len(data) > 0
-        except Exception as e:
-            logger.error(f"Error checking known contact: {e}")
+        contacts = await self._known_contact_set(tenant_id)
+        if contacts is not None:
+            return username in contacts
+
+        key = (tenant_id, username)
+        cached = self._known_contact_cache.get(key)
+        if cached is not _CACHE_MISS:
+            return cached
+        return await self._single_flight(("known", *key), lambda: self._fetch_known_contact(tenant_id, username))
+
+    @_supabase_call("checking known contact", default=False)
+    async def _fetch_known_contact(self, tenant_id: str, username: str) -> bool:
+        """Query tenant_known_contacts and cache the answer (errors are not cached)"""
+        # Tenant lookup + contact check in a single round-trip; HEAD = no row body
+        response = await self.client.head(
+            self._KNOWN_CONTACTS,
+            params={
+                "select": "username,tenant:tenants!inner(id)",
+                "username": _eq(username),
+                "limit": 1,
+                **self._tenant_filter(tenant_id)
+            }
+        )
+        # Only count as known if response is successful and has data
+        if response.status_code != 200:
+            logger.error("Error checking known contact: HTTP %s", response.status_code)
             return False
-
-    def save_lead(self, lead_data: Dict) -> bool:
+        # Content-Range is "0-0/*" when the row exists, "*/*" when not (no count=exact needed)
+        is_known = not response.headers.get("Content-Range", "*/*").startswith("*")
+        self._known_contact_cache.set((tenant_id, username), is_known)
+        return is_known
+
+    @_supabase_call("checking known contacts", default=set)
+    async def are_known_contacts(self, tenant_id: str, usernames: List[str]) -> Set[str]:
+        """Batched is_known_contact: returns the subset of usernames that are known contacts"""
+        if not usernames:
+            return set()
+        contacts = await self._known_contact_set(tenant_id)
+        if contacts is not None:
+            return contacts.intersection(usernames)
+
+        quoted = ",".join(f'"{u}"' for u in usernames)
+        response = await self.client.get(
+            self._KNOWN_CONTACTS,
+            params={
+                "select": "username,tenant:tenants!inner(id)",
+                "username": f"in.({quoted})",
+                **self._tenant_filter(tenant_id)
+            }
+        )
+        if response.status_code != 200:
+            logger.error("Error checking known contacts: %s", response.text)
+            return set()
+        known = {row["username"] for row in orjson.loads(response.content)}
+        for username in usernames:
+            self._known_contact_cache.set((tenant_id, username), username in known)
+        return known
+
+    @_supabase_call("saving lead", default=False)
+    async def save_lead(self, lead_data: Dict) -> bool:
         """Save or update lead in database"""
-        try:
-            # Check if exists
-            check = requests.get(
-                f"{self.base_url}/agentic_instagram_leads",
-                headers=self.headers,
-                params={"username": f"eq.{lead_data['username']}"}
-            )
-
-            if check.json():
-                # Update existing
-                response = requests.patch(
-                    f"{self.base_url}/agentic_instagram_leads",
-                    headers=self.headers,
-                    params={"username": f"eq.{lead_data['username']}"},
-                    json=lead_data
-                )
-            else:
-                # Insert new
-                response = requests.post(
-                    f"{self.base_url}/agentic_instagram_leads",
-                    headers=self.headers,
-                    json=lead_data
-                )
-
-            response.raise_for_status()
-            return True
-        except Exception as e:
-            logger.error(f"Error saving lead: {e}")
-            return False
+        # Single upsert on username (no check-then-write race)
+        response = await self.client.post(
+            self._LEADS,
+            params={"on_conflict": "username"},
+            headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+            json=lead_data
+        )
+        response.raise_for_status()
+        return True
 
-    def save_classified_lead(self, data: Dict) -> bool:
+    @_supabase_call("saving classified lead", default=False)
+    async def save_classified_lead(self, data: Dict) -> bool:
         """
         Save classified lead.
         Resolve tenant_id automaticamente (cria tenant se não existir).
         """
-        try:
-            # Resolver tenant_id para UUID válido
-            raw_tenant_id = data.get("tenant_id")
-            if raw_tenant_id:
-                resolved_id = self.resolve_tenant_id(raw_tenant_id, auto_create=True)
-                if resolved_id:
-                    data["tenant_id"] = resolved_id
-                else:
-                    logger.warning(f"Could not resolve tenant_id: {raw_tenant_id}, skipping save")
-                    return False
+        # Resolver tenant_id para UUID válido
+        raw_tenant_id = data.get("tenant_id")
+        if raw_tenant_id:
+            resolved_id = await self.resolve_tenant_id(raw_tenant_id, auto_create=True)
+            if resolved_id:
+                data["tenant_id"] = resolved_id
+            else:
+                logger.warning("Could not resolve tenant_id: %s, skipping save", raw_tenant_id)
+                return False
 
-            response = requests.post(
-                f"{self.base_url}/classified_leads",
-                headers=self.headers,
-                json=data
-            )
-            response.raise_for_status()
+        response = await self.client.post(
+            self._CLASSIFIED_LEADS,
+            headers={"Prefer": "return=minimal"},
+            content=orjson.dumps(data)
+        )
+        response.raise_for_status()
+        return True
+
+    @_supabase_call("saving classified leads", default=False)
+    async def save_classified_leads(self, rows: List[Dict]) -> bool:
+        """
+        Bulk save_classified_lead via bulk_insert (a failed chunk is retried row by row,
+        so one bad row doesn't drop the rest of the batch).
+        Cada tenant_id distinto é resolvido uma vez; rows cujo tenant não resolve são descartadas.
+        Returns True when every row was saved.
+        """
+        if not rows:
             return True
-        except Exception as e:
-            logger.error(f"Error saving classified lead: {e}")
+        raw_ids = {row["tenant_id"] for row in rows if row.get("tenant_id")}
+        resolved = dict(zip(raw_ids, await asyncio.gather(
+            *(self.resolve_tenant_id(raw_id, auto_create=True) for raw_id in raw_ids)
+        )))
+        to_save = []
+        for row in rows:
+            raw_id = row.get("tenant_id")
+            if raw_id:
+                if not resolved[raw_id]:
+                    logger.warning("Could not resolve tenant_id: %s, skipping save", raw_id)
+                    continue
+                row["tenant_id"] = resolved[raw_id]
+            to_save.append(row)
+        if not to_save:
             return False
 
-    def log_dm_sent(self, data: Dict) -> bool:
+        saved = await self.bulk_insert(self._CLASSIFIED_LEADS, to_save)
+        return saved == len(rows)
+
+    async def bulk_insert(self, path: str, rows: List[Dict]) -> int:
+        """
+        Insert rows in chunks of SCRAPED_LEADS_INSERT_CHUNK, chunks posted concurrently.
+        A chunk that fails (ex: one duplicate) is retried row by row so the rest still lands.
+        Returns how many rows were saved.
+        """
+        async def insert(chunk: List[Dict]) -> int:
+            try:
+                response = await self.client.post(
+                    path,
+                    headers={"Prefer": "return=minimal"},
+                    content=orjson.dumps(chunk)
+                )
+                response.raise_for_status()
+                return len(chunk)
+            except Exception as e:
+                if len(chunk) == 1:
+                    logger.warning("Error inserting into %s: %s", path, e)
+                    return 0
+                counts = await asyncio.gather(*(insert([row]) for row in chunk))
+                return sum(counts)
+
+        chunks = [rows[i:i + SCRAPED_LEADS_INSERT_CHUNK] for i in range(0, len(rows), SCRAPED_LEADS_INSERT_CHUNK)]
+        return sum(await asyncio.gather(*(insert(chunk) for chunk in chunks)))
+
+    async def count(self, path: str, params: Dict) -> int:
+        """Row count for a filtered query via HEAD + count=exact (no rows transferred)"""
+        response = await self.client.head(path, params=params, headers={"Prefer": "count=exact"})
+        response.raise_for_status()
+        return int(response.headers.get("Content-Range", "*/0").rsplit("/", 1)[-1])
+
+    @_supabase_call("logging DM", default=False)
+    async def log_dm_sent(self, data: Dict) -> bool:
         """Log sent DM"""
-        try:
-            response = requests.post(
-                f"{self.base_url}/agentic_instagram_dm_sent",
-                headers=self.headers,
-                json=data
-            )
-            response.raise_for_status()
-            return True
-        except Exception as e:
-            logger.error(f"Error logging DM: {e}")
-            return False
+        response = await self.client.post(
+            self._DM_SENT,
+            headers={"Prefer": "return=minimal"},
+            json=data
+        )
+        response.raise_for_status()
+        return True
 
 
 # ============================================
@@ -578,7 +982,14 @@ class SupabaseClient:
 # ============================================
 
 class BrowserManager:
-    """Manages browser instance for scraping operations"""
+    """
+    Manages the shared browser for scraping operations.
+    One Chromium instance with a pool of BrowserContexts, so concurrent
+    requests each get their own context instead of queueing on one page.
+    Each pooled context keeps one pre-opened page that is reset and reused.
+    The pool starts with BROWSER_CONTEXT_POOL_MIN contexts and grows when all
+    are in use, up to BROWSER_CONTEXT_POOL_SIZE.
+    """
 
     _instance = None
     _lock = asyncio.Lock()
@@ -586,8 +997,12 @@ class BrowserManager:
     def __init__(self):
         self.playwright = None
         self.browser = None
-        self.context = None
-        self.page = None
+        self._contexts: List[Any] = []
+        self._context_pool: Optional[asyncio.Queue] = None
+        self._context_options: Dict[str, Any] = {}
+        self._context_count = 0  # created or being created
+        self._init_lock = asyncio.Lock()
+        self.cdp_url: Optional[str] = None
         self.is_initialized = False
 
     @classmethod
@@ -598,51 +1013,137 @@ class BrowserManager:
             return cls._instance
 
     async def initialize(self, headless: bool = True):
-        """Initialize browser if not already done"""
-        if self.is_initialized:
-            return
+        """Initialize browser and context pool if not already done"""
+        async with self._init_lock:
+            if self.is_initialized:
+                return
 
-        try:
-            from playwright.async_api import async_playwright
+            try:
+                from playwright.async_api import async_playwright
 
-            self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(
-                headless=headless,
-                args=['--disable-blink-features=AutomationControlled']
-            )
+                args = ['--disable-blink-features=AutomationControlled']
+                if BROWSER_CDP_PORT:
+                    args.append(f'--remote-debugging-port={BROWSER_CDP_PORT}')
 
-            # Load session if exists
-            context_options = {
-                'viewport': {'width': 1280, 'height': 800},
-                'user_agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-            }
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=headless,
+                    args=args
+                )
+                if BROWSER_CDP_PORT:
+                    self.cdp_url = f"http://127.0.0.1:{BROWSER_CDP_PORT}"
 
-            session_path = SESSIONS_DIR / "instagram_session.json"
-            if session_path.exists():
-                try:
-                    storage_state = json.loads(session_path.read_text())
-                    context_options['storage_state'] = storage_state
-                    logger.info("Loaded existing session")
-                except Exception as e:
-                    logger.warning(f"Could not load session: {e}")
+                # Load session if exists
+                context_options = {
+                    'viewport': {'width': 1280, 'height': 800},
+                    'user_agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+                }
 
-            self.context = await self.browser.new_context(**context_options)
-            self.page = await self.context.new_page()
-            self.is_initialized = True
-            logger.info("Browser initialized successfully")
+                session_path = SESSIONS_DIR / "instagram_session.json"
+                if session_path.exists():
+                    try:
+                        storage_state = json.loads(session_path.read_text())
+                        context_options['storage_state'] = storage_state
+                        logger.info("Loaded existing session")
+                    except Exception as e:
+                        logger.warning(f"Could not load session: {e}")
 
-        except Exception as e:
-            logger.error(f"Failed to initialize browser: {e}")
-            raise
+                self._context_options = context_options
+                self._context_pool = asyncio.Queue()
+                warm = min(BROWSER_CONTEXT_POOL_MIN, BROWSER_CONTEXT_POOL_SIZE)
+                for _ in range(warm):
+                    self._context_pool.put_nowait(await self._new_context())
+                self._context_count = warm
+
+                self.is_initialized = True
+                logger.info(f"Browser initialized successfully ({warm}/{BROWSER_CONTEXT_POOL_SIZE} contexts)")
+
+            except Exception as e:
+                logger.error(f"Failed to initialize browser: {e}")
+                raise
+
+    async def _new_context(self):
+        """Open one more pooled context with its warm page"""
+        context = await self.browser.new_context(**self._context_options)
+        self._contexts.append(context)
+        return context, await context.new_page()
+
+    async def acquire(self):
+        """
+        Borrow a context and its warm page from the pool.
+        Waits while all contexts are in use. Returns (context, page);
+        hand them back with release().
+        """
+        if not self.is_initialized:
+            await self.initialize(headless=True)
+
+        if self._context_pool.empty() and self._context_count < BROWSER_CONTEXT_POOL_SIZE:
+            # All in use and room to grow: open a new one (kept in the pool after release)
+            self._context_count += 1
+            try:
+                return await self._new_context()
+            except Exception:
+                self._context_count -= 1
+                raise
+
+        context, page = await self._context_pool.get()
+        if page.is_closed():
+            # Crashed or closed by the previous borrower
+            try:
+                page = await context.new_page()
+            except Exception:
+                self._context_pool.put_nowait((context, page))
+                raise
+        return context, page
+
+    async def release(self, context, page):
+        """
+        Close any extra pages opened during the lease, reset the warm page
+        to about:blank and return both to the pool.
+        """
+        for other in list(context.pages):
+            if other is not page:
+                try:
+                    await other.close()
+                except Exception:
+                    pass
+        try:
+            await page.goto("about:blank")
+        except Exception:
+            # Broken page: closed here, replaced on the next acquire()
+            try:
+                await page.close()
+            except Exception:
+                pass
+        self._context_pool.put_nowait((context, page))
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        async with browser_manager.lease() as (context, page): ...
+        The context goes back to the pool when the block exits, even on errors.
+        """
+        context, page = await self.acquire()
+        try:
+            yield context, page
+        finally:
+            await self.release(context, page)
 
     async def close(self):
         """Close browser and cleanup"""
-        if self.context:
-            await self.context.close()
+        for context in self._contexts:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        self._contexts = []
+        self._context_pool = None
+        self._context_count = 0
         if self.browser:
             await self.browser.close()
         if self.playwright:
             await self.playwright.stop()
+        self.cdp_url = None
         self.is_initialized = False
         logger.info("Browser closed")
 
@@ -661,6 +1162,43 @@ def get_profile_scraper(page):
         return InstagramProfileScraper(page)
 
 
+# ============================================
+# SCRAPE JOB DISPATCH
+# ============================================
+
+# arq pool, set in lifespan when REDIS_URL is configured
+scrape_queue = None
+
+
+async def dispatch_scrape(background_tasks: BackgroundTasks, job_name: str, job_id: str, *args) -> str:
+    """
+    Send a scrape job to the arq queue (deduplicated by job_id), or run it
+    in-process with a pooled browser context when no queue is available.
+    Returns "started", or "already_queued" when the same job is still queued / running
+    (or finished less than the worker's SCRAPE_JOB_KEEP_RESULT seconds ago).
+    """
+    if scrape_queue is not None:
+        try:
+            job = await scrape_queue.enqueue_job(job_name, *args, _job_id=job_id)
+            if job is None:
+                logger.info(f"{job_name} job {job_id} already queued, not enqueued again")
+                return "already_queued"
+            return "started"
+        except Exception as e:
+            logger.warning(f"Could not enqueue {job_name}, running in-process: {e}")
+
+    async def scrape_task():
+        browser_manager = await BrowserManager.get_instance()
+        try:
+            async with browser_manager.lease() as (context, _):
+                await SCRAPE_JOBS[job_name](context, *args)
+        except Exception as e:
+            logger.error(f"Error in {job_name} scrape task: {e}", exc_info=True)
+
+    background_tasks.add_task(scrape_task)
+    return "started"
+
+
 # ============================================
 # FASTAPI APP
 # ============================================
@@ -670,6 +1208,31 @@ async def lifespan(app: FastAPI):
     """Manage app lifecycle"""
     logger.info("Starting Socialfy API Server...")
 
+    await db.start()
+
+    # Gemini SDK configured once; handlers reuse the models
+    load_gemini_models()
+
+    # Batch consumer for n8n new_message classifications
+    global classify_batch_queue
+    classify_batch_queue = asyncio.Queue(maxsize=CLASSIFY_QUEUE_MAX)
+    classify_batcher = asyncio.create_task(run_classify_batcher())
+
+    # Write-behind buffers for single-row inserts
+    classified_lead_writer.start()
+    dm_sent_writer.start()
+
+    # Connect to the scrape job queue (workers: arq scrape_worker.WorkerSettings)
+    global scrape_queue
+    if REDIS_URL:
+        try:
+            from arq import create_pool
+            from arq.connections import RedisSettings
+            scrape_queue = await create_pool(RedisSettings.from_dsn(REDIS_URL))
+            logger.info("Scrape queue connected")
+        except Exception as e:
+            logger.warning(f"Scrape queue unavailable, scrapes will run in-process: {e}")
+
     # Initialize browser on startup
     try:
         browser_manager = await BrowserManager.get_instance()
@@ -679,13 +1242,24 @@ async def lifespan(app: FastAPI):
 
     yield
 
-    # Cleanup on shutdown
+    # Cleanup on shutdown (queued classifications first: their results go through the writers)
+    await stop_classify_batcher(classify_batcher)
+    await classified_lead_writer.stop()
+    await dm_sent_writer.stop()
+    if _callback_client is not None:
+        await _callback_client.aclose()
+
     try:
         browser_manager = await BrowserManager.get_instance()
         await browser_manager.close()
     except:
         pass
 
+    if scrape_queue is not None:
+        await scrape_queue.close()
+
+    await db.close()
+
     logger.info("Socialfy API Server stopped")
 
 
@@ -693,7 +1267,8 @@ app = FastAPI(
     title="Socialfy API",
     description="API Server for Instagram Lead Generation & DM Automation",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS
@@ -732,7 +1307,7 @@ async def rate_limit_middleware(request: Request, call_next):
 
     if not allowed:
         # Return 429 Too Many Requests
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=429,
             content={
                 "error": "Too Many Requests",
@@ -773,7 +1348,7 @@ async def metrics_middleware(request: Request, call_next):
     # Track metrics
     process_time = time.time() - start_time
     request_metrics["total_requests"] += 1
-    request_metrics["last_request_time"] = datetime.now().isoformat()
+    request_metrics["last_request_time"] = now_iso()
     request_metrics["requests_by_endpoint"][request.url.path] += 1
     request_metrics["requests_by_status"][response.status_code] += 1
 
@@ -791,6 +1366,80 @@ async def metrics_middleware(request: Request, call_next):
 # Database client
 db = SupabaseClient()
 
+# Suggested-response cache for near-duplicate inbound DMs
+response_cache = SemanticResponseCache(db, threshold=DM_RESPONSE_CACHE_THRESHOLD)
+
+
+async def collect_batch(queue: asyncio.Queue, max_size: int, window: float) -> List:
+    """Wait for one item, then keep collecting for up to `window` seconds (max `max_size` items)"""
+    loop = asyncio.get_running_loop()
+    batch = [await queue.get()]
+    deadline = loop.time() + window
+    while len(batch) < max_size:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+_WRITE_STOP = object()
+
+
+class _WriteBehind:
+    """
+    Write-behind buffer for single-row inserts whose result the caller doesn't use:
+    rows are queued and a background task posts them in bulk (DB_WRITE_BATCH_SIZE /
+    DB_WRITE_BATCH_WINDOW). Outside lifespan (no task running) put() writes directly.
+    """
+
+    def __init__(self, name: str, flush):
+        self.name = name
+        self.flush = flush  # async (rows) -> Any
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush what is still queued, then stop the task"""
+        if self.task is None:
+            return
+        self.queue.put_nowait(_WRITE_STOP)
+        try:
+            await asyncio.wait_for(self.task, timeout=10)
+        except Exception as e:
+            logger.warning("%s writer did not flush cleanly: %s", self.name, e)
+        self.queue = self.task = None
+
+    async def put(self, row: Dict):
+        if self.queue is None:
+            await self.flush([row])
+        else:
+            self.queue.put_nowait(row)
+
+    async def _run(self):
+        while True:
+            batch = await collect_batch(self.queue, DB_WRITE_BATCH_SIZE, DB_WRITE_BATCH_WINDOW)
+            stop = _WRITE_STOP in batch
+            rows = [row for row in batch if row is not _WRITE_STOP]
+            if rows:
+                try:
+                    await self.flush(rows)
+                except Exception as e:
+                    logger.error("Error flushing %s %s rows: %s", len(rows), self.name, e)
+            if stop:
+                return
+
+
+# Classifications and sent-DM logs from bursts of webhooks share one POST per window
+classified_lead_writer = _WriteBehind("classified_leads", db.save_classified_leads)
+dm_sent_writer = _WriteBehind("dm_sent", lambda rows: db.bulk_insert(db._DM_SENT, rows))
 
 # ============================================
 # AUTH DEPENDENCY
@@ -803,6 +1452,37 @@ async def verify_api_key(x_api_key: str = Header(None)):
     return True
 
 
+# ============================================
+# JSON BODY PARSING (hot webhooks)
+# ============================================
+
+def json_body(model):
+    """
+    Dependency that validates the raw request bytes with pydantic-core in one pass
+    (model_validate_json), skipping the json.loads -> dict -> validate round FastAPI does.
+    Invalid bodies still get the usual 422 response.
+    """
+    async def parse(request: Request):
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors(include_url=False))
+    return parse
+
+
+def json_body_openapi(model) -> Dict[str, Any]:
+    """
+    openapi_extra documenting a json_body() request body (the dependency hides it from FastAPI).
+    Flat models only: nested models would emit $defs refs the OpenAPI document can't resolve.
+    """
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}}
+        }
+    }
+
+
 # ============================================
 # HEALTH CHECK
 # ============================================
@@ -819,78 +1499,103 @@ async def debug_env():
     }
 
 
+# Agent definitions for all 6 squads (23 agents) - static, built once
+_AGENT_SQUADS = {
+    "outbound": ("LeadDiscovery", "ProfileAnalyzer", "LeadQualifier", "MessageComposer", "OutreachExecutor"),
+    "inbound": ("InboxMonitor", "LeadClassifier", "AutoResponder"),
+    "infrastructure": ("AccountManager", "Analytics", "ErrorHandler"),
+    "security": ("RateLimitGuard", "SessionSecurity", "AntiDetection", "Compliance"),
+    "performance": ("CacheManager", "BatchProcessor", "QueueManager", "LoadBalancer"),
+    "quality": ("DataValidator", "MessageQuality", "Deduplication", "AuditLogger"),
+}
+_AGENTS_TEMPLATE = MappingProxyType({
+    name: {"squad": squad, "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0}
+    for squad, names in _AGENT_SQUADS.items()
+    for name in names
+})
+_HEALTH_SYSTEM_METRICS = MappingProxyType({
+    "total_tasks_routed": 0,
+    "active_agents": 23,
+    "workflows_completed": 0,
+    "workflows_failed": 0
+})
+_ROOT_INFO = MappingProxyType({
+    "name": "Socialfy API",
+    "version": "1.0.0",
+    "docs": "/docs",
+    "health": "/health"
+})
+
+# Dashboards poll / every second: short max-age + weak ETag so caches/clients dedupe polls.
+# /health is always answered in full (timestamp and status change between polls).
+_POLL_CACHE_CONTROL = "public, max-age=1"
+_ROOT_ETAG = 'W/"root-1.0.0"'
+
+
+def _not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Set ETag/Cache-Control on response; return a 304 if the client already has etag"""
+    headers = {"ETag": etag, "Cache-Control": _POLL_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint with full system status for dashboard"""
     browser_manager = await BrowserManager.get_instance()
 
-    # Agent definitions for all 6 squads (23 agents)
-    agents_data = {
-        # Outbound Squad (5 agents)
-        "LeadDiscovery": {"squad": "outbound", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "ProfileAnalyzer": {"squad": "outbound", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "LeadQualifier": {"squad": "outbound", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "MessageComposer": {"squad": "outbound", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "OutreachExecutor": {"squad": "outbound", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        # Inbound Squad (3 agents)
-        "InboxMonitor": {"squad": "inbound", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "LeadClassifier": {"squad": "inbound", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "AutoResponder": {"squad": "inbound", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        # Infrastructure Squad (3 agents)
-        "AccountManager": {"squad": "infrastructure", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "Analytics": {"squad": "infrastructure", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "ErrorHandler": {"squad": "infrastructure", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        # Security Squad (4 agents)
-        "RateLimitGuard": {"squad": "security", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "SessionSecurity": {"squad": "security", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "AntiDetection": {"squad": "security", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "Compliance": {"squad": "security", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        # Performance Squad (4 agents)
-        "CacheManager": {"squad": "performance", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "BatchProcessor": {"squad": "performance", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "QueueManager": {"squad": "performance", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "LoadBalancer": {"squad": "performance", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        # Quality Squad (4 agents)
-        "DataValidator": {"squad": "quality", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "MessageQuality": {"squad": "quality", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "Deduplication": {"squad": "quality", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-        "AuditLogger": {"squad": "quality", "state": "idle", "tasks_completed": 0, "tasks_failed": 0, "success_rate": 1.0},
-    }
-
     return {
         "status": "healthy" if browser_manager.is_initialized else "degraded",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": datetime.now(),
         "browser_ready": browser_manager.is_initialized,
         "version": "1.0.0",
-        "system_metrics": {
-            "total_tasks_routed": 0,
-            "active_agents": 23,
-            "workflows_completed": 0,
-            "workflows_failed": 0
-        },
+        "system_metrics": _HEALTH_SYSTEM_METRICS,
         "total_tasks_processed": 0,
         "total_errors": 0,
         "overall_success_rate": 1.0,
-        "agents": agents_data,
+        "agents": _AGENTS_TEMPLATE,
         "active_workflows": 0
     }
 
 
 @app.get("/")
-async def root():
+async def root(request: Request, response: Response):
     """Root endpoint"""
-    return {
-        "name": "Socialfy API",
-        "version": "1.0.0",
-        "docs": "/docs",
-        "health": "/health"
-    }
+    return _not_modified(request, response, _ROOT_ETAG) or _ROOT_INFO
 
 
 # ============================================
 # SCRAPING ENDPOINTS
 # ============================================
 
+# Successful profile scrapes by normalized username, and scrapes in flight
+_profile_cache = _TTLCache(PROFILE_CACHE_TTL, 0, maxsize=PROFILE_CACHE_SIZE)
+_profile_inflight: Dict[Hashable, asyncio.Future] = {}
+
+
+async def get_profile_cached(username: str, scraper: Optional[InstagramAPIScraper] = None) -> Dict:
+    """
+    InstagramAPIScraper.get_profile with a PROFILE_CACHE_TTL cache; concurrent
+    calls for the same username (webhook fan-out) share one scrape. A scraper is
+    only built (taking the next pool session) on a miss. Returns a copy, callers may mutate it.
+    """
+    key = username.lstrip("@").lower()
+    profile = _profile_cache.get(key)
+    if profile is _CACHE_MISS:
+        async def fetch() -> Dict:
+            # construction + fetch are blocking (requests), so both run in a worker thread
+            api_scraper = scraper or await asyncio.to_thread(InstagramAPIScraper)
+            result = await asyncio.to_thread(api_scraper.get_profile, username)
+            if result.get("success"):
+                _profile_cache.set(key, result)
+            return result
+
+        profile = await single_flight(_profile_inflight, key, fetch)
+    return dict(profile)
+
+
 @app.post("/webhook/scrape-profile")
 async def scrape_profile(request: ScrapeProfileRequest):
     """
@@ -902,12 +1607,7 @@ async def scrape_profile(request: ScrapeProfileRequest):
     logger.info(f"Scraping profile: @{request.username}")
 
     try:
-        # Use the Instagram API scraper for more data
-        from instagram_api_scraper import InstagramAPIScraper
-        from supabase_integration import SocialfyAgentIntegration
-
-        scraper = InstagramAPIScraper()
-        profile = scraper.get_profile(request.username)
+        profile = await get_profile_cached(request.username)
 
         if not profile.get("success"):
             return {
@@ -917,12 +1617,13 @@ async def scrape_profile(request: ScrapeProfileRequest):
             }
 
         # Calculate lead score
-        score_data = scraper.calculate_lead_score(profile)
+        score_data = InstagramAPIScraper.calculate_lead_score(profile)
 
         # Save to database if requested
         if request.save_to_db:
-            integration = SocialfyAgentIntegration()
-            integration.save_discovered_lead(
+            integration = get_integration()
+            await asyncio.to_thread(
+                integration.save_discovered_lead,
                 name=profile.get("full_name") or request.username,
                 email=profile.get("email") or f"{request.username}@instagram.com",
                 source="api_scrape",
@@ -986,30 +1687,14 @@ async def scrape_likers(request: ScrapeLikersRequest, background_tasks: Backgrou
     """
     logger.info(f"Scraping likers for: {request.post_url}")
 
-    async def scrape_task():
-        try:
-            from instagram_post_likers_scraper import PostLikersScraper
-
-            scraper = PostLikersScraper(headless=True)
-            await scraper.start()
-
-            if await scraper.verify_login():
-                likers = await scraper.scrape_likers(request.post_url, limit=request.limit)
-
-                if request.save_to_db:
-                    await scraper.save_to_supabase(likers)
-
-                logger.info(f"Scraped {len(likers)} likers")
-
-            await scraper.stop()
-
-        except Exception as e:
-            logger.error(f"Error in likers scrape task: {e}")
-
-    background_tasks.add_task(scrape_task)
+    status = await dispatch_scrape(
+        background_tasks, "scrape_likers",
+        scrape_job_id("likers", request.tenant_id, request.post_url),
+        request.post_url, request.limit, request.save_to_db
+    )
 
     return {
-        "status": "started",
+        "status": status,
         "message": f"Scraping likers from {request.post_url} (limit: {request.limit})",
         "check_results": "/api/leads?source=post_like"
     }
@@ -1031,59 +1716,17 @@ async def scrape_post_likers(request: ScrapePostLikersRequest, background_tasks:
         post_url=request.post_url
     )
 
-    async def scrape_task():
-        """Background task to scrape likers"""
-        try:
-            from instagram_post_likers_scraper import PostLikersScraper
-            from supabase_integration import SocialfyAgentIntegration
-
-            scraper = PostLikersScraper(headless=True)
-            integration = SocialfyAgentIntegration()
-
-            await scraper.start()
-
-            if await scraper.verify_login():
-                # Scrape likers
-                likers = await scraper.scrape_likers(request.post_url, limit=request.max_likers)
-
-                logger.info(f"Scraped {len(likers)} likers from post")
-
-                # Save to Supabase if requested
-                if request.save_to_db:
-                    saved_count = 0
-                    for liker in likers:
-                        try:
-                            # Save each liker as a lead
-                            integration.save_discovered_lead(
-                                name=liker.get("full_name") or liker.get("username"),
-                                email=f"{liker.get('username')}@instagram.com",  # Placeholder
-                                source="post_like",
-                                profile_data={
-                                    "username": liker.get("username"),
-                                    "bio": liker.get("bio"),
-                                    "followers_count": liker.get("followers_count", 0),
-                                    "is_verified": liker.get("is_verified", False),
-                                    "is_private": liker.get("is_private", False),
-                                    "source_url": request.post_url
-                                }
-                            )
-                            saved_count += 1
-                        except Exception as e:
-                            logger.warning(f"Failed to save liker {liker.get('username')}: {e}")
-
-                    logger.info(f"Saved {saved_count}/{len(likers)} likers to Supabase")
-
-            await scraper.stop()
-
-        except Exception as e:
-            logger.error(f"Error in post likers scrape task: {e}", exc_info=True)
-
-    # Start background task
-    background_tasks.add_task(scrape_task)
+    # Start background job
+    status = await dispatch_scrape(
+        background_tasks, "scrape_post_likers",
+        scrape_job_id("post_likers", request.tenant_id, request.post_url),
+        request.post_url, request.max_likers, request.save_to_db
+    )
 
     # Return immediate response
     return ScrapePostLikersResponse(
         success=True,
+        status=status,
         total_scraped=0,  # Will be updated in background
         leads_saved=0,    # Will be updated in background
         post_url=request.post_url
@@ -1098,30 +1741,14 @@ async def scrape_commenters(request: ScrapeCommentersRequest, background_tasks:
     """
     logger.info(f"Scraping commenters for: {request.post_url}")
 
-    async def scrape_task():
-        try:
-            from instagram_post_commenters_scraper import PostCommentersScraper
-
-            scraper = PostCommentersScraper(headless=True)
-            await scraper.start()
-
-            if await scraper.verify_login():
-                commenters = await scraper.scrape_commenters(request.post_url, limit=request.limit)
-
-                if request.save_to_db:
-                    await scraper.save_to_supabase(commenters)
-
-                logger.info(f"Scraped {len(commenters)} commenters")
-
-            await scraper.stop()
-
-        except Exception as e:
-            logger.error(f"Error in commenters scrape task: {e}")
-
-    background_tasks.add_task(scrape_task)
+    status = await dispatch_scrape(
+        background_tasks, "scrape_commenters",
+        scrape_job_id("commenters", request.tenant_id, request.post_url),
+        request.post_url, request.limit, request.save_to_db
+    )
 
     return {
-        "status": "started",
+        "status": status,
         "message": f"Scraping commenters from {request.post_url} (limit: {request.limit})",
         "check_results": "/api/leads?source=post_comment"
     }
@@ -1148,11 +1775,8 @@ async def scrape_followers(request: ScrapeFollowersRequest):
     logger.info(f"Scraping followers de @{request.username} (max: {request.max_followers})")
 
     try:
-        from instagram_api_scraper import InstagramAPIScraper
-        from supabase_integration import SupabaseClient
-
         scraper = InstagramAPIScraper()
-        result = scraper.get_followers(request.username, max_count=request.max_followers)
+        result = await asyncio.to_thread(scraper.get_followers, request.username, max_count=request.max_followers)
 
         if not result.get("success"):
             return {
@@ -1167,26 +1791,23 @@ async def scrape_followers(request: ScrapeFollowersRequest):
         # Salvar no banco se solicitado
         saved_count = 0
         if request.save_to_db and followers:
-            db = SupabaseClient()
-            for follower in followers:
-                try:
-                    db._request('POST', 'growth_leads', data={
-                        'instagram_username': follower.get('username'),
-                        'name': follower.get('full_name') or follower.get('username'),
-                        'source_channel': f'instagram_followers_{request.username}',
-                        'funnel_stage': 'lead',
-                        'lead_temperature': 'cold',
-                        'location_id': request.tenant_id or '11111111-1111-1111-1111-111111111111',
-                        'avatar_url': follower.get('profile_pic_url'),
-                        'custom_fields': {
-                            'scraped_from': request.username,
-                            'is_private': follower.get('is_private'),
-                            'is_verified': follower.get('is_verified'),
-                        }
-                    })
-                    saved_count += 1
-                except Exception as e:
-                    logger.warning(f"Erro ao salvar follower {follower.get('username')}: {e}")
+            saved_count = await db.bulk_insert(db._GROWTH_LEADS, [
+                {
+                    'instagram_username': follower.get('username'),
+                    'name': follower.get('full_name') or follower.get('username'),
+                    'source_channel': f'instagram_followers_{request.username}',
+                    'funnel_stage': 'lead',
+                    'lead_temperature': 'cold',
+                    'location_id': request.tenant_id or '11111111-1111-1111-1111-111111111111',
+                    'avatar_url': follower.get('profile_pic_url'),
+                    'custom_fields': {
+                        'scraped_from': request.username,
+                        'is_private': follower.get('is_private'),
+                        'is_verified': follower.get('is_verified'),
+                    }
+                }
+                for follower in followers
+            ])
 
         return {
             "success": True,
@@ -1228,11 +1849,8 @@ async def scrape_hashtag(request: ScrapeHashtagRequest):
     logger.info(f"Scraping hashtag #{hashtag} (max: {request.max_users})")
 
     try:
-        from instagram_api_scraper import InstagramAPIScraper
-        from supabase_integration import SupabaseClient
-
         scraper = InstagramAPIScraper()
-        result = scraper.search_hashtag(hashtag, max_posts=request.max_users)
+        result = await asyncio.to_thread(scraper.search_hashtag, hashtag, max_posts=request.max_users)
 
         if not result.get("success"):
             return {
@@ -1247,26 +1865,23 @@ async def scrape_hashtag(request: ScrapeHashtagRequest):
         # Salvar no banco se solicitado
         saved_count = 0
         if request.save_to_db and users:
-            db = SupabaseClient()
-            for user in users:
-                try:
-                    db._request('POST', 'growth_leads', data={
-                        'instagram_username': user.get('username'),
-                        'name': user.get('full_name') or user.get('username'),
-                        'source_channel': f'instagram_hashtag_{hashtag}',
-                        'funnel_stage': 'lead',
-                        'lead_temperature': 'cold',
-                        'location_id': request.tenant_id or '11111111-1111-1111-1111-111111111111',
-                        'avatar_url': user.get('profile_pic_url'),
-                        'custom_fields': {
-                            'scraped_from_hashtag': hashtag,
-                            'is_private': user.get('is_private'),
-                            'is_verified': user.get('is_verified'),
-                        }
-                    })
-                    saved_count += 1
-                except Exception as e:
-                    logger.warning(f"Erro ao salvar user {user.get('username')}: {e}")
+            saved_count = await db.bulk_insert(db._GROWTH_LEADS, [
+                {
+                    'instagram_username': user.get('username'),
+                    'name': user.get('full_name') or user.get('username'),
+                    'source_channel': f'instagram_hashtag_{hashtag}',
+                    'funnel_stage': 'lead',
+                    'lead_temperature': 'cold',
+                    'location_id': request.tenant_id or '11111111-1111-1111-1111-111111111111',
+                    'avatar_url': user.get('profile_pic_url'),
+                    'custom_fields': {
+                        'scraped_from_hashtag': hashtag,
+                        'is_private': user.get('is_private'),
+                        'is_verified': user.get('is_verified'),
+                    }
+                }
+                for user in users
+            ])
 
         return {
             "success": True,
@@ -1306,76 +1921,95 @@ async def scrape_batch(request: BatchScrapeRequest):
     logger.info(f"Batch scraping {len(request.usernames)} perfis")
 
     try:
-        from instagram_api_scraper import InstagramAPIScraper
-        from supabase_integration import SupabaseClient
-
         scraper = InstagramAPIScraper()
-        db = SupabaseClient() if request.save_to_db else None
 
-        results = []
-        success_count = 0
-        saved_count = 0
-
-        for username in request.usernames:
-            username = username.strip().lstrip("@").lower()
-            if not username:
-                continue
-
-            try:
-                profile = scraper.get_profile(username)
+        def scrape_one(username: str) -> Dict:
+            """Scrape + score de um perfil (bloqueante, roda em thread)"""
+            profile = scraper.get_profile(username)
+            if profile.get("success"):
+                profile.update(scraper.calculate_lead_score(profile))
+            return profile
 
-                if profile.get("success"):
-                    score_data = scraper.calculate_lead_score(profile)
-                    profile.update(score_data)
-                    success_count += 1
+        def lead_row(username: str, profile: Dict) -> Dict:
+            return {
+                'instagram_username': username,
+                'name': profile.get('full_name') or username,
+                'source_channel': 'instagram_batch_scrape',
+                'funnel_stage': 'lead',
+                'lead_temperature': 'hot' if profile.get('score', 0) >= 60 else 'warm' if profile.get('score', 0) >= 40 else 'cold',
+                'lead_score': profile.get('score', 0),
+                'location_id': request.tenant_id or '11111111-1111-1111-1111-111111111111',
+                'avatar_url': profile.get('profile_pic_url'),
+                'custom_fields': {
+                    'instagram_bio': profile.get('bio'),
+                    'instagram_followers': profile.get('followers_count'),
+                    'instagram_following': profile.get('following_count'),
+                    'instagram_posts': profile.get('posts_count'),
+                    'instagram_is_business': profile.get('is_business'),
+                    'instagram_is_verified': profile.get('is_verified'),
+                    'classification': profile.get('classification'),
+                    'signals': profile.get('signals', []),
+                }
+            }
 
-                    # Salvar no banco
-                    if db:
-                        try:
-                            db._request('POST', 'growth_leads', data={
-                                'instagram_username': username,
-                                'name': profile.get('full_name') or username,
-                                'source_channel': 'instagram_batch_scrape',
-                                'funnel_stage': 'lead',
-                                'lead_temperature': 'hot' if profile.get('score', 0) >= 60 else 'warm' if profile.get('score', 0) >= 40 else 'cold',
-                                'lead_score': profile.get('score', 0),
-                                'location_id': request.tenant_id or '11111111-1111-1111-1111-111111111111',
-                                'avatar_url': profile.get('profile_pic_url'),
-                                'custom_fields': {
-                                    'instagram_bio': profile.get('bio'),
-                                    'instagram_followers': profile.get('followers_count'),
-                                    'instagram_following': profile.get('following_count'),
-                                    'instagram_posts': profile.get('posts_count'),
-                                    'instagram_is_business': profile.get('is_business'),
-                                    'instagram_is_verified': profile.get('is_verified'),
-                                    'classification': profile.get('classification'),
-                                    'signals': profile.get('signals', []),
-                                }
-                            })
-                            saved_count += 1
-                        except Exception as e:
-                            logger.warning(f"Erro ao salvar {username}: {e}")
+        # Saves are pipelined: each full chunk of rows is inserted while scraping continues
+        pending_rows: List[Dict] = []
+        inserts: List[asyncio.Task] = []
+
+        def flush_rows():
+            if pending_rows:
+                inserts.append(asyncio.create_task(db.bulk_insert(db._GROWTH_LEADS, pending_rows[:])))
+                pending_rows.clear()
+
+        # Perfis processados em paralelo, limitados pelo semáforo
+        sem = asyncio.Semaphore(BATCH_SCRAPE_CONCURRENCY)
+
+        # Rate limiting compartilhado: um início de request a cada BATCH_SCRAPE_INTERVAL,
+        # somando todos os workers (mesmo sessionid)
+        loop = asyncio.get_running_loop()
+        next_start = loop.time()
+        pace_lock = asyncio.Lock()
+
+        async def wait_turn():
+            nonlocal next_start
+            async with pace_lock:
+                start = max(loop.time(), next_start)
+                next_start = start + BATCH_SCRAPE_INTERVAL
+            await asyncio.sleep(start - loop.time())
+
+        async def process(username: str) -> Dict:
+            async with sem:
+                try:
+                    await wait_turn()
+                    profile = await asyncio.to_thread(scrape_one, username)
+                    result = {
+                        "username": username,
+                        "success": profile.get("success", False),
+                        "full_name": profile.get("full_name"),
+                        "followers": profile.get("followers_count", 0),
+                        "score": profile.get("score", 0),
+                        "classification": profile.get("classification", "LEAD_COLD"),
+                        "error": profile.get("error") if not profile.get("success") else None
+                    }
+                    if request.save_to_db and profile.get("success"):
+                        pending_rows.append(lead_row(username, profile))
+                        if len(pending_rows) >= SCRAPED_LEADS_INSERT_CHUNK:
+                            flush_rows()
+                except Exception as e:
+                    result = {
+                        "username": username,
+                        "success": False,
+                        "error": str(e)
+                    }
 
-                results.append({
-                    "username": username,
-                    "success": profile.get("success", False),
-                    "full_name": profile.get("full_name"),
-                    "followers": profile.get("followers_count", 0),
-                    "score": profile.get("score", 0),
-                    "classification": profile.get("classification", "LEAD_COLD"),
-                    "error": profile.get("error") if not profile.get("success") else None
-                })
+                return result
 
-                # Rate limiting entre requests
-                import time
-                time.sleep(1.5)
+        usernames = [u.strip().lstrip("@").lower() for u in request.usernames]
+        results = await asyncio.gather(*[process(u) for u in usernames if u])
+        flush_rows()
 
-            except Exception as e:
-                results.append({
-                    "username": username,
-                    "success": False,
-                    "error": str(e)
-                })
+        success_count = sum(1 for result in results if result["success"])
+        saved_count = sum(await asyncio.gather(*inserts))
 
         return {
             "success": True,
@@ -1395,14 +2029,296 @@ async def scrape_batch(request: BatchScrapeRequest):
         }
 
 
+# ============================================
+# GEMINI PROMPTS
+# ============================================
+# Static instruction blocks are the models' system_instruction, byte-identical
+# on every call so Gemini's implicit context cache can reuse the prefix; the
+# prompt itself only carries the lead data.
+
+SALES_ASSISTANT_INSTRUCTIONS = """Você é um assistente de vendas no Instagram.
+
+Gere uma resposta natural e amigável para a DM abaixo que:
+1. Agradeça pela mensagem
+2. Demonstre interesse genuíno
+3. Faça uma pergunta relevante para qualificar o lead
+4. Seja concisa (máx 2-3 frases)
+
+Responda APENAS com o texto da mensagem, sem explicações.
+"""
+
+CLASSIFIER_INSTRUCTIONS = """Você é um classificador de leads inteligente para prospecção no Instagram.
+Classifique o lead descrito a seguir (LEAD, MENSAGEM RECEBIDA e contextos disponíveis).
+
+REGRAS DE CLASSIFICAÇÃO:
+1. Se temos CONTEXTO DE PERFIL (bio/especialidade), use-o para entender melhor a intenção
+2. Se a ORIGEM é "outbound" (BDR abordou), o lead está RESPONDENDO nossa prospecção:
+   - Qualquer resposta engajada = mínimo LEAD_WARM
+   - Respostas positivas/curiosas = LEAD_HOT
+   - Apenas "ok", "hum" = LEAD_COLD
+3. Se a ORIGEM é "inbound", avalie o interesse demonstrado na mensagem
+
+CATEGORIAS:
+- LEAD_HOT: Interesse claro em comprar/contratar (pergunta preço, pede info, demonstra urgência)
+- LEAD_WARM: Engajamento positivo, quer saber mais, resposta educada a prospecção
+- LEAD_COLD: Primeira interação fria, resposta vaga, sem interesse claro
+- PESSOAL: Mensagem pessoal (amigo, família, parceiro) - NÃO é lead
+- SPAM: Propaganda, bot, mensagem irrelevante
+
+PONTUAÇÃO (0-100):
+- 80-100: Lead pronto para conversão
+- 60-79: Lead qualificado, precisa mais nutrição
+- 40-59: Lead frio, baixa probabilidade
+- 0-39: Não é lead ou spam
+
+IMPORTANTE para suggested_response:
+- Se temos bio/especialidade, personalize a resposta mencionando algo do perfil
+- Se é resposta de prospecção (outbound), continue a conversa naturalmente
+- NUNCA use introduções genéricas como "Alberto Correia por aqui" ou similar
+- Seja direto e relevante ao contexto
+
+Responda APENAS em JSON:
+{
+    "classification": "LEAD_HOT|LEAD_WARM|LEAD_COLD|PESSOAL|SPAM",
+    "score": 0-100,
+    "reasoning": "explicação curta baseada no contexto disponível",
+    "suggested_response": "resposta personalizada ou null se não aplicável"
+}
+"""
+
+# Per-request prompts (str.format_map templates, built once at import)
+INBOUND_DM_TEMPLATE = """
+Recebeu uma DM de @{username}:
+"{message}"
+
+Perfil do lead:
+- Nome: {full_name}
+- Bio: {bio}
+- Seguidores: {followers}
+- Business: {is_business}
+- Score: {score}/100 ({classification})
+"""
+
+# Per-tenant ICP context goes first, so the prompt prefix (system_instruction +
+# persona) is identical for every lead of a tenant; per-lead data follows it
+CLASSIFY_LEAD_TEMPLATE = """{persona_context}
+LEAD: @{username}
+MENSAGEM RECEBIDA: "{message}"
+
+{profile_context}
+{origin_context}
+"""
+
+GEMINI_MODEL = "gemini-2.5-flash"
+# First-message triage in /api/analyze-conversation-context (no system instruction)
+CONTEXT_GEMINI_MODEL = "gemini-2.0-flash"
+
+# Built once at startup by load_gemini_models(); None when GEMINI_API_KEY is missing
+sales_model = None
+classifier_model = None
+context_model = None
+
+
+def load_gemini_models():
+    """Configure the Gemini SDK once and build the sales / classifier models"""
+    global sales_model, classifier_model, context_model
+    if not GEMINI_API_KEY:
+        logger.warning("GEMINI_API_KEY not configured - AI suggestions/classification disabled")
+        return
+
+    try:
+        import google.generativeai as genai
+
+        genai.configure(api_key=GEMINI_API_KEY)
+        sales_model = genai.GenerativeModel(GEMINI_MODEL, system_instruction=SALES_ASSISTANT_INSTRUCTIONS)
+        # Classifier / context triage answer JSON only: JSON mode means no ```json fences to strip
+        json_config = genai.GenerationConfig(response_mime_type="application/json")
+        classifier_model = genai.GenerativeModel(
+            GEMINI_MODEL, system_instruction=CLASSIFIER_INSTRUCTIONS, generation_config=json_config
+        )
+        context_model = genai.GenerativeModel(CONTEXT_GEMINI_MODEL, generation_config=json_config)
+        logger.info("Gemini models loaded (%s)", GEMINI_MODEL)
+    except Exception as e:
+        logger.error("Failed to load Gemini models: %s", e)
+
+
+# Several leads in one call (n8n bursts); each lead is a CLASSIFY_LEAD_TEMPLATE block
+CLASSIFY_BATCH_HEADER = """
+Classifique CADA um dos {count} leads abaixo de forma independente.
+Responda APENAS com um array JSON, um objeto por lead, com o campo "index" do lead
+e os mesmos campos do formato acima.
+"""
+
+CLASSIFY_BATCH_ITEM = """
+--- index: {index} ---"""
+
+# Markdown fence openings the model sometimes wraps its JSON answer in (longest first)
+_FENCE_PREFIXES = ("```json\n", "```json", "```\n", "```")
+
+
+# Flow control for every sales/classifier Gemini call (bursts of webhooks -> 429 retry storms)
+_gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+_gemini_stream_semaphore = asyncio.Semaphore(GEMINI_STREAM_MAX_CONCURRENCY)
+
+
+async def gemini_generate(model, prompt: str):
+    """
+    await model.generate_content_async(prompt) (native async client, no
+    worker thread), with at most GEMINI_MAX_CONCURRENCY calls in flight and
+    GEMINI_TIMEOUT per attempt. Quota errors (429) are retried with
+    exponential backoff + jitter, waiting outside the semaphore.
+    """
+    from google.api_core.exceptions import ResourceExhausted
+
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        async with _gemini_semaphore:
+            try:
+                return await asyncio.wait_for(model.generate_content_async(prompt), GEMINI_TIMEOUT)
+            except ResourceExhausted:
+                if attempt == GEMINI_MAX_RETRIES:
+                    raise
+        delay = (2 ** attempt) + random.uniform(0, 1)
+        logger.warning("Gemini quota exceeded, retrying in %.1fs (attempt %s)", delay, attempt + 1)
+        await asyncio.sleep(delay)
+
+
+def build_inbound_dm_prompt(username: str, message: str, profile: Dict, score: int, classification: str) -> str:
+    """Per-lead prompt for sales_model (suggested reply to an inbound DM)"""
+    return INBOUND_DM_TEMPLATE.format_map({
+        "username": username,
+        "message": message,
+        "full_name": profile.get('full_name', 'N/A'),
+        "bio": profile.get('bio', 'N/A'),
+        "followers": f"{profile.get('followers_count') or 0:,}",
+        "is_business": 'Sim' if profile.get('is_business') else 'Não',
+        "score": score,
+        "classification": classification
+    })
+
+
+def parse_model_json(text: str) -> Any:
+    """
+    Parse a JSON answer from Gemini. The JSON-mode models never fence their
+    answer; the ```json strip is only a fallback (one startswith check otherwise).
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        for prefix in _FENCE_PREFIXES:
+            if text.startswith(prefix):
+                text = text[len(prefix):]
+                break
+        text = text.removesuffix("```").strip()
+    return orjson.loads(text)
+
+
 # ============================================
 # DM ENDPOINTS
 # ============================================
 
-@app.post("/webhook/inbound-dm", response_model=InboundDMResponse)
-async def webhook_inbound_dm(request: InboundDMRequest):
+# Profile fields returned by /webhook/inbound-dm (and stored in the lead's profile_data)
+INBOUND_PROFILE_KEYS = (
+    "username", "full_name", "bio", "followers_count", "following_count",
+    "posts_count", "is_business", "is_verified", "category"
+)
+
+
+# Outbound client for inbound-DM result callbacks (created on first use, closed in lifespan)
+_callback_client: Optional[httpx.AsyncClient] = None
+
+
+def get_callback_client() -> httpx.AsyncClient:
+    global _callback_client
+    if _callback_client is None or _callback_client.is_closed:
+        _callback_client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        )
+    return _callback_client
+
+
+def callback_host_allowed(url: str) -> bool:
+    """callback_url must be http(s) on a host listed in INBOUND_DM_CALLBACK_HOSTS"""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return False
+    return parts.scheme in ("http", "https") and (parts.hostname or "").lower() in INBOUND_DM_CALLBACK_HOSTS
+
+
+def sign_callback(body: bytes, timestamp: str) -> str:
+    """X-Signature of a callback: HMAC-SHA256 over "<timestamp>.<body>" with INBOUND_DM_CALLBACK_SECRET"""
+    mac = hmac.new(INBOUND_DM_CALLBACK_SECRET.encode(), timestamp.encode() + b"." + body, hashlib.sha256)
+    return f"sha256={mac.hexdigest()}"
+
+
+async def deliver_inbound_dm(request: InboundDMRequest, dm_id: str):
+    """
+    Background half of callback_url mode: process the DM and POST the signed result.
+    Network errors, 429 and 5xx are retried with exponential backoff (1s, 2s, 4s).
+    """
+    result = await process_inbound_dm(request)
+    result.dm_id = dm_id
+    body = orjson.dumps(result.model_dump())
+    timestamp = str(int(time.time()))
+    headers = {
+        "Content-Type": "application/json",
+        "X-Timestamp": timestamp,
+        "X-Signature": sign_callback(body, timestamp)
+    }
+
+    for attempt in range(INBOUND_DM_CALLBACK_RETRIES):
+        try:
+            response = await get_callback_client().post(request.callback_url, content=body, headers=headers)
+            if response.status_code < 500 and response.status_code != 429:
+                response.raise_for_status()
+                return
+            error = f"HTTP {response.status_code}"
+        except httpx.HTTPStatusError as e:
+            # Other 4xx: the receiver rejected it, retrying won't help
+            logger.warning("Inbound DM callback rejected for @%s (%s): %s", request.username, dm_id, e)
+            return
+        except httpx.HTTPError as e:
+            error = str(e)
+
+        if attempt + 1 < INBOUND_DM_CALLBACK_RETRIES:
+            await asyncio.sleep(2 ** attempt)
+
+    logger.warning(
+        "Inbound DM callback failed for @%s (%s) after %d attempts: %s",
+        request.username, dm_id, INBOUND_DM_CALLBACK_RETRIES, error
+    )
+
+
+@app.post("/webhook/inbound-dm", response_model=InboundDMResponse, openapi_extra=json_body_openapi(InboundDMRequest))
+async def webhook_inbound_dm(
+    background_tasks: BackgroundTasks,
+    response: Response,
+    request: InboundDMRequest = Depends(json_body(InboundDMRequest)),
+    x_api_key: str = Header(None)
+):
+    """
+    Process an inbound DM from n8n.
+    Without callback_url the result is returned in this response. With it, the
+    DM is acknowledged with 202 + dm_id within milliseconds and the same
+    InboundDMResponse is POSTed to callback_url once scrape + Gemini finish.
+    Callback mode requires X-API-Key and a callback host in INBOUND_DM_CALLBACK_HOSTS;
+    the callback is signed (X-Timestamp + X-Signature).
+    """
+    if not request.callback_url:
+        return await process_inbound_dm(request)
+
+    await verify_api_key(x_api_key)
+    if not callback_host_allowed(request.callback_url):
+        raise HTTPException(status_code=400, detail="callback_url host not allowed")
+
+    dm_id = str(uuid.uuid4())
+    background_tasks.add_task(deliver_inbound_dm, request, dm_id)
+    response.status_code = 202
+    return InboundDMResponse(success=True, username=request.username, dm_id=dm_id)
+
+
+async def process_inbound_dm(request: InboundDMRequest) -> InboundDMResponse:
     """
-    Process an inbound DM from n8n.
     Scrapes the user's profile, qualifies the lead, and saves to Supabase.
 
     Flow:
@@ -1412,7 +2328,7 @@ async def webhook_inbound_dm(request: InboundDMRequest):
     4. Generate AI classification and suggested response
     5. Return lead data with score and suggested response
     """
-    logger.info(f"Processing inbound DM from @{request.username}")
+    logger.info("Processing inbound DM from @%s", request.username)
 
     result = InboundDMResponse(
         success=False,
@@ -1420,100 +2336,91 @@ async def webhook_inbound_dm(request: InboundDMRequest):
     )
 
     try:
-        # Import the API scraper and Supabase integration
-        from instagram_api_scraper import InstagramAPIScraper
-        from supabase_integration import SocialfyAgentIntegration
-
-        # Initialize scraper and integration
-        scraper = InstagramAPIScraper()
-        integration = SocialfyAgentIntegration()
+        integration = get_integration()
 
-        # 1. Scrape the user's profile
-        logger.info(f"Scraping profile for @{request.username}")
-        profile = scraper.get_profile(request.username)
+        # 1. Scrape the user's profile (cached / coalesced per username)
+        logger.info("Scraping profile for @%s", request.username)
+        profile = await get_profile_cached(request.username)
 
         if not profile.get("success"):
             result.error = f"Failed to scrape profile: {profile.get('error', 'Unknown error')}"
             return result
 
+        # Public profile fields, extracted once (response + crm profile_data)
+        profile_summary = {key: profile.get(key) for key in INBOUND_PROFILE_KEYS}
+
         # 2. Calculate lead score
-        score_data = scraper.calculate_lead_score(profile)
+        score_data = InstagramAPIScraper.calculate_lead_score(profile)
         score = score_data.get("score", 0)
         classification = score_data.get("classification", "LEAD_COLD")
 
-        logger.info(f"Lead score for @{request.username}: {score}/100 ({classification})")
-
-        # 3. Save to Supabase
-        # Save to crm_leads
-        lead_record = integration.save_discovered_lead(
-            name=profile.get("full_name") or request.username,
-            email=profile.get("email") or f"{request.username}@instagram.com",  # Placeholder email
-            source="instagram_dm",
-            profile_data={
-                "username": request.username,
-                "bio": profile.get("bio"),
-                "followers_count": profile.get("followers_count"),
-                "following_count": profile.get("following_count"),
-                "is_business": profile.get("is_business"),
-                "is_verified": profile.get("is_verified"),
-                "score": score,
-                "status": "warm" if score >= 40 else "cold",
-                "phone": profile.get("phone") or profile.get("phone_hint"),
-                "company": profile.get("category")
-            }
-        )
-
-        # Extract lead_id from response
-        lead_id = None
-        if isinstance(lead_record, list) and lead_record:
-            lead_id = lead_record[0].get("id")
-        elif isinstance(lead_record, dict):
-            lead_id = lead_record.get("id")
+        logger.info("Lead score for @%s: %s/100 (%s)", request.username, score, classification)
 
-        # Save the received message
-        if lead_id:
-            integration.save_received_message(
-                lead_id=lead_id,
+        # 3. Save to Supabase: crm_leads row + received message in a single request
+        def save_lead_and_message():
+            lead_record = integration.save_discovered_lead_with_message(
+                name=profile.get("full_name") or request.username,
+                email=profile.get("email") or f"{request.username}@instagram.com",  # Placeholder email
+                source="instagram_dm",
+                profile_data={
+                    **profile_summary,
+                    "username": request.username,
+                    "score": score,
+                    "status": "warm" if score >= 40 else "cold",
+                    "phone": profile.get("phone") or profile.get("phone_hint"),
+                    "company": profile_summary["category"]
+                },
                 message=request.message
             )
 
+            # Extract lead_id from response
+            if isinstance(lead_record, list) and lead_record:
+                return lead_record[0].get("id")
+            if isinstance(lead_record, dict):
+                return lead_record.get("id")
+            return None
+
         # 4. Generate AI classification and suggested response using Gemini
-        suggested_response = None
-        try:
-            import google.generativeai as genai
+        async def suggest_response() -> Optional[str]:
+            suggested_response = None
+            is_business = bool(profile.get("is_business"))
 
-            api_key = os.getenv("GEMINI_API_KEY")
-            if api_key:
-                genai.configure(api_key=api_key)
-                model = genai.GenerativeModel("gemini-2.5-flash")
+            full_name = profile.get("full_name")
 
-                prompt = f"""Você é um assistente de vendas no Instagram.
+            # 4a. Near-duplicate DM already answered for this tenant? Reuse it and skip the LLM call
+            message_embedding = None
+            if OPENAI_API_KEY and DM_RESPONSE_CACHE_THRESHOLD > 0 and request.tenant_id:
+                message_embedding = await asyncio.to_thread(get_openai_embedding, request.message)
+                if message_embedding:
+                    cached = await response_cache.lookup(request.tenant_id, message_embedding, score, is_business)
+                    if cached:
+                        suggested_response = personalize(cached, request.username, full_name)
 
-Recebeu uma DM de @{request.username}:
-"{request.message}"
+            try:
+                if sales_model is not None and not suggested_response:
+                    prompt = build_inbound_dm_prompt(request.username, request.message, profile, score, classification)
 
-Perfil do lead:
-- Nome: {profile.get('full_name', 'N/A')}
-- Bio: {profile.get('bio', 'N/A')}
-- Seguidores: {profile.get('followers_count', 0):,}
-- Business: {'Sim' if profile.get('is_business') else 'Não'}
-- Score: {score}/100 ({classification})
+                    response = await gemini_generate(sales_model, prompt)
+                    suggested_response = response.text.strip()
 
-Gere uma resposta natural e amigável que:
-1. Agradeça pela mensagem
-2. Demonstre interesse genuíno
-3. Faça uma pergunta relevante para qualificar o lead
-4. Seja concisa (máx 2-3 frases)
+                    logger.info(f"Generated suggested response: {suggested_response[:50]}...")
 
-Responda APENAS com o texto da mensagem, sem explicações."""
+                    if message_embedding and suggested_response:
+                        await response_cache.store(
+                            request.tenant_id, request.message, message_embedding, score, is_business,
+                            depersonalize(suggested_response, request.username, full_name)
+                        )
 
-                response = model.generate_content(prompt)
-                suggested_response = response.text.strip()
+            except Exception as e:
+                logger.warning("Failed to generate suggested response: %s", e)
 
-                logger.info(f"Generated suggested response: {suggested_response[:50]}...")
+            return suggested_response
 
-        except Exception as e:
-            logger.warning(f"Failed to generate suggested response: {e}")
+        # The suggested response doesn't depend on the DB insert: run 3 and 4 concurrently
+        lead_id, suggested_response = await asyncio.gather(
+            asyncio.to_thread(save_lead_and_message),
+            suggest_response()
+        )
 
         # 5. Return result
         result.success = True
@@ -1521,87 +2428,120 @@ Responda APENAS com o texto da mensagem, sem explicações."""
         result.score = score
         result.classification = classification
         result.suggested_response = suggested_response
-        result.profile = {
-            "username": profile.get("username"),
-            "full_name": profile.get("full_name"),
-            "bio": profile.get("bio"),
-            "followers_count": profile.get("followers_count"),
-            "following_count": profile.get("following_count"),
-            "posts_count": profile.get("posts_count"),
-            "is_business": profile.get("is_business"),
-            "is_verified": profile.get("is_verified"),
-            "category": profile.get("category")
-        }
+        result.profile = profile_summary
 
-        logger.info(f"✅ Inbound DM processed successfully for @{request.username}")
+        logger.info("✅ Inbound DM processed successfully for @%s", request.username)
         return result
 
     except Exception as e:
-        logger.error(f"Error processing inbound DM: {e}", exc_info=True)
+        logger.error("Error processing inbound DM: %s", e, exc_info=True)
         result.error = str(e)
         return result
 
 
+@app.post("/webhook/suggest-response/stream")
+async def suggest_response_stream(request: SuggestResponseRequest):
+    """
+    Stream the suggested reply to a DM as Server-Sent Events.
+    For operator UIs that want to show the first words right away instead of
+    waiting for the full Gemini answer (/webhook/inbound-dm still returns it whole).
+
+    Events: "data: <json string chunk>" ... then "event: done".
+    """
+    if sales_model is None:
+        raise HTTPException(status_code=503, detail="GEMINI_API_KEY not configured")
+
+    prompt = build_inbound_dm_prompt(
+        request.username, request.message, request.profile or {}, request.score, request.classification
+    )
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + GEMINI_STREAM_TIMEOUT
+        try:
+            # The slot is held for the whole stream, at most GEMINI_STREAM_TIMEOUT. If the
+            # client disconnects Starlette cancels this generator and the slot is released
+            async with _gemini_stream_semaphore:
+                response = await asyncio.wait_for(
+                    sales_model.generate_content_async(prompt, stream=True),
+                    deadline - loop.time()
+                )
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), deadline - loop.time())
+                    except StopAsyncIteration:
+                        break
+                    if chunk.text:
+                        yield b"data: " + orjson.dumps(chunk.text) + b"\n\n"
+        except asyncio.TimeoutError:
+            logger.warning("Suggested response stream timed out after %ss", GEMINI_STREAM_TIMEOUT)
+            yield b"event: error\ndata: " + orjson.dumps("timeout") + b"\n\n"
+        except Exception as e:
+            logger.warning("Failed to stream suggested response: %s", e)
+            yield b"event: error\ndata: " + orjson.dumps(str(e)) + b"\n\n"
+        yield b"event: done\ndata: {}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
 @app.post("/webhook/send-dm", response_model=SendDMResponse)
 async def send_dm(request: SendDMRequest):
     """
     Send a DM to a user.
     Called by n8n for automated outreach.
     """
-    logger.info(f"Sending DM to @{request.username}")
+    logger.info("Sending DM to @%s", request.username)
 
     try:
         browser_manager = await BrowserManager.get_instance()
-        if not browser_manager.is_initialized:
-            await browser_manager.initialize(headless=True)
+        async with browser_manager.lease() as (context, page):
 
-        page = browser_manager.page
+            # Navigate to DM
+            dm_url = f"https://www.instagram.com/direct/t/{request.username}/"
+            await page.goto(dm_url, wait_until='domcontentloaded', timeout=30000)
+            await asyncio.sleep(2)
 
-        # Navigate to DM
-        dm_url = f"https://www.instagram.com/direct/t/{request.username}/"
-        await page.goto(dm_url, wait_until='domcontentloaded', timeout=30000)
-        await asyncio.sleep(2)
-
-        # Try to find and use message input
-        message_input = await page.wait_for_selector(
-            'textarea[placeholder*="Message"], div[contenteditable="true"]',
-            timeout=10000
-        )
+            # Try to find and use message input
+            message_input = await page.wait_for_selector(
+                'textarea[placeholder*="Message"], div[contenteditable="true"]',
+                timeout=10000
+            )
 
-        if message_input:
-            await message_input.fill(request.message)
-            await asyncio.sleep(0.5)
-
-            # Send
-            send_btn = await page.query_selector('button:has-text("Send")')
-            if send_btn:
-                await send_btn.click()
-                await asyncio.sleep(1)
-
-                # Log to database
-                if request.log_to_db:
-                    db.log_dm_sent({
-                        "username": request.username,
-                        "message": request.message,
-                        "tenant_id": request.tenant_id,
-                        "persona_id": request.persona_id,
-                        "sent_at": datetime.now().isoformat()
-                    })
+            if message_input:
+                await message_input.fill(request.message)
+                await asyncio.sleep(0.5)
+
+                # Send
+                send_btn = await page.query_selector('button:has-text("Send")')
+                if send_btn:
+                    await send_btn.click()
+                    await asyncio.sleep(1)
+
+                    # Log to database
+                    if request.log_to_db:
+                        await dm_sent_writer.put({
+                            "username": request.username,
+                            "message": request.message,
+                            "tenant_id": request.tenant_id,
+                            "persona_id": request.persona_id,
+                            "sent_at": datetime.now().isoformat()
+                        })
 
-                return SendDMResponse(
-                    success=True,
-                    username=request.username,
-                    message_sent=request.message
-                )
+                    return SendDMResponse(
+                        success=True,
+                        username=request.username,
+                        message_sent=request.message
+                    )
 
-        return SendDMResponse(
-            success=False,
-            username=request.username,
-            error="Could not find message input"
-        )
+            return SendDMResponse(
+                success=False,
+                username=request.username,
+                error="Could not find message input"
+            )
 
     except Exception as e:
-        logger.error(f"Error sending DM: {e}")
+        logger.error("Error sending DM: %s", e)
         return SendDMResponse(
             success=False,
             username=request.username,
@@ -1619,16 +2559,17 @@ async def classify_lead(request: ClassifyLeadRequest):
     Classify a lead using AI.
     Called by n8n when processing inbox messages.
     """
-    logger.info(f"Classifying lead: @{request.username}")
+    logger.info("Classifying lead: @%s", request.username)
 
     try:
-        # Get persona for context
-        persona = None
-        if request.persona_id:
-            persona = db.get_active_persona(request.tenant_id)
+        # Persona (for context) and whitelist check are independent: fetch both at once
+        persona_lookup = db.get_active_persona(request.tenant_id) if request.persona_id else asyncio.sleep(0)
+        persona, is_known = await asyncio.gather(
+            persona_lookup,
+            db.is_known_contact(request.tenant_id, request.username)
+        )
 
-        # Check if known contact
-        is_known = db.is_known_contact(request.tenant_id, request.username)
+        # Known contact -> not a lead
         if is_known:
             return ClassifyLeadResponse(
                 success=True,
@@ -1639,15 +2580,9 @@ async def classify_lead(request: ClassifyLeadRequest):
             )
 
         # Use Gemini for classification
-        import google.generativeai as genai
-
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+        if classifier_model is None:
             raise ValueError("GEMINI_API_KEY not configured")
 
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-2.5-flash")
-
         # Construir contexto do ICP (persona)
         persona_context = ""
         if persona:
@@ -1695,64 +2630,19 @@ Contexto da Conversa:
 - Esta é uma primeira interação orgânica
 """
 
-        prompt = f"""Você é um classificador de leads inteligente para prospecção no Instagram.
-
-LEAD: @{request.username}
-MENSAGEM RECEBIDA: "{request.message}"
-
-{profile_context}
-{origin_context}
-{persona_context}
-
-REGRAS DE CLASSIFICAÇÃO:
-1. Se temos CONTEXTO DE PERFIL (bio/especialidade), use-o para entender melhor a intenção
-2. Se a ORIGEM é "outbound" (BDR abordou), o lead está RESPONDENDO nossa prospecção:
-   - Qualquer resposta engajada = mínimo LEAD_WARM
-   - Respostas positivas/curiosas = LEAD_HOT
-   - Apenas "ok", "hum" = LEAD_COLD
-3. Se a ORIGEM é "inbound", avalie o interesse demonstrado na mensagem
-
-CATEGORIAS:
-- LEAD_HOT: Interesse claro em comprar/contratar (pergunta preço, pede info, demonstra urgência)
-- LEAD_WARM: Engajamento positivo, quer saber mais, resposta educada a prospecção
-- LEAD_COLD: Primeira interação fria, resposta vaga, sem interesse claro
-- PESSOAL: Mensagem pessoal (amigo, família, parceiro) - NÃO é lead
-- SPAM: Propaganda, bot, mensagem irrelevante
-
-PONTUAÇÃO (0-100):
-- 80-100: Lead pronto para conversão
-- 60-79: Lead qualificado, precisa mais nutrição
-- 40-59: Lead frio, baixa probabilidade
-- 0-39: Não é lead ou spam
-
-IMPORTANTE para suggested_response:
-- Se temos bio/especialidade, personalize a resposta mencionando algo do perfil
-- Se é resposta de prospecção (outbound), continue a conversa naturalmente
-- NUNCA use introduções genéricas como "Alberto Correia por aqui" ou similar
-- Seja direto e relevante ao contexto
-
-Responda APENAS em JSON:
-{{
-    "classification": "LEAD_HOT|LEAD_WARM|LEAD_COLD|PESSOAL|SPAM",
-    "score": 0-100,
-    "reasoning": "explicação curta baseada no contexto disponível",
-    "suggested_response": "resposta personalizada ou null se não aplicável"
-}}
-"""
-
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-
-        # Parse JSON
-        if response_text.startswith("```"):
-            import re
-            response_text = re.sub(r'^```json?\n?', '', response_text)
-            response_text = re.sub(r'\n?```$', '', response_text)
+        prompt = CLASSIFY_LEAD_TEMPLATE.format_map({
+            "username": request.username,
+            "message": request.message,
+            "profile_context": profile_context,
+            "origin_context": origin_context,
+            "persona_context": persona_context
+        })
 
-        result = json.loads(response_text)
+        response = await gemini_generate(classifier_model, prompt)
+        result = parse_model_json(response.text)
 
-        # Save to database
-        db.save_classified_lead({
+        # Save to database (write-behind: batched with other classifications)
+        await classified_lead_writer.put({
             "tenant_id": request.tenant_id,
             "persona_id": request.persona_id,
             "username": request.username,
@@ -1774,7 +2664,7 @@ Responda APENAS em JSON:
         )
 
     except Exception as e:
-        logger.error(f"Error classifying lead: {e}")
+        logger.error("Error classifying lead: %s", e)
         return ClassifyLeadResponse(
             success=False,
             username=request.username,
@@ -1784,13 +2674,165 @@ Responda APENAS em JSON:
         )
 
 
+# ============================================
+# CLASSIFICATION BATCHING (n8n new_message bursts)
+# ============================================
+
+# (username, message, tenant_id) waiting to be classified; created in lifespan
+classify_batch_queue: Optional[asyncio.Queue] = None
+# Batches in flight at once (each one is a Gemini call, so same cap as _gemini_semaphore)
+_classify_slots = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+
+async def run_classify_batcher():
+    """
+    Background consumer: waits for a message, collects more for up to
+    CLASSIFY_BATCH_WINDOW seconds (max CLASSIFY_BATCH_SIZE) and classifies them together.
+    Batches run concurrently, up to GEMINI_MAX_CONCURRENCY; on _WRITE_STOP the
+    in-flight batches are awaited before returning.
+    """
+    running: Set[asyncio.Task] = set()
+    while True:
+        batch = await collect_batch(classify_batch_queue, CLASSIFY_BATCH_SIZE, CLASSIFY_BATCH_WINDOW)
+        stop = _WRITE_STOP in batch
+        items = [item for item in batch if item is not _WRITE_STOP]
+
+        if items:
+            await _classify_slots.acquire()
+            task = asyncio.create_task(_classify_batch_slot(items))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+        if stop:
+            if running:
+                await asyncio.gather(*running)
+            return
+
+
+async def _classify_batch_slot(batch: List[tuple]):
+    """Classify one batch; releases the _classify_slots slot the caller acquired"""
+    try:
+        await classify_batch(batch)
+    except Exception as e:
+        logger.error("Error in classification batch: %s", e, exc_info=True)
+    finally:
+        _classify_slots.release()
+
+
+async def stop_classify_batcher(task: asyncio.Task):
+    """Classify the messages still queued, wait for in-flight batches, then stop the batcher"""
+    global classify_batch_queue
+    queue = classify_batch_queue
+    try:
+        if not task.done():
+            await asyncio.wait_for(queue.put(_WRITE_STOP), timeout=CLASSIFY_SHUTDOWN_TIMEOUT)
+        await asyncio.wait_for(task, timeout=CLASSIFY_SHUTDOWN_TIMEOUT)
+    except Exception as e:
+        logger.warning("Classification batcher did not drain cleanly: %s", e)
+    # From here on new_message events are classified inline
+    classify_batch_queue = None
+
+    # Anything queued after the stop marker
+    leftover = []
+    while not queue.empty():
+        item = queue.get_nowait()
+        if item is not _WRITE_STOP:
+            leftover.append(item)
+    tasks = []
+    for i in range(0, len(leftover), CLASSIFY_BATCH_SIZE):
+        await _classify_slots.acquire()
+        tasks.append(asyncio.create_task(_classify_batch_slot(leftover[i:i + CLASSIFY_BATCH_SIZE])))
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def classify_batch(batch: List[tuple]):
+    """Classify (username, message, tenant_id) items with one Gemini call and persist the results"""
+    # Whitelist check, one query per tenant
+    by_tenant: Dict[str, List[str]] = defaultdict(list)
+    for username, _, tenant_id in batch:
+        by_tenant[tenant_id].append(username)
+    tenants = list(by_tenant)
+    known_sets = await asyncio.gather(*(db.are_known_contacts(t, by_tenant[t]) for t in tenants))
+    known = {(t, u) for t, usernames in zip(tenants, known_sets) for u in usernames}
+
+    pending = []
+    for username, message, tenant_id in batch:
+        if (tenant_id, username) in known:
+            logger.info("Classified @%s: PESSOAL (known contact)", username)
+        else:
+            pending.append((username, message, tenant_id))
+
+    if not pending:
+        return
+
+    # Nothing to batch: regular single-lead path
+    if len(pending) == 1:
+        username, message, tenant_id = pending[0]
+        result = await classify_lead(ClassifyLeadRequest(username=username, message=message, tenant_id=tenant_id))
+        logger.info("Classified @%s: %s (score: %s)", username, result.classification, result.score)
+        return
+
+    if classifier_model is None:
+        logger.error("GEMINI_API_KEY not configured - skipping classification batch")
+        return
+
+    prompt = CLASSIFY_BATCH_HEADER.format_map({"count": len(pending)}) + "".join(
+        CLASSIFY_BATCH_ITEM.format_map({"index": i}) + CLASSIFY_LEAD_TEMPLATE.format_map({
+            "username": username,
+            "message": message,
+            "profile_context": "",
+            "origin_context": "",
+            "persona_context": ""
+        })
+        for i, (username, message, _) in enumerate(pending)
+    )
+
+    try:
+        response = await gemini_generate(classifier_model, prompt)
+        results = {int(r["index"]): r for r in parse_model_json(response.text)}
+    except Exception as e:
+        # Bad/partial batch answer: fall back to one call per lead
+        logger.warning("Batch classification failed (%s leads), classifying one by one: %s", len(pending), e)
+        await asyncio.gather(*(
+            classify_lead(ClassifyLeadRequest(username=u, message=m, tenant_id=t))
+            for u, m, t in pending
+        ))
+        return
+
+    rows = []
+    for i, (username, message, tenant_id) in enumerate(pending):
+        result = results.get(i)
+        if not result:
+            logger.warning("No classification returned for @%s", username)
+            continue
+        logger.info("Classified @%s: %s (score: %s)", username, result['classification'], result['score'])
+        rows.append({
+            "tenant_id": tenant_id,
+            "persona_id": None,
+            "username": username,
+            "original_message": message,
+            "classification": result["classification"],
+            "score": result["score"],
+            "ai_reasoning": result.get("reasoning"),
+            "suggested_response": result.get("suggested_response"),
+            "source": "dm_received"
+        })
+    await db.save_classified_leads(rows)
+
+
+# Keywords that indicate business (substring match, single pass over the bio)
+BUSINESS_KEYWORDS = ("ceo", "founder", "empreendedor", "empresa", "negócio", "digital", "marketing")
+_BUSINESS_KEYWORDS_RE = re.compile("|".join(map(re.escape, BUSINESS_KEYWORDS)), re.IGNORECASE)
+
+
 @app.post("/webhook/enrich-lead")
 async def enrich_lead(request: EnrichLeadRequest):
     """
     Enrich a lead with profile data.
     Combines scraping + classification.
     """
-    logger.info(f"Enriching lead: @{request.username}")
+    logger.info("Enriching lead: @%s", request.username)
 
     # First, scrape profile
     profile_response = await scrape_profile(ScrapeProfileRequest(
@@ -1822,14 +2864,8 @@ async def enrich_lead(request: EnrichLeadRequest):
         score += 10
 
     bio = profile_response.get("bio", "")
-    if bio:
-        # Keywords that indicate business
-        business_keywords = ["ceo", "founder", "empreendedor", "empresa", "negócio", "digital", "marketing"]
-        bio_lower = bio.lower()
-        for keyword in business_keywords:
-            if keyword in bio_lower:
-                score += 5
-                break
+    if bio and _BUSINESS_KEYWORDS_RE.search(bio):
+        score += 5
 
     return {
         "success": True,
@@ -1845,7 +2881,7 @@ async def enrich_lead(request: EnrichLeadRequest):
             "category": profile_response.get("category")
         },
         "lead_score": min(score, 100),
-        "enriched_at": datetime.now().isoformat()
+        "enriched_at": now_iso()
     }
 
 
@@ -1863,52 +2899,48 @@ async def check_inbox(request: CheckInboxRequest):
 
     try:
         browser_manager = await BrowserManager.get_instance()
-        if not browser_manager.is_initialized:
-            await browser_manager.initialize(headless=True)
-
-        page = browser_manager.page
-
-        # Navigate to inbox
-        await page.goto('https://www.instagram.com/direct/inbox/', wait_until='domcontentloaded', timeout=30000)
-        await asyncio.sleep(3)
-
-        # Extract conversations
-        conversations = await page.evaluate('''() => {
-            const convs = [];
-            const items = document.querySelectorAll('div[role="listitem"], div[class*="conversation"]');
-
-            items.forEach((item, index) => {
-                if (index >= 20) return;  // Limit
-
-                const usernameEl = item.querySelector('span[dir="auto"]');
-                const previewEl = item.querySelectorAll('span[dir="auto"]')[1];
-                const unreadEl = item.querySelector('div[class*="unread"], span[class*="badge"]');
-
-                if (usernameEl) {
-                    convs.push({
-                        username: usernameEl.textContent?.trim(),
-                        preview: previewEl?.textContent?.trim() || '',
-                        has_unread: !!unreadEl
-                    });
+        async with browser_manager.lease() as (context, page):
+
+            # Navigate to inbox
+            await page.goto('https://www.instagram.com/direct/inbox/', wait_until='domcontentloaded', timeout=30000)
+            await asyncio.sleep(3)
+
+            # Extract conversations: first 20 items, one span lookup each;
+            # only the unread ones are sent back to Python (plus the total)
+            inbox = await page.evaluate('''() => {
+                const items = Array.from(
+                    document.querySelectorAll('div[role="listitem"], div[class*="conversation"]')
+                ).slice(0, 20);
+                let total = 0;
+                const unread = [];
+
+                for (const item of items) {
+                    const spans = item.querySelectorAll('span[dir="auto"]');
+                    if (!spans.length) continue;
+                    total++;
+                    if (item.querySelector('div[class*="unread"], span[class*="badge"]')) {
+                        unread.push({
+                            username: spans[0].textContent?.trim(),
+                            preview: spans[1]?.textContent?.trim() || '',
+                            has_unread: true
+                        });
+                    }
                 }
-            });
 
-            return convs;
-        }''')
+                return {total, unread};
+            }''')
+            unread = inbox["unread"]
 
-        # Filter only unread
-        unread = [c for c in conversations if c.get('has_unread')]
-
-        return {
-            "success": True,
-            "total_conversations": len(conversations),
-            "unread_count": len(unread),
-            "unread_conversations": unread,
-            "checked_at": datetime.now().isoformat()
-        }
+            return {
+                "success": True,
+                "total_conversations": inbox["total"],
+                "unread_count": len(unread),
+                "unread_conversations": unread,
+                "checked_at": now_iso()
+            }
 
     except Exception as e:
-        logger.error(f"Error checking inbox: {e}")
+        logger.error("Error checking inbox: %s", e)
         return {
             "success": False,
             "error": str(e)
@@ -1929,7 +2961,7 @@ async def n8n_webhook(payload: WebhookPayload, background_tasks: BackgroundTasks
     event = payload.event or payload.action or "generic"
     data = payload.data or {}
 
-    logger.info(f"Received n8n webhook: {event}")
+    logger.info("Received n8n webhook: %s", event)
 
     event_handlers = {
         "new_message": handle_new_message,
@@ -1953,6 +2985,11 @@ async def handle_new_message(data: Dict, tenant_id: str):
     message = data.get("message_text")
 
     if username and message:
+        # Bursts of events share one Gemini call (see run_classify_batcher)
+        if classify_batch_queue is not None:
+            await classify_batch_queue.put((username, message, tenant_id))
+            return
+
         # Classify and potentially auto-respond
         result = await classify_lead(ClassifyLeadRequest(
             username=username,
@@ -1960,7 +2997,7 @@ async def handle_new_message(data: Dict, tenant_id: str):
             tenant_id=tenant_id
         ))
 
-        logger.info(f"Classified @{username}: {result.classification} (score: {result.score})")
+        logger.info("Classified @%s: %s (score: %s)", username, result.classification, result.score)
 
 
 async def handle_new_follower(data: Dict, tenant_id: str):
@@ -1980,7 +3017,7 @@ async def handle_post_liked(data: Dict, tenant_id: str):
     post_url = data.get("post_url")
 
     if username:
-        db.save_lead({
+        await db.save_lead({
             "username": username,
             "source": "post_like",
             "source_url": post_url,
@@ -2055,22 +3092,13 @@ async def get_leads(
         if search:
             params["or"] = f"(username.ilike.%{search}%,full_name.ilike.%{search}%)"
 
-        # Get leads
-        response = requests.get(
-            f"{db.base_url}/agentic_instagram_leads",
-            headers=db.headers,
-            params=params
-        )
-        leads = response.json() if response.status_code == 200 else []
-
-        # Get total count for pagination
-        count_headers = {**db.headers, "Prefer": "count=exact"}
+        # Get leads + total count for pagination (concurrent, non-blocking)
         count_params = {k: v for k, v in params.items() if k not in ["limit", "offset", "order"]}
-        count_response = requests.head(
-            f"{db.base_url}/agentic_instagram_leads",
-            headers=count_headers,
-            params=count_params
+        response, count_response = await asyncio.gather(
+            db.client.get(db._LEADS, params=params),
+            db.client.head(db._LEADS, params=count_params, headers={"Prefer": "count=exact"})
         )
+        leads = orjson.loads(response.content) if response.status_code == 200 else []
 
         # Parse total from Content-Range header
         content_range = count_response.headers.get("Content-Range", "0-0/0")
@@ -2105,7 +3133,7 @@ async def get_leads(
         }
 
     except Exception as e:
-        logger.error(f"Error fetching leads: {e}")
+        logger.error("Error fetching leads: %s", e)
         return {"success": False, "error": str(e), "data": [], "pagination": None}
 
 
@@ -2153,30 +3181,17 @@ async def get_classified_leads(
             params["classification"] = f"eq.{classification}"
         if tenant_id:
             params["tenant_id"] = f"eq.{tenant_id}"
+        # Score range filtered in Postgres, so pages stay full and the total matches the filter
+        if min_score > 0 or max_score < 100:
+            params["and"] = f"(score.gte.{min_score},score.lte.{max_score})"
 
-        # Get leads
-        response = requests.get(
-            f"{db.base_url}/classified_leads",
-            headers=db.headers,
-            params=params
-        )
-        leads = response.json() if response.status_code == 200 else []
-
-        # Filter by score in Python (score column may not exist in all records)
-        if leads and (min_score > 0 or max_score < 100):
-            leads = [
-                l for l in leads
-                if min_score <= l.get("score", 0) <= max_score
-            ]
-
-        # Get total count
-        count_headers = {**db.headers, "Prefer": "count=exact"}
+        # Get leads + total count (concurrent, non-blocking)
         count_params = {k: v for k, v in params.items() if k not in ["limit", "offset", "order"]}
-        count_response = requests.head(
-            f"{db.base_url}/classified_leads",
-            headers=count_headers,
-            params=count_params
+        response, count_response = await asyncio.gather(
+            db.client.get(db._CLASSIFIED_LEADS, params=params),
+            db.client.head(db._CLASSIFIED_LEADS, params=count_params, headers={"Prefer": "count=exact"})
         )
+        leads = orjson.loads(response.content) if response.status_code == 200 else []
 
         content_range = count_response.headers.get("Content-Range", "0-0/0")
         try:
@@ -2210,7 +3225,7 @@ async def get_classified_leads(
         }
 
     except Exception as e:
-        logger.error(f"Error fetching classified leads: {e}")
+        logger.error("Error fetching classified leads: %s", e)
         return {"success": False, "error": str(e), "data": [], "pagination": None}
 
 
@@ -2261,14 +3276,10 @@ async def get_activity_history(
         if end_date:
             dm_params["sent_at"] = f"lte.{end_date}"
 
-        dm_response = requests.get(
-            f"{db.base_url}/agentic_instagram_dm_sent",
-            headers=db.headers,
-            params=dm_params
-        )
+        dm_response = await db.client.get(db._DM_SENT, params=dm_params)
 
         if dm_response.status_code == 200:
-            for dm in dm_response.json():
+            for dm in orjson.loads(dm_response.content):
                 all_history.append({
                     "event_type": "dm_sent",
                     "timestamp": dm.get("sent_at"),
@@ -2291,14 +3302,10 @@ async def get_activity_history(
             if username:
                 lead_params["username"] = f"eq.{username}"
 
-            leads_response = requests.get(
-                f"{db.base_url}/classified_leads",
-                headers=db.headers,
-                params=lead_params
-            )
+            leads_response = await db.client.get(db._CLASSIFIED_LEADS, params=lead_params)
 
             if leads_response.status_code == 200:
-                for lead in leads_response.json():
+                for lead in orjson.loads(leads_response.content):
                     all_history.append({
                         "event_type": "lead_classified",
                         "timestamp": lead.get("created_at"),
@@ -2346,7 +3353,7 @@ async def get_activity_history(
         }
 
     except Exception as e:
-        logger.error(f"Error fetching history: {e}")
+        logger.error("Error fetching history: %s", e)
         return {"success": False, "error": str(e), "data": [], "pagination": None}
 
 
@@ -2358,37 +3365,45 @@ async def get_activity_history(
 async def get_stats(tenant_id: Optional[str] = None):
     """Get overall statistics"""
     try:
-        # Count leads by source
-        leads_response = requests.get(
-            f"{db.base_url}/agentic_instagram_leads",
-            headers=db.headers,
-            params={"select": "source"}
-        )
-        leads = leads_response.json()
-
-        sources = {}
-        for lead in leads:
-            source = lead.get("source", "unknown")
-            sources[source] = sources.get(source, 0) + 1
-
-        # Count DMs sent today
+        # Count leads by source (GROUP BY in Postgres) + DMs sent today (count only), concurrently
         today = datetime.now().strftime("%Y-%m-%d")
-        dms_response = requests.get(
-            f"{db.base_url}/agentic_instagram_dm_sent",
-            headers=db.headers,
-            params={"sent_at": f"gte.{today}"}
+        sources_response, dms_response = await asyncio.gather(
+            db.client.post("/rpc/stats_by_source", json={}),
+            db.client.head(
+                db._DM_SENT,
+                params={"sent_at": f"gte.{today}"},
+                headers={"Prefer": "count=exact"}
+            )
         )
+        if rpc_missing(sources_response):
+            # Migration 004 not run: count the source column client-side
+            logger.warning("stats_by_source RPC missing, counting leads by source client-side")
+            leads_response = await db.client.get(db._LEADS, params={"select": "source"})
+            leads_response.raise_for_status()
+            sources = {}
+            for lead in orjson.loads(leads_response.content):
+                source = lead.get("source") or "unknown"
+                sources[source] = sources.get(source, 0) + 1
+        else:
+            sources_response.raise_for_status()
+            sources = {row["source"]: row["count"] for row in orjson.loads(sources_response.content)}
+
+        content_range = dms_response.headers.get("Content-Range", "*/0")
+        try:
+            dms_sent_today = int(content_range.split("/")[-1])
+        except ValueError:
+            dms_sent_today = 0
 
         return {
             "success": True,
-            "total_leads": len(leads),
+            "total_leads": sum(sources.values()),
             "leads_by_source": sources,
-            "dms_sent_today": len(dms_response.json()),
-            "timestamp": datetime.now().isoformat()
+            "dms_sent_today": dms_sent_today,
+            "timestamp": now_iso()
         }
 
     except Exception as e:
-        logger.error(f"Error fetching stats: {e}")
+        logger.error("Error fetching stats: %s", e)
         return {"success": False, "error": str(e)}
 
 
@@ -2435,7 +3450,7 @@ async def rag_ingest(request: RAGIngestRequest):
 
     try:
         # 1. Generate embedding
-        embedding = get_openai_embedding(f"{request.title}\n\n{request.content}")
+        embedding = await asyncio.to_thread(get_openai_embedding, f"{request.title}\n\n{request.content}")
 
         if not embedding:
             return RAGIngestResponse(
@@ -2445,16 +3460,15 @@ async def rag_ingest(request: RAGIngestRequest):
             )
 
         # 2. Check if knowledge with same title exists
-        check_response = requests.get(
-            f"{db.base_url}/rag_knowledge",
-            headers=db.headers,
+        check_response = await db.client.get(
+            "/rag_knowledge",
             params={
                 "title": f"eq.{request.title}",
                 "select": "id"
             }
         )
 
-        existing = check_response.json() if check_response.status_code == 200 else []
+        existing = orjson.loads(check_response.content) if check_response.status_code == 200 else []
 
         # 3. Prepare data
         knowledge_data = {
@@ -2472,9 +3486,8 @@ async def rag_ingest(request: RAGIngestRequest):
         if existing:
             # Update existing
             knowledge_id = existing[0]["id"]
-            response = requests.patch(
-                f"{db.base_url}/rag_knowledge",
-                headers=db.headers,
+            response = await db.client.patch(
+                "/rag_knowledge",
                 params={"id": f"eq.{knowledge_id}"},
                 json=knowledge_data
             )
@@ -2482,14 +3495,13 @@ async def rag_ingest(request: RAGIngestRequest):
             # Insert new
             knowledge_data["created_at"] = datetime.now().isoformat()
             knowledge_data["created_by"] = "api-server"
-            response = requests.post(
-                f"{db.base_url}/rag_knowledge",
-                headers=db.headers,
+            response = await db.client.post(
+                "/rag_knowledge",
                 json=knowledge_data
             )
 
         if response.status_code in [200, 201]:
-            result = response.json()
+            result = orjson.loads(response.content)
             knowledge_id = result[0]["id"] if result else existing[0]["id"] if existing else None
 
             logger.info(f"RAG Ingest success: {knowledge_id}")
@@ -2525,7 +3537,7 @@ async def rag_search(request: RAGSearchRequest):
 
     try:
         # 1. Generate embedding for query
-        query_embedding = get_openai_embedding(request.query)
+        query_embedding = await asyncio.to_thread(get_openai_embedding, request.query)
 
         if not query_embedding:
             return RAGSearchResponse(
@@ -2548,14 +3560,10 @@ async def rag_search(request: RAGSearchRequest):
         if request.tags:
             rpc_payload["filter_tags"] = request.tags
 
-        response = requests.post(
-            f"{SUPABASE_URL}/rest/v1/rpc/search_rag_knowledge",
-            headers=db.headers,
-            json=rpc_payload
-        )
+        response = await db.client.post("/rpc/search_rag_knowledge", json=rpc_payload)
 
         if response.status_code == 200:
-            results = response.json()
+            results = orjson.loads(response.content)
 
             # Convert to response model
             search_results = [
@@ -2572,16 +3580,15 @@ async def rag_search(request: RAGSearchRequest):
                 for r in results
             ]
 
-            # Increment usage count for returned results
-            for r in results:
-                try:
-                    requests.post(
-                        f"{SUPABASE_URL}/rest/v1/rpc/increment_rag_usage",
-                        headers=db.headers,
-                        json={"knowledge_id": r["id"]}
-                    )
-                except:
-                    pass  # Non-critical, don't fail search
+            # Increment usage count for returned results (concurrently)
+            # Non-critical: failures are swallowed, don't fail search
+            await asyncio.gather(
+                *(
+                    db.client.post("/rpc/increment_rag_usage", json={"knowledge_id": r["id"]})
+                    for r in results
+                ),
+                return_exceptions=True
+            )
 
             logger.info(f"RAG Search found {len(search_results)} results")
             return RAGSearchResponse(
@@ -2612,26 +3619,28 @@ async def rag_categories():
     logger.info("RAG Categories: listing")
 
     try:
-        # Query distinct categories with counts
-        response = requests.get(
-            f"{db.base_url}/rag_knowledge",
-            headers=db.headers,
-            params={"select": "category"}
-        )
-
-        if response.status_code == 200:
-            data = response.json()
+        # Counts by category (GROUP BY in Postgres, largest first)
+        response = await db.client.post("/rpc/rag_category_counts", json={})
 
-            # Count by category
-            category_counts = {}
-            for item in data:
-                cat = item.get("category", "unknown")
-                category_counts[cat] = category_counts.get(cat, 0) + 1
+        if rpc_missing(response):
+            # Migration 008 not run: count the category column client-side
+            logger.warning("rag_category_counts RPC missing, counting categories client-side")
+            response = await db.client.get("/rag_knowledge", params={"select": "category"})
+            if response.status_code == 200:
+                category_counts = {}
+                for item in orjson.loads(response.content):
+                    cat = item.get("category", "unknown")
+                    category_counts[cat] = category_counts.get(cat, 0) + 1
+                return RAGCategoriesResponse(
+                    success=True,
+                    categories=[
+                        {"category": cat, "count": count}
+                        for cat, count in sorted(category_counts.items(), key=lambda x: -x[1])
+                    ]
+                )
 
-            categories = [
-                {"category": cat, "count": count}
-                for cat, count in sorted(category_counts.items(), key=lambda x: -x[1])
-            ]
+        if response.status_code == 200:
+            categories = orjson.loads(response.content)
 
             return RAGCategoriesResponse(
                 success=True,
@@ -2658,14 +3667,13 @@ async def rag_stats():
     """
     try:
         # Count total knowledge
-        response = requests.get(
-            f"{db.base_url}/rag_knowledge",
-            headers=db.headers,
+        response = await db.client.get(
+            "/rag_knowledge",
             params={"select": "id,category,project_key,usage_count,created_at"}
         )
 
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
 
             # Calculate stats
             total = len(data)
@@ -2686,7 +3694,7 @@ async def rag_stats():
                 "total_usage": total_usage,
                 "by_category": by_category,
                 "by_project": by_project,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": now_iso()
             }
         else:
             return {"success": False, "error": response.text}
@@ -2936,7 +3944,6 @@ class MatchLeadContextResponse(BaseModel):
 
 def normalize_phone(phone: str) -> str:
     """Normaliza telefone para formato internacional."""
-    import re
     if not phone:
         return ""
     # Remove tudo que não é dígito
@@ -2998,16 +4005,15 @@ async def match_lead_context(request: MatchLeadContextRequest):
         # ============================================
         if request.ghl_contact_id:
             try:
-                response = requests.get(
-                    f"{db.base_url}/growth_leads",
-                    headers=db.headers,
+                response = await db.client.get(
+                    "/growth_leads",
                     params={
                         "ghl_contact_id": f"eq.{request.ghl_contact_id}",
                         "limit": 1
                     }
                 )
                 if response.status_code == 200:
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     if data:
                         lead = data[0]
                         match_source = "ghl_synced"
@@ -3021,16 +4027,15 @@ async def match_lead_context(request: MatchLeadContextRequest):
         if not lead and phone_normalized:
             try:
                 # Tentar em growth_leads
-                response = requests.get(
-                    f"{db.base_url}/growth_leads",
-                    headers=db.headers,
+                response = await db.client.get(
+                    "/growth_leads",
                     params={
                         "phone": f"eq.{phone_normalized}",
                         "limit": 1
                     }
                 )
                 if response.status_code == 200:
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     if data:
                         lead = data[0]
                         match_source = "agenticos_prospecting"
@@ -3038,16 +4043,15 @@ async def match_lead_context(request: MatchLeadContextRequest):
 
                 # Fallback: crm_leads
                 if not lead:
-                    response = requests.get(
-                        f"{db.base_url}/crm_leads",
-                        headers=db.headers,
+                    response = await db.client.get(
+                        "/crm_leads",
                         params={
                             "phone": f"eq.{phone_normalized}",
                             "limit": 1
                         }
                     )
                     if response.status_code == 200:
-                        data = response.json()
+                        data = orjson.loads(response.content)
                         if data:
                             lead = data[0]
                             match_source = "agenticos_crm"
@@ -3060,16 +4064,15 @@ async def match_lead_context(request: MatchLeadContextRequest):
         # ============================================
         if not lead and email_normalized:
             try:
-                response = requests.get(
-                    f"{db.base_url}/growth_leads",
-                    headers=db.headers,
+                response = await db.client.get(
+                    "/growth_leads",
                     params={
                         "email": f"eq.{email_normalized}",
                         "limit": 1
                     }
                 )
                 if response.status_code == 200:
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     if data:
                         lead = data[0]
                         match_source = "agenticos_prospecting"
@@ -3082,16 +4085,15 @@ async def match_lead_context(request: MatchLeadContextRequest):
         # ============================================
         if not lead and ig_handle_normalized:
             try:
-                response = requests.get(
-                    f"{db.base_url}/growth_leads",
-                    headers=db.headers,
+                response = await db.client.get(
+                    "/growth_leads",
                     params={
                         "instagram_username": f"eq.{ig_handle_normalized}",
                         "limit": 1
                     }
                 )
                 if response.status_code == 200:
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     if data:
                         lead = data[0]
                         match_source = "agenticos_prospecting"
@@ -3106,16 +4108,15 @@ async def match_lead_context(request: MatchLeadContextRequest):
             try:
                 # Remove @ para busca
                 handle_clean = ig_handle_normalized.lstrip("@")
-                response = requests.get(
-                    f"{db.base_url}/agentic_instagram_leads",
-                    headers=db.headers,
+                response = await db.client.get(
+                    "/agentic_instagram_leads",
                     params={
                         "username": f"eq.{handle_clean}",
                         "limit": 1
                     }
                 )
                 if response.status_code == 200:
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     if data:
                         # Converter formato
                         ig_lead = data[0]
@@ -3155,18 +4156,33 @@ async def match_lead_context(request: MatchLeadContextRequest):
         # BUSCAR DADOS ENRIQUECIDOS
         # ============================================
         lead_id = lead.get("id")
+        conversation_history = []
         if lead_id:
-            try:
-                response = requests.get(
-                    f"{db.base_url}/enriched_lead_data",
-                    headers=db.headers,
+            # Enriched data e histórico são independentes: buscar em paralelo
+            enriched_response, history_response = await asyncio.gather(
+                db.client.get(
+                    "/enriched_lead_data",
                     params={
                         "lead_id": f"eq.{lead_id}",
                         "order": "created_at.desc"
                     }
-                )
-                if response.status_code == 200:
-                    enriched_list = response.json()
+                ),
+                db.client.get(
+                    "/agent_conversations",
+                    params={
+                        "or": f"(lead_id.eq.{lead_id},contact_id.eq.{lead_id})",
+                        "order": "created_at.desc",
+                        "limit": 10
+                    }
+                ),
+                return_exceptions=True
+            )
+
+            try:
+                if isinstance(enriched_response, Exception):
+                    raise enriched_response
+                if enriched_response.status_code == 200:
+                    enriched_list = orjson.loads(enriched_response.content)
 
                     # Consolidar dados de múltiplas fontes
                     for e in enriched_list:
@@ -3185,23 +4201,14 @@ async def match_lead_context(request: MatchLeadContextRequest):
             except Exception as e:
                 logger.warning(f"Erro buscando enriched_data: {e}")
 
-        # ============================================
-        # BUSCAR HISTÓRICO DE CONVERSAS
-        # ============================================
-        conversation_history = []
-        if lead_id:
+            # ============================================
+            # HISTÓRICO DE CONVERSAS
+            # ============================================
             try:
-                response = requests.get(
-                    f"{db.base_url}/agent_conversations",
-                    headers=db.headers,
-                    params={
-                        "or": f"(lead_id.eq.{lead_id},contact_id.eq.{lead_id})",
-                        "order": "created_at.desc",
-                        "limit": 10
-                    }
-                )
-                if response.status_code == 200:
-                    convs = response.json()
+                if isinstance(history_response, Exception):
+                    raise history_response
+                if history_response.status_code == 200:
+                    convs = orjson.loads(history_response.content)
                     for c in convs:
                         conversation_history.append({
                             "role": c.get("role", "unknown"),
@@ -3312,9 +4319,8 @@ async def match_lead_context(request: MatchLeadContextRequest):
             if ig_username:
                 try:
                     # Buscar o follower na tabela new_followers_detected
-                    response = requests.get(
-                        f"{db.base_url}/new_followers_detected",
-                        headers=db.headers,
+                    response = await db.client.get(
+                        "/new_followers_detected",
                         params={
                             "follower_username": f"eq.{ig_username}",
                             "outreach_status": "eq.sent",
@@ -3322,13 +4328,12 @@ async def match_lead_context(request: MatchLeadContextRequest):
                         }
                     )
                     if response.status_code == 200:
-                        followers = response.json()
+                        followers = orjson.loads(response.content)
                         if followers:
                             follower_id = followers[0].get("id")
                             # Atualizar para responded
-                            update_response = requests.patch(
-                                f"{db.base_url}/new_followers_detected",
-                                headers=db.headers,
+                            update_response = await db.client.patch(
+                                "/new_followers_detected",
                                 params={"id": f"eq.{follower_id}"},
                                 json={
                                     "outreach_status": "responded",
@@ -3436,14 +4441,16 @@ async def auto_enrich_lead(request: AutoEnrichRequest):
         # PASSO 2: Se tiver ig_handle, fazer scrape
         # ============================================
         ig_handle = request.ig_handle
+        # Um scraper (uma session do pool) para o lookup por ig_id e o scrape;
+        # as chamadas são síncronas (requests), então rodam em worker threads
+        scraper = None
 
         # Tentar extrair do ig_id se não tiver handle
         if not ig_handle and request.ig_id:
             # Tentar buscar username via API do Instagram
             try:
-                from instagram_api_scraper import InstagramAPIScraper
-                scraper = InstagramAPIScraper()
-                user_info = scraper.get_user_by_id(request.ig_id)
+                scraper = await asyncio.to_thread(InstagramAPIScraper)
+                user_info = await asyncio.to_thread(scraper.get_user_by_id, request.ig_id)
                 if user_info and user_info.get("username"):
                     ig_handle = user_info.get("username")
                     logger.info(f"Username encontrado via ig_id: @{ig_handle}")
@@ -3467,11 +4474,7 @@ async def auto_enrich_lead(request: AutoEnrichRequest):
         # PASSO 3: Fazer scrape do perfil
         # ============================================
         try:
-            from instagram_api_scraper import InstagramAPIScraper
-            from supabase_integration import SocialfyAgentIntegration
-
-            scraper = InstagramAPIScraper()
-            profile = scraper.get_profile(ig_handle)
+            profile = await get_profile_cached(ig_handle, scraper)
 
             if not profile.get("success"):
                 logger.warning(f"Falha no scrape de @{ig_handle}: {profile.get('error')}")
@@ -3482,17 +4485,18 @@ async def auto_enrich_lead(request: AutoEnrichRequest):
                 )
 
             # Calcular score
-            score_data = scraper.calculate_lead_score(profile)
+            score_data = InstagramAPIScraper.calculate_lead_score(profile)
 
             # ============================================
             # PASSO 4: Salvar no banco
             # ============================================
-            integration = SocialfyAgentIntegration()
+            integration = get_integration()
 
             lead_name = profile.get("full_name") or request.first_name or ig_handle
             lead_email = request.email or profile.get("email") or f"{ig_handle}@instagram.lead"
 
-            saved_lead = integration.save_discovered_lead(
+            saved_lead = await asyncio.to_thread(
+                integration.save_discovered_lead,
                 name=lead_name,
                 email=lead_email,
                 source=request.source_channel or "inbound_dm",
@@ -3679,13 +4683,7 @@ async def analyze_conversation_context(request: ConversationContextRequest):
         if request.conversation_count is None or request.conversation_count <= 1:
             # Analisar mensagem com Gemini para classificar
             try:
-                import google.generativeai as genai
-
-                gemini_key = os.getenv("GEMINI_API_KEY")
-                if gemini_key:
-                    genai.configure(api_key=gemini_key)
-                    model = genai.GenerativeModel("gemini-2.0-flash")
-
+                if context_model is not None:
                     prompt = f"""Analise esta primeira mensagem de um contato e classifique:
 
 MENSAGEM: "{request.current_message}"
@@ -3699,13 +4697,13 @@ Classifique como:
 Responda APENAS com o formato JSON:
 {{"classification": "TIPO", "confidence": 0.X, "reason": "explicação breve"}}"""
 
-                    response = model.generate_content(prompt)
+                    response = await gemini_generate(context_model, prompt)
                     response_text = response.text.strip()
 
                     # Parse JSON da resposta
                     if "{" in response_text:
                         json_str = response_text[response_text.find("{"):response_text.rfind("}")+1]
-                        analysis = json.loads(json_str)
+                        analysis = orjson.loads(json_str)
 
                         classification = analysis.get("classification", "UNCLEAR")
                         confidence = analysis.get("confidence", 0.5)
@@ -4145,19 +5143,15 @@ async def api_health_check():
         }
     }
 
-    # Check Supabase connection
+    # Check Supabase connection (pooled async client, doesn't block the loop)
     try:
-        test_response = requests.get(
-            f"{SUPABASE_URL}/rest/v1/",
-            headers={"apikey": SUPABASE_KEY},
-            timeout=5
-        )
+        test_response = await db.client.get("/", timeout=5)
         if test_response.status_code < 500:
             health["connections"]["supabase"] = {"status": "connected", "latency_ms": int(test_response.elapsed.total_seconds() * 1000)}
         else:
             health["connections"]["supabase"] = {"status": "error", "code": test_response.status_code}
             health["status"] = "degraded"
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         health["connections"]["supabase"] = {"status": "timeout"}
         health["status"] = "degraded"
     except Exception as e:
@@ -4165,19 +5159,20 @@ async def api_health_check():
         health["status"] = "degraded"
 
     # Check GHL configuration
-    ghl_key = os.getenv("GHL_API_KEY") or os.getenv("GHL_ACCESS_TOKEN")
-    health["connections"]["ghl"] = {"status": "configured" if ghl_key else "not_configured"}
+    health["connections"]["ghl"] = {"status": "configured" if GHL_API_KEY else "not_configured"}
 
     # Check OpenAI configuration
     health["connections"]["openai"] = {"status": "configured" if OPENAI_API_KEY else "not_configured"}
 
     # System resources (if psutil available)
     try:
+        # interval=None: CPU usage since the previous call, no 100ms sleep on the event loop
+        memory = psutil.virtual_memory()
         health["system"] = {
-            "cpu_percent": psutil.cpu_percent(interval=0.1),
+            "cpu_percent": psutil.cpu_percent(interval=None),
             "memory": {
-                "percent": psutil.virtual_memory().percent,
-                "available_mb": round(psutil.virtual_memory().available / (1024 * 1024), 2)
+                "percent": memory.percent,
+                "available_mb": round(memory.available / (1024 * 1024), 2)
             },
             "disk": {
                 "percent": psutil.disk_usage('/').percent
@@ -4196,7 +5191,7 @@ async def get_api_metrics():
     Useful for monitoring and dashboards.
     """
     return {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now_iso(),
         "rate_limiter": rate_limiter.get_stats(),
         "requests": {
             "total": request_metrics["total_requests"],
@@ -4688,6 +5683,8 @@ async def portal_ensure_tenant(
             location_id=location_id,
             client_name=client_name
         )
+        # Tenant pode ter sido criado fora do SupabaseClient: descartar lookup negativo em cache
+        db.invalidate_tenant(location_id)
         return result
 
     except Exception as e:
@@ -4695,6 +5692,16 @@ async def portal_ensure_tenant(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/tenants/{tenant_id}/invalidate-cache", dependencies=[Depends(verify_api_key)])
+async def invalidate_tenant_cache(tenant_id: str):
+    """
+    Descarta tenant/persona/whitelist em cache (UUID ou slug).
+    Chamar após editar tenants/personas/contatos direto no Supabase, em vez de esperar o TTL.
+    """
+    db.invalidate_tenant(tenant_id)
+    return {"success": True, "tenant_id": tenant_id}
+
+
 # ============================================
 # SESSION POOL MANAGEMENT ENDPOINTS
 # ============================================
@@ -4981,8 +5988,6 @@ async def start_campaign(
         campaign_id: ID único da campanha para tracking
         status: Status atual (pending, running, completed, failed)
     """
-    import uuid
-
     campaign_id = str(uuid.uuid4())[:8]
 
     logger.info(f"🚀 Starting campaign {campaign_id}: {request.name}")
@@ -5076,7 +6081,11 @@ async def start_campaign(
 
             try:
                 from instagram_dm_agent import InstagramDMAgent
-                agent = InstagramDMAgent(tenant_id=request.tenant_id, headless=True)
+                # Reusa o Chromium do BrowserManager; a campanha só abre o próprio context
+                browser_manager = await BrowserManager.get_instance()
+                await browser_manager.initialize(headless=True)
+                agent = InstagramDMAgent(tenant_id=request.tenant_id, headless=True,
+                                         browser=browser_manager.browser)
 
                 # CRITICAL: Initialize agent and load account from database
                 await agent.start()
@@ -5297,7 +6306,7 @@ async def detect_new_followers_endpoint(request: DetectNewFollowersRequest):
             success=False,
             account_id=request.account_id,
             error=str(e),
-            detected_at=datetime.now().isoformat()
+            detected_at=now_iso()
         )
 
 
@@ -5643,12 +6652,8 @@ async def run_auto_outreach(
         if request.account_id:
             filters["id"] = f"eq.{request.account_id}"
 
-        accounts_resp = requests.get(
-            f"{db.base_url}/instagram_accounts",
-            headers=db.headers,
-            params={"select": "*", **filters}
-        )
-        accounts_response = accounts_resp.json() if accounts_resp.status_code == 200 else []
+        accounts_resp = await db.client.get("/instagram_accounts", params={"select": "*", **filters})
+        accounts_response = orjson.loads(accounts_resp.content) if accounts_resp.status_code == 200 else []
 
         if not accounts_response:
             logger.info("Nenhuma conta com outreach habilitado encontrada")
@@ -5680,18 +6685,11 @@ async def run_auto_outreach(
             try:
                 # Verificar quantos ja foram enviados hoje
                 today = datetime.now().date().isoformat()
-                sent_today_resp = requests.get(
-                    f"{db.base_url}/new_followers_detected",
-                    headers=db.headers,
-                    params={
-                        "select": "id",
-                        "account_id": f"eq.{account_id}",
-                        "outreach_status": "eq.sent",
-                        "outreach_sent_at": f"gte.{today}T00:00:00"
-                    }
-                )
-                sent_today_response = sent_today_resp.json() if sent_today_resp.status_code == 200 else []
-                sent_today = len(sent_today_response)
+                sent_today = await db.count("/new_followers_detected", {
+                    "account_id": f"eq.{account_id}",
+                    "outreach_status": "eq.sent",
+                    "outreach_sent_at": f"gte.{today}T00:00:00"
+                })
                 remaining_today = max(0, daily_limit - sent_today)
 
                 if remaining_today == 0:
@@ -5822,16 +6820,15 @@ async def get_auto_outreach_status():
     """
     try:
         # Buscar contas com outreach habilitado
-        accounts_resp = requests.get(
-            f"{db.base_url}/instagram_accounts",
-            headers=db.headers,
+        accounts_resp = await db.client.get(
+            "/instagram_accounts",
             params={
                 "select": "*",
                 "outreach_enabled": "eq.true",
                 "is_active": "eq.true"
             }
         )
-        accounts_response = accounts_resp.json() if accounts_resp.status_code == 200 else []
+        accounts_response = orjson.loads(accounts_resp.content) if accounts_resp.status_code == 200 else []
 
         if not accounts_response:
             return {
@@ -5843,50 +6840,39 @@ async def get_auto_outreach_status():
             }
 
         today = datetime.now().date().isoformat()
-        accounts_status = []
-        total_capacity = 0
-        total_sent = 0
 
-        for account in accounts_response:
+        async def account_counts(account: Dict) -> tuple:
+            """(enviados hoje, pendentes) da conta - dois HEAD count=exact em paralelo"""
             account_id = account.get("id")
-            daily_limit = account.get("outreach_daily_limit", 50)
-            min_icp_score = account.get("outreach_min_icp_score", 70)
-
-            # Contar enviados hoje
-            sent_resp = requests.get(
-                f"{db.base_url}/new_followers_detected",
-                headers=db.headers,
-                params={
-                    "select": "id",
+            return await asyncio.gather(
+                db.count("/new_followers_detected", {
                     "account_id": f"eq.{account_id}",
                     "outreach_status": "eq.sent",
                     "outreach_sent_at": f"gte.{today}T00:00:00"
-                }
-            )
-            sent_response = sent_resp.json() if sent_resp.status_code == 200 else []
-            sent_today = len(sent_response)
-
-            # Contar pendentes
-            pending_resp = requests.get(
-                f"{db.base_url}/new_followers_detected",
-                headers=db.headers,
-                params={
-                    "select": "id",
+                }),
+                db.count("/new_followers_detected", {
                     "account_id": f"eq.{account_id}",
                     "outreach_status": "eq.pending",
-                    "icp_score": f"gte.{min_icp_score}"
-                }
+                    "icp_score": f"gte.{account.get('outreach_min_icp_score', 70)}"
+                })
             )
-            pending_response = pending_resp.json() if pending_resp.status_code == 200 else []
-            pending_count = len(pending_response)
 
+        # Todas as contas ao mesmo tempo (o transport limita a concorrência com o Supabase)
+        counts = await asyncio.gather(*(account_counts(account) for account in accounts_response))
+
+        accounts_status = []
+        total_capacity = 0
+        total_sent = 0
+
+        for account, (sent_today, pending_count) in zip(accounts_response, counts):
+            daily_limit = account.get("outreach_daily_limit", 50)
             remaining = max(0, daily_limit - sent_today)
 
             accounts_status.append({
-                "account_id": account_id,
+                "account_id": account.get("id"),
                 "username": account.get("username"),
                 "outreach_enabled": True,
-                "min_icp_score": min_icp_score,
+                "min_icp_score": account.get("outreach_min_icp_score", 70),
                 "daily_limit": daily_limit,
                 "sent_today": sent_today,
                 "remaining_today": remaining,
@@ -5932,7 +6918,7 @@ async def cron_auto_outreach(
         max_dms: Maximo de DMs por conta por execucao
     """
     # Verificar secret
-    expected_secret = os.getenv("CRON_SECRET", "")
+    expected_secret = CRON_SECRET
     if expected_secret and secret != expected_secret:
         logger.warning(f"Tentativa de acesso ao cron com secret invalido")
         raise HTTPException(status_code=401, detail="Invalid secret")
@@ -5953,7 +6939,7 @@ async def cron_auto_outreach(
     result = await run_auto_outreach(request, bg_tasks)
 
     return {
-        "triggered_at": datetime.now().isoformat(),
+        "triggered_at": now_iso(),
         "result": {
             "success": result.success,
             "accounts_processed": result.accounts_processed,
@@ -6075,7 +7061,7 @@ async def create_instagram_account(request: CreateInstagramAccountRequest):
             is_available=account.is_available,
             remaining_today=account.remaining_today,
             remaining_this_hour=account.remaining_this_hour,
-            last_used_at=account.last_used_at.isoformat() if account.last_used_at else None,
+            last_used_at=account.last_used_at_iso,
             blocked_until=account.blocked_until.isoformat() if account.blocked_until else None
         )
 
@@ -6277,10 +7263,18 @@ if __name__ == "__main__":
 
     logger.info(f"Starting Socialfy API on {args.host}:{port}")
 
+    # Worker processes (WEB_CONCURRENCY). Default 1: rate limiter, caches, running
+    # campaigns and the browser pool live in process memory and aren't shared across workers.
+    workers = 1 if args.reload else int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    # loop/http "auto" pick uvloop + httptools when installed (uvicorn[standard])
     uvicorn.run(
         "api_server:app",
         host=args.host,
         port=port,
         reload=args.reload,
+        workers=workers,
+        loop="auto",
+        http="auto",
         log_level="info"
     )
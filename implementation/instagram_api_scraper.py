@@ -27,10 +27,13 @@ Uso:
 """
 
 import os
+import re
 import json
 import time
+import threading
 import requests
 import logging
+from http.cookiejar import DefaultCookiePolicy
 from datetime import datetime
 from typing import Dict, Optional, List
 from pathlib import Path
@@ -55,6 +58,40 @@ def _get_session_pool():
     return _session_pool
 
 
+# Sessão HTTP compartilhada entre instâncias (criada no primeiro uso)
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+
+def _get_http_session() -> requests.Session:
+    """
+    Retorna a requests.Session compartilhada por todos os scrapers.
+    Reaproveita o pool de conexões (keep-alive) com o Instagram entre requests;
+    o cookie jar é bloqueado porque cada scraper manda o próprio sessionid no header.
+    """
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                _http_session = session
+    return _http_session
+
+
+# Palavras-chave de negócio na bio (ordem = ordem dos signals; "founder" repetido conta 2x, como antes)
+BUSINESS_KEYWORDS = (
+    "ceo", "founder", "empreendedor", "empresa", "negócio",
+    "marketing", "mentor", "coach", "consultor", "agência",
+    "gestor", "diretor", "investidor", "startup", "digital",
+    "vendas", "growth", "tech", "founder", "co-founder"
+)
+# Lookahead = matches sobrepostos ("co-founder" também acha "founder"): uma varredura acha todas
+_BUSINESS_KEYWORDS_RE = re.compile(
+    "(?=(" + "|".join(map(re.escape, dict.fromkeys(BUSINESS_KEYWORDS))) + "))"
+)
+
+
 class InstagramAPIScraper:
     """
     Scraper do Instagram usando API interna + Session ID.
@@ -144,7 +181,7 @@ class InstagramAPIScraper:
             "X-Requested-With": "XMLHttpRequest",
         }
 
-        self.session = requests.Session()
+        self.session = _get_http_session()
         logger.info("InstagramAPIScraper inicializado")
 
     def _report_to_pool(
@@ -647,7 +684,8 @@ class InstagramAPIScraper:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def calculate_lead_score(self, profile: Dict) -> Dict:
+    @staticmethod
+    def calculate_lead_score(profile: Dict) -> Dict:
         """
         Calcula score do lead baseado nos dados do perfil.
 
@@ -676,16 +714,11 @@ class InstagramAPIScraper:
 
         # Score por bio keywords
         bio = (profile.get("bio") or "").lower()
-        business_keywords = [
-            "ceo", "founder", "empreendedor", "empresa", "negócio",
-            "marketing", "mentor", "coach", "consultor", "agência",
-            "gestor", "diretor", "investidor", "startup", "digital",
-            "vendas", "growth", "tech", "founder", "co-founder"
-        ]
+        found = set(_BUSINESS_KEYWORDS_RE.findall(bio))
 
         keyword_count = 0
-        for kw in business_keywords:
-            if kw in bio:
+        for kw in BUSINESS_KEYWORDS:
+            if kw in found:
                 keyword_count += 1
                 signals.append(f"keyword:{kw}")
                 if keyword_count >= 3:
@@ -29,6 +29,8 @@ from enum import Enum
 from playwright.async_api import async_playwright, Browser, Page, BrowserContext
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Stealth mode para evitar detecção de automação
 try:
@@ -271,13 +273,25 @@ class SupabaseDB:
         self.run_id: Optional[int] = None
         self.tenant_id: Optional[str] = tenant_id
 
+        # Sessões reutilizadas durante a campanha (keep-alive em vez de handshake por DM)
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=10,
+            max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 502, 503, 504])
+        )
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", adapter)
+        # GHL em sessão separada: não enviar a chave do Supabase para outro host
+        self.ghl_session = requests.Session()
+        self.ghl_session.mount("https://", adapter)
+
     def _request(self, method: str, endpoint: str, params: dict = None, data: dict = None):
         """Make request to Supabase REST API"""
         url = f"{self.base_url}/{endpoint}"
-        response = requests.request(
+        response = self.session.request(
             method=method,
             url=url,
-            headers=self.headers,
             params=params,
             json=data,
             timeout=30
@@ -385,12 +399,9 @@ class SupabaseDB:
     def get_dms_sent_today(self, account: str) -> int:
         """Get count of DMs sent today"""
         today = date.today().isoformat()
-        headers = self.headers.copy()
-        headers["Prefer"] = "count=exact"
-
-        response = requests.get(
+        response = self.session.get(
             f"{self.base_url}/agentic_instagram_dm_sent",
-            headers=headers,
+            headers={"Prefer": "count=exact"},
             params={
                 "select": "*",
                 "account_used": f"eq.{account}",
@@ -405,12 +416,9 @@ class SupabaseDB:
     def get_dms_sent_last_hour(self, account: str) -> int:
         """Get count of DMs sent in last hour"""
         one_hour_ago = (datetime.now() - timedelta(hours=1)).isoformat()
-        headers = self.headers.copy()
-        headers["Prefer"] = "count=exact"
-
-        response = requests.get(
+        response = self.session.get(
             f"{self.base_url}/agentic_instagram_dm_sent",
-            headers=headers,
+            headers={"Prefer": "count=exact"},
             params={
                 "select": "*",
                 "account_used": f"eq.{account}",
@@ -422,34 +430,55 @@ class SupabaseDB:
         return int(content_range.split("/")[1]) if "/" in content_range else 0
 
     def update_daily_stats(self, account: str, dms_sent: int, dms_failed: int):
-        """Update daily stats"""
+        """
+        Add this run's counts to today's stats row (single atomic upsert, see migration 007).
+        Without the RPC falls back to read + PATCH/POST. Errors are logged, not raised,
+        so the campaign still reaches its summary and save_session().
+        """
         today = date.today().isoformat()
+        try:
+            self._request("POST", "rpc/increment_daily_stats", data={
+                'p_date': today,
+                'p_account': account,
+                'p_dms_sent': dms_sent,
+                'p_dms_failed': dms_failed
+            })
+            return
+        except requests.HTTPError as e:
+            response = e.response
+            if response is None or not (response.status_code == 404 or "PGRST202" in response.text):
+                logger.error(f"Error updating daily stats: {e}")
+                return
+            logger.warning("increment_daily_stats RPC indisponível, atualizando via GET + PATCH/POST")
+        except Exception as e:
+            logger.error(f"Error updating daily stats: {e}")
+            return
 
-        # Try to get existing record
-        existing = self._request("GET", "agentic_instagram_daily_stats", params={
-            "select": "*",
-            "date": f"eq.{today}",
-            "account_used": f"eq.{account}"
-        })
-
-        if existing:
-            # Update existing
-            self._request("PATCH", "agentic_instagram_daily_stats",
-                params={"id": f"eq.{existing[0]['id']}"},
-                data={
-                    'dms_sent': existing[0]['dms_sent'] + dms_sent,
-                    'dms_failed': existing[0]['dms_failed'] + dms_failed
-                }
-            )
-        else:
-            # Create new
-            self._request("POST", "agentic_instagram_daily_stats", data={
-                'date': today,
-                'account_used': account,
-                'dms_sent': dms_sent,
-                'dms_failed': dms_failed
+        try:
+            existing = self._request("GET", "agentic_instagram_daily_stats", params={
+                "select": "*",
+                "date": f"eq.{today}",
+                "account_used": f"eq.{account}"
             })
 
+            if existing:
+                self._request("PATCH", "agentic_instagram_daily_stats",
+                    params={"id": f"eq.{existing[0]['id']}"},
+                    data={
+                        'dms_sent': existing[0]['dms_sent'] + dms_sent,
+                        'dms_failed': existing[0]['dms_failed'] + dms_failed
+                    }
+                )
+            else:
+                self._request("POST", "agentic_instagram_daily_stats", data={
+                    'date': today,
+                    'account_used': account,
+                    'dms_sent': dms_sent,
+                    'dms_failed': dms_failed
+                })
+        except Exception as e:
+            logger.error(f"Error updating daily stats: {e}")
+
     def sync_to_growth_leads(self, username: str, message_sent: str, lead_data: dict = None, score_data: dict = None):
         """
         Sincroniza lead prospectado para growth_leads.
@@ -576,7 +605,7 @@ class SupabaseDB:
                 "query": ig_username
             }
 
-            search_response = requests.get(search_url, headers=headers, params=search_params)
+            search_response = self.ghl_session.get(search_url, headers=headers, params=search_params, timeout=30)
 
             contact_id = None
             if search_response.status_code == 200:
@@ -605,7 +634,7 @@ class SupabaseDB:
                     ]
                 }
 
-                update_response = requests.put(update_url, headers=headers, json=update_data)
+                update_response = self.ghl_session.put(update_url, headers=headers, json=update_data, timeout=30)
 
                 if update_response.status_code in [200, 201]:
                     logger.info(f"✅ GHL Sync: Atualizado contato {contact_id} para @{username}")
@@ -631,7 +660,7 @@ class SupabaseDB:
                     ]
                 }
 
-                create_response = requests.post(create_url, headers=headers, json=create_data)
+                create_response = self.ghl_session.post(create_url, headers=headers, json=create_data, timeout=30)
 
                 if create_response.status_code in [200, 201]:
                     new_contact = create_response.json().get("contact", {})
@@ -684,11 +713,19 @@ class InstagramDMAgent:
     Now with Smart Mode: Profile Scraping + Semantic Scoring + Personalized Messages
     """
 
-    def __init__(self, headless: bool = False, smart_mode: bool = True, tenant_id: str = "DEFAULT"):
+    def __init__(self, headless: bool = False, smart_mode: bool = True, tenant_id: str = "DEFAULT",
+                 browser: Optional[Browser] = None):
+        """
+        Args:
+            browser: Browser já aberto (ex: Chromium compartilhado da API); o agente só cria
+                     o próprio context nele e não lança nem fecha o browser
+        """
         self.headless = headless
         self.smart_mode = smart_mode and SMART_MODE_AVAILABLE
         self.tenant_id = tenant_id
-        self.browser: Optional[Browser] = None
+        self.playwright = None
+        self.browser: Optional[Browser] = browser
+        self._owns_browser = browser is None
         self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
         self.db = SupabaseDB(tenant_id=tenant_id)
@@ -741,7 +778,6 @@ class InstagramDMAgent:
                     status="active",
                     daily_limit=MAX_DMS_PER_DAY,
                     hourly_limit=MAX_DMS_PER_HOUR,
-                    last_used_at=None,
                     blocked_until=None
                 )
             else:
@@ -766,31 +802,36 @@ class InstagramDMAgent:
             else:
                 logger.warning("   ⚠️ No proxy configured - using direct connection")
 
-        playwright = await async_playwright().start()
-
-        # Browser launch options
-        launch_options = {
-            'headless': self.headless,
-            'args': [
-                '--disable-blink-features=AutomationControlled',
-                '--no-sandbox',
-                '--disable-dev-shm-usage'
-            ]
-        }
-
-        # Add proxy if available
-        if self.current_proxy:
-            launch_options['proxy'] = self.current_proxy.to_playwright()
-            logger.info(f"   🔒 Browser will use proxy: {self.current_proxy.proxy_type.value}://{self.current_proxy.host}:{self.current_proxy.port}")
-
-        self.browser = await playwright.chromium.launch(**launch_options)
-
         # Browser context options
         context_options = {
             'viewport': {'width': 1280, 'height': 800},
             'user_agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
 
+        if self._owns_browser:
+            self.playwright = await async_playwright().start()
+
+            # Browser launch options
+            launch_options = {
+                'headless': self.headless,
+                'args': [
+                    '--disable-blink-features=AutomationControlled',
+                    '--no-sandbox',
+                    '--disable-dev-shm-usage'
+                ]
+            }
+
+            # Add proxy if available
+            if self.current_proxy:
+                launch_options['proxy'] = self.current_proxy.to_playwright()
+                logger.info(f"   🔒 Browser will use proxy: {self.current_proxy.proxy_type.value}://{self.current_proxy.host}:{self.current_proxy.port}")
+
+            self.browser = await self.playwright.chromium.launch(**launch_options)
+        elif self.current_proxy:
+            # Browser compartilhado: proxy vai no context (só deste agente)
+            context_options['proxy'] = self.current_proxy.to_playwright()
+            logger.info(f"   🔒 Context will use proxy: {self.current_proxy.proxy_type.value}://{self.current_proxy.host}:{self.current_proxy.port}")
+
         # Try to load session from database first (multi-tenant), then fallback to file
         session_loaded = False
         if self.current_account and self.current_account.session_data:
@@ -1744,8 +1785,11 @@ class InstagramDMAgent:
         if self.context:
             await self.save_session()
             await self.context.close()
-        if self.browser:
-            await self.browser.close()
+        if self._owns_browser:
+            if self.browser:
+                await self.browser.close()
+            if self.playwright:
+                await self.playwright.stop()
         logger.info("👋 Agent stopped")
 
 
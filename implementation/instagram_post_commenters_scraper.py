@@ -66,33 +66,22 @@ class SupabaseClient:
 
     def insert_leads(self, leads: List[Dict]) -> int:
         """Insere leads no Supabase, ignorando duplicatas"""
-        inserted = 0
-        for lead in leads:
-            try:
-                # Verificar se já existe
-                check = requests.get(
-                    f"{self.base_url}/agentic_instagram_leads",
-                    headers=self.headers,
-                    params={"username": f"eq.{lead['username']}"}
-                )
-
-                if check.json():
-                    logger.debug(f"   Lead @{lead['username']} já existe, pulando...")
-                    continue
-
-                # Inserir
-                response = requests.post(
-                    f"{self.base_url}/agentic_instagram_leads",
-                    headers=self.headers,
-                    json=lead
-                )
-                response.raise_for_status()
-                inserted += 1
-
-            except Exception as e:
-                logger.error(f"   Erro ao inserir @{lead['username']}: {e}")
-
-        return inserted
+        if not leads:
+            return 0
+        try:
+            # Um único POST em lote; ON CONFLICT (username) DO NOTHING ignora os existentes
+            response = requests.post(
+                f"{self.base_url}/agentic_instagram_leads",
+                headers={**self.headers, "Prefer": "resolution=ignore-duplicates,return=representation"},
+                params={"on_conflict": "username"},
+                json=leads
+            )
+            response.raise_for_status()
+            # Só as linhas realmente inseridas voltam na resposta
+            return len(response.json())
+        except Exception as e:
+            logger.error(f"   Erro ao inserir {len(leads)} leads: {e}")
+            return 0
 
 
 class PostCommentersScraper:
@@ -101,23 +90,45 @@ class PostCommentersScraper:
     Também captura o conteúdo do comentário para personalização!
     """
 
-    def __init__(self, headless: bool = False):
+    def __init__(self, headless: bool = False, context: Optional[BrowserContext] = None,
+                 cdp_url: Optional[str] = None):
+        """
+        Args:
+            headless: Rodar sem interface gráfica (ignorado se context for passado)
+            context: BrowserContext já aberto (ex: pool do BrowserManager da API);
+                     nesse caso o scraper não lança nem fecha seu próprio browser
+            cdp_url: Endpoint CDP de um Chromium já rodando (ex: http://127.0.0.1:9222,
+                     ver BROWSER_CDP_URL); conecta nele em vez de lançar outro browser
+        """
         self.headless = headless
+        self.cdp_url = cdp_url or os.getenv("BROWSER_CDP_URL")
+        self.playwright = None
         self.browser = None
-        self.context: Optional[BrowserContext] = None
+        self.context: Optional[BrowserContext] = context
         self.page: Optional[Page] = None
+        self._owns_context = context is None
         self.db = SupabaseClient()
 
     async def start(self):
         """Inicializa o browser"""
+        if not self._owns_context:
+            # Contexto emprestado: só precisamos de uma página
+            self.page = self.context.pages[0] if self.context.pages else await self.context.new_page()
+            return
+
         logger.info("🚀 Iniciando scraper de comentários...")
 
-        playwright = await async_playwright().start()
+        self.playwright = await async_playwright().start()
 
-        self.browser = await playwright.chromium.launch(
-            headless=self.headless,
-            args=['--disable-blink-features=AutomationControlled']
-        )
+        if self.cdp_url:
+            # Reusar o Chromium compartilhado (sem cold start)
+            logger.info(f"🔌 Conectando ao browser via CDP: {self.cdp_url}")
+            self.browser = await self.playwright.chromium.connect_over_cdp(self.cdp_url)
+        else:
+            self.browser = await self.playwright.chromium.launch(
+                headless=self.headless,
+                args=['--disable-blink-features=AutomationControlled']
+            )
 
         context_options = {
             'viewport': {'width': 1280, 'height': 800},
@@ -317,10 +328,16 @@ class PostCommentersScraper:
 
     async def stop(self):
         """Fecha o browser"""
+        if not self._owns_context:
+            # O dono do contexto (BrowserManager) cuida de fechar/devolver
+            return
         if self.context:
             await self.context.close()
         if self.browser:
+            # Em conexão CDP isso só desconecta; o browser compartilhado continua rodando
             await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
         logger.info("👋 Scraper finalizado")
 
 
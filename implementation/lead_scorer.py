@@ -9,6 +9,7 @@ Suporta configuracao por tenant via tabela tenant_icp_config no Supabase.
 
 import os
 import re
+import threading
 import httpx
 from dataclasses import dataclass
 from typing import Optional, List, Dict, Any
@@ -135,6 +136,25 @@ DEFAULT_HIGH_VALUE_LOCATIONS = [
 # Cache de configs por tenant (evita queries repetidas)
 _config_cache: Dict[str, TenantICPConfig] = {}
 
+# Cliente HTTP/2 compartilhado (pool keep-alive em vez de um handshake TLS por fetch)
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+
+
+def _get_http_client(base_url: str, headers: Dict[str, str]) -> httpx.Client:
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    base_url=base_url,
+                    headers=headers,
+                    timeout=10.0,
+                    http2=True,
+                    limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
+                )
+    return _http_client
+
 
 def _fetch_tenant_config(tenant_id: str) -> Optional[Dict]:
     """Busca configuracao do tenant no Supabase."""
@@ -145,33 +165,38 @@ def _fetch_tenant_config(tenant_id: str) -> Optional[Dict]:
         return None
 
     try:
-        headers = {
-            "apikey": supabase_key,
-            "Authorization": f"Bearer {supabase_key}",
-            "Content-Type": "application/json"
-        }
+        client = _get_http_client(
+            f"{supabase_url}/rest/v1",
+            {
+                "apikey": supabase_key,
+                "Authorization": f"Bearer {supabase_key}",
+                "Content-Type": "application/json"
+            }
+        )
 
         # Buscar config do tenant especifico
-        url = f"{supabase_url}/rest/v1/tenant_icp_config?tenant_id=eq.{tenant_id}&select=*"
+        response = client.get(
+            "/tenant_icp_config",
+            params={"tenant_id": f"eq.{tenant_id}", "select": "*"}
+        )
+
+        if response.status_code == 200:
+            data = response.json()
+            if data and len(data) > 0:
+                return data[0]
 
-        with httpx.Client(timeout=10.0) as client:
-            response = client.get(url, headers=headers)
+        # Se nao encontrou, buscar DEFAULT
+        if tenant_id != "DEFAULT":
+            response = client.get(
+                "/tenant_icp_config",
+                params={"tenant_id": "eq.DEFAULT", "select": "*"}
+            )
 
             if response.status_code == 200:
                 data = response.json()
                 if data and len(data) > 0:
                     return data[0]
 
-            # Se nao encontrou, buscar DEFAULT
-            if tenant_id != "DEFAULT":
-                url_default = f"{supabase_url}/rest/v1/tenant_icp_config?tenant_id=eq.DEFAULT&select=*"
-                response = client.get(url_default, headers=headers)
-
-                if response.status_code == 200:
-                    data = response.json()
-                    if data and len(data) > 0:
-                        return data[0]
-
     except Exception as e:
         print(f"[LeadScorer] Erro ao buscar config do tenant {tenant_id}: {e}")
 
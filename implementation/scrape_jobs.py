@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Scrape Jobs
+===========
+Post likers / commenters scrape routines shared by the API server
+(in-process fallback) and the arq worker (scrape_worker.py).
+
+Each routine receives an already open Playwright BrowserContext, so the
+caller decides where the browser comes from (API context pool, worker
+browser connected over CDP, ...).
+"""
+
+import hashlib
+import logging
+from typing import Optional
+
+logger = logging.getLogger("ScrapeJobs")
+
+
+def scrape_job_id(kind: str, tenant_id: Optional[str], post_url: str) -> str:
+    """
+    Stable job id per tenant + post, so the same post is not queued twice.
+    Uses sha1 (not hash()) because the id must match across processes.
+    """
+    digest = hashlib.sha1(post_url.encode("utf-8")).hexdigest()[:16]
+    return f"{kind}:{tenant_id or 'default'}:{digest}"
+
+
+async def run_likers_scrape(context, post_url: str, limit: int = 200, save_to_db: bool = True) -> int:
+    """Scrape likers of a post and save them to agentic_instagram_leads"""
+    from instagram_post_likers_scraper import PostLikersScraper
+
+    scraper = PostLikersScraper(headless=True, context=context)
+    await scraper.start()
+    try:
+        if not await scraper.verify_login():
+            return 0
+
+        likers = await scraper.scrape_likers(post_url, limit=limit)
+
+        if save_to_db:
+            await scraper.save_to_supabase(likers)
+
+        logger.info(f"Scraped {len(likers)} likers")
+        return len(likers)
+    finally:
+        await scraper.stop()
+
+
+async def run_post_likers_scrape(context, post_url: str, max_likers: int = 50, save_to_db: bool = True) -> int:
+    """Scrape likers of a post and save them as discovered leads (crm_leads)"""
+    from instagram_post_likers_scraper import PostLikersScraper
+    from supabase_integration import get_integration
+
+    scraper = PostLikersScraper(headless=True, context=context)
+    await scraper.start()
+    try:
+        if not await scraper.verify_login():
+            return 0
+
+        # Scrape likers
+        likers = await scraper.scrape_likers(post_url, limit=max_likers)
+
+        logger.info(f"Scraped {len(likers)} likers from post")
+
+        # Save to Supabase if requested
+        if save_to_db:
+            integration = get_integration()
+
+            # Save all likers as leads in a single request
+            leads = [
+                {
+                    "name": liker.get("full_name") or liker.get("username"),
+                    "email": f"{liker.get('username')}@instagram.com",  # Placeholder
+                    "source": "post_like",
+                    "profile_data": {
+                        "username": liker.get("username"),
+                        "bio": liker.get("bio"),
+                        "followers_count": liker.get("followers_count", 0),
+                        "is_verified": liker.get("is_verified", False),
+                        "is_private": liker.get("is_private", False),
+                        "source_url": post_url
+                    }
+                }
+                for liker in likers
+            ]
+            saved_count = len(integration.save_discovered_leads(leads))
+
+            logger.info(f"Saved {saved_count}/{len(likers)} likers to Supabase")
+
+        return len(likers)
+    finally:
+        await scraper.stop()
+
+
+async def run_commenters_scrape(context, post_url: str, limit: int = 100, save_to_db: bool = True) -> int:
+    """Scrape commenters of a post and save them to agentic_instagram_leads"""
+    from instagram_post_commenters_scraper import PostCommentersScraper
+
+    scraper = PostCommentersScraper(headless=True, context=context)
+    await scraper.start()
+    try:
+        if not await scraper.verify_login():
+            return 0
+
+        commenters = await scraper.scrape_commenters(post_url, limit=limit)
+
+        if save_to_db:
+            await scraper.save_to_supabase(commenters)
+
+        logger.info(f"Scraped {len(commenters)} commenters")
+        return len(commenters)
+    finally:
+        await scraper.stop()
+
+
+# Job name -> routine (job names are the arq function names in scrape_worker.py)
+SCRAPE_JOBS = {
+    "scrape_likers": run_likers_scrape,
+    "scrape_post_likers": run_post_likers_scrape,
+    "scrape_commenters": run_commenters_scrape,
+}
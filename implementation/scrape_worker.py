@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Scrape Worker (arq)
+===================
+Processes the scrape jobs the API server enqueues on Redis
+(/webhook/scrape-likers, /webhook/scrape-post-likers, /webhook/scrape-commenters),
+so Playwright work runs outside the API process with a concurrency cap and retries.
+
+One browser per worker: connects to the API's shared Chromium over CDP when
+BROWSER_CDP_URL is set (requires BROWSER_CDP_PORT on the API server, off by
+default), otherwise launches its own. Each job gets a fresh
+BrowserContext loaded with the saved Instagram session.
+
+Usage:
+    cd implementation
+    REDIS_URL=redis://localhost:6379 arq scrape_worker.WorkerSettings
+"""
+
+import os
+import json
+import logging
+from pathlib import Path
+
+from arq import Retry
+from arq.connections import RedisSettings
+from dotenv import load_dotenv
+
+from scrape_jobs import run_likers_scrape, run_post_likers_scrape, run_commenters_scrape
+
+load_dotenv(override=False)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s | %(levelname)s | %(message)s'
+)
+logger = logging.getLogger("ScrapeWorker")
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+BROWSER_CDP_URL = os.getenv("BROWSER_CDP_URL")
+SCRAPE_WORKER_MAX_JOBS = int(os.getenv("SCRAPE_WORKER_MAX_JOBS", "4"))
+SCRAPE_JOB_MAX_TRIES = 3
+# Finished job results are kept this long (seconds); while kept, the same post
+# (same job id) can't be queued again, so keep it short (arq default is 1h)
+SCRAPE_JOB_KEEP_RESULT = int(os.getenv("SCRAPE_JOB_KEEP_RESULT", "60"))
+SESSION_PATH = Path(__file__).parent.parent / "sessions" / "instagram_session.json"
+
+
+async def startup(ctx):
+    """Start Playwright and the worker's browser"""
+    from playwright.async_api import async_playwright
+
+    ctx["playwright"] = await async_playwright().start()
+    if BROWSER_CDP_URL:
+        logger.info(f"Connecting to shared browser via CDP: {BROWSER_CDP_URL}")
+        ctx["browser"] = await ctx["playwright"].chromium.connect_over_cdp(BROWSER_CDP_URL)
+    else:
+        ctx["browser"] = await ctx["playwright"].chromium.launch(
+            headless=True,
+            args=['--disable-blink-features=AutomationControlled']
+        )
+    logger.info("Scrape worker ready")
+
+
+async def shutdown(ctx):
+    """Close the browser (only disconnects when attached over CDP)"""
+    if ctx.get("browser"):
+        await ctx["browser"].close()
+    if ctx.get("playwright"):
+        await ctx["playwright"].stop()
+    logger.info("Scrape worker stopped")
+
+
+async def _run(ctx, routine, *args) -> int:
+    """Run a scrape routine in a fresh context; failed jobs are retried with backoff"""
+    context_options = {
+        'viewport': {'width': 1280, 'height': 800},
+        'user_agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+    }
+    if SESSION_PATH.exists():
+        try:
+            context_options['storage_state'] = json.loads(SESSION_PATH.read_text())
+        except Exception as e:
+            logger.warning(f"Could not load session: {e}")
+
+    context = await ctx["browser"].new_context(**context_options)
+    try:
+        return await routine(context, *args)
+    except Exception as e:
+        job_try = ctx.get("job_try", 1)
+        if job_try < SCRAPE_JOB_MAX_TRIES:
+            logger.warning(f"{routine.__name__} failed (try {job_try}), retrying: {e}")
+            raise Retry(defer=job_try * 30)
+        logger.error(f"{routine.__name__} failed after {job_try} tries: {e}", exc_info=True)
+        raise
+    finally:
+        await context.close()
+
+
+async def scrape_likers(ctx, post_url: str, limit: int = 200, save_to_db: bool = True) -> int:
+    return await _run(ctx, run_likers_scrape, post_url, limit, save_to_db)
+
+
+async def scrape_post_likers(ctx, post_url: str, max_likers: int = 50, save_to_db: bool = True) -> int:
+    return await _run(ctx, run_post_likers_scrape, post_url, max_likers, save_to_db)
+
+
+async def scrape_commenters(ctx, post_url: str, limit: int = 100, save_to_db: bool = True) -> int:
+    return await _run(ctx, run_commenters_scrape, post_url, limit, save_to_db)
+
+
+class WorkerSettings:
+    functions = [scrape_likers, scrape_post_likers, scrape_commenters]
+    on_startup = startup
+    on_shutdown = shutdown
+    redis_settings = RedisSettings.from_dsn(REDIS_URL)
+    max_jobs = SCRAPE_WORKER_MAX_JOBS
+    max_tries = SCRAPE_JOB_MAX_TRIES
+    job_timeout = 900
+    keep_result = SCRAPE_JOB_KEEP_RESULT
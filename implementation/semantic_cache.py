@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Semantic Response Cache
+=======================
+Cache das respostas sugeridas pelo Gemini no webhook de DM inbound.
+
+Muitas DMs são quase iguais ("oi", "quanto custa?", "me conta mais"), então a
+resposta gerada para uma serve para as parecidas. A mensagem é convertida em
+embedding e comparada (cosine, pgvector) com as já respondidas do mesmo tenant,
+score bucket e tipo de conta; acima do threshold a resposta salva é reutilizada
+e o Gemini não é chamado.
+
+A resposta é salva despersonalizada: @username e nome do lead viram
+placeholders, preenchidos com os dados do novo lead no hit.
+
+Tabela e RPC: database/migrations/005_dm_response_cache.sql
+"""
+
+import re
+import logging
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger("SemanticCache")
+
+DEFAULT_THRESHOLD = 0.92
+
+# Names shorter than this aren't replaced (too likely to be a common word)
+_MIN_NAME_LENGTH = 3
+
+
+def score_bucket(score: int) -> int:
+    """Score 0-100 -> bucket 0-5 (leads de nível parecido compartilham respostas)"""
+    return max(0, min(int(score or 0), 100)) // 20
+
+
+def _lead_names(username: str, full_name: Optional[str]) -> List[Tuple[str, str]]:
+    """(placeholder, value) pairs for this lead, longest value first, without repeated values"""
+    full_name = (full_name or "").strip() or username
+    pairs = {}
+    for placeholder, value in (
+        ("[[username]]", username),
+        ("[[full_name]]", full_name),
+        ("[[first_name]]", full_name.split()[0]),
+    ):
+        # Single-word name: first_name == full_name, keep only the first placeholder
+        pairs.setdefault(value, placeholder)
+    return sorted(((p, v) for v, p in pairs.items()), key=lambda pair: len(pair[1]), reverse=True)
+
+
+def depersonalize(text: str, username: str, full_name: Optional[str]) -> str:
+    """
+    Replace the lead's username / name in a generated reply with placeholders.
+    Whole words only ("Mar" doesn't touch "Marketing"); the full name goes
+    before the first name, so only standalone first names are left for it.
+    """
+    for placeholder, value in _lead_names(username, full_name):
+        if len(value) >= _MIN_NAME_LENGTH:
+            text = re.sub(rf"(?<!\w){re.escape(value)}(?!\w)", placeholder, text)
+    return text
+
+
+def personalize(text: str, username: str, full_name: Optional[str]) -> str:
+    """Fill the placeholders of a cached reply with the current lead's data"""
+    full_name = (full_name or "").strip() or username
+    for placeholder, value in (
+        ("[[username]]", username),
+        ("[[full_name]]", full_name),
+        ("[[first_name]]", full_name.split()[0]),
+    ):
+        text = text.replace(placeholder, value)
+    return text
+
+
+class SemanticResponseCache:
+    """Lookup/store of suggested responses by message embedding (Supabase pgvector)"""
+
+    _TABLE = "/dm_response_cache"
+    _MATCH_RPC = "/rpc/match_dm_response"
+
+    def __init__(self, db, threshold: float = DEFAULT_THRESHOLD):
+        # db: SupabaseClient do api_server (usa o httpx.AsyncClient dele)
+        self.db = db
+        self.threshold = threshold
+
+    async def lookup(self, tenant_id: str, embedding: List[float], score: int, is_business: bool) -> Optional[str]:
+        """
+        Return a cached (depersonalized) response of this tenant for a similar
+        message, or None on miss/error. Fill it in with personalize().
+        """
+        try:
+            response = await self.db.client.post(
+                self._MATCH_RPC,
+                json={
+                    "query_embedding": embedding,
+                    "p_tenant_id": tenant_id,
+                    "p_score_bucket": score_bucket(score),
+                    "p_is_business": bool(is_business),
+                    "match_threshold": self.threshold
+                }
+            )
+            if response.status_code != 200:
+                logger.warning(f"Semantic cache lookup failed: {response.status_code} - {response.text}")
+                return None
+            rows = response.json()
+            if not rows:
+                return None
+            logger.info(f"Semantic cache hit (similarity {rows[0]['similarity']:.3f})")
+            return rows[0]["response"]
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup error: {e}")
+            return None
+
+    async def store(self, tenant_id: str, message: str, embedding: List[float], score: int,
+                    is_business: bool, response_text: str):
+        """Save a generated response (already depersonalized) so similar messages of the tenant can reuse it"""
+        try:
+            response = await self.db.client.post(
+                self._TABLE,
+                headers={"Prefer": "return=minimal"},
+                json={
+                    "tenant_id": tenant_id,
+                    "message": message,
+                    "embedding": embedding,
+                    "score_bucket": score_bucket(score),
+                    "is_business": bool(is_business),
+                    "response": response_text
+                }
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Semantic cache store error: {e}")
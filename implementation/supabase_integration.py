@@ -15,6 +15,7 @@ Tables Mapping:
 
 import os
 import logging
+import threading
 import requests
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any
@@ -42,18 +43,23 @@ class SupabaseClient:
             'Content-Type': 'application/json',
             'Prefer': 'return=representation'
         }
+        # Keep-alive session (one connection pool per client); headers set once here,
+        # calls that need another Prefer only pass that delta
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
 
         logger.info(f"SupabaseClient initialized: {self.url}")
 
-    def _request(self, method: str, table: str, params: Dict = None, data: Any = None) -> Dict:
-        """Make a request to Supabase REST API"""
+    def _request(self, method: str, table: str, params: Dict = None, data: Any = None,
+                 headers: Dict = None) -> Dict:
+        """Make a request to Supabase REST API (headers: per-call overrides only)"""
         url = f"{self.url}/rest/v1/{table}"
 
         try:
-            response = requests.request(
+            response = self.session.request(
                 method=method,
                 url=url,
-                headers=self.headers,
+                headers=headers,
                 params=params,
                 json=data,
                 timeout=30
@@ -77,10 +83,45 @@ class SupabaseClient:
         """Insert a new lead into crm_leads"""
         return self._request('POST', 'crm_leads', data=lead_data)
 
+    def insert_leads(self, leads: List[Dict]) -> List[Dict]:
+        """
+        Insert many leads into crm_leads, one request per distinct set of keys
+        (PostgREST bulk insert expects every object to carry the same keys, and
+        padding with nulls would override column defaults).
+        A request that fails (ex: one duplicate email) is retried row by row so the
+        rest still lands. Returns the created rows.
+        """
+        groups: Dict[frozenset, List[Dict]] = {}
+        for lead in leads:
+            groups.setdefault(frozenset(lead), []).append(lead)
+
+        created = []
+        for rows in groups.values():
+            result = self._request('POST', 'crm_leads', data=rows)
+            if isinstance(result, list):
+                created.extend(result)
+                continue
+            if len(rows) == 1:
+                continue
+            logger.warning(f"Bulk insert of {len(rows)} leads failed, retrying one by one")
+            for row in rows:
+                result = self._request('POST', 'crm_leads', data=row)
+                if isinstance(result, list):
+                    created.extend(result)
+        return created
+
+    def insert_lead_with_message(self, lead_data: Dict, message_data: Dict) -> Dict:
+        """Insert a lead and its first message in a single request (RPC insert_lead_with_message)"""
+        return self._request('POST', 'rpc/insert_lead_with_message', data={
+            'lead': lead_data,
+            'message': message_data
+        })
+
     def upsert_lead(self, lead_data: Dict) -> Dict:
         """Upsert a lead (update if exists)"""
-        headers = {**self.headers, 'Prefer': 'resolution=merge-duplicates,return=representation'}
-        return self._request('POST', 'crm_leads', data=lead_data)
+        return self._request('POST', 'crm_leads', data=lead_data, headers={
+            'Prefer': 'resolution=merge-duplicates,return=representation'
+        })
 
     def get_lead_by_email(self, email: str) -> Optional[Dict]:
         """Get a lead by email"""
@@ -280,6 +321,34 @@ class SocialfyAgentIntegration:
         - instagram_dm, instagram_like, instagram_comment, instagram_follower
         - linkedin, website, referral, etc.
         """
+        return self.db.insert_lead(self._discovered_lead_row(name, email, source, profile_data))
+
+    def save_discovered_leads(self, leads: List[Dict]) -> List[Dict]:
+        """
+        Bulk version of save_discovered_lead (see SupabaseClient.insert_leads).
+        Each item has the same keys as save_discovered_lead's arguments
+        (name, email, source, profile_data). Returns the created rows.
+        """
+        rows = [
+            self._discovered_lead_row(lead['name'], lead['email'], lead['source'], lead.get('profile_data'))
+            for lead in leads
+        ]
+        return self.db.insert_leads(rows)
+
+    def save_discovered_lead_with_message(self, name: str, email: str, source: str,
+                                          profile_data: Dict = None, message: str = None) -> Dict:
+        """
+        save_discovered_lead + save_received_message in one round-trip.
+        Returns the created crm_leads row(s), like save_discovered_lead.
+        """
+        lead_row = self._discovered_lead_row(name, email, source, profile_data)
+        if not message:
+            return self.db.insert_lead(lead_row)
+        return self.db.insert_lead_with_message(lead_row, self._received_message_row(None, message))
+
+    @staticmethod
+    def _discovered_lead_row(name: str, email: str, source: str, profile_data: Dict = None) -> Dict:
+        """Build the crm_leads row for a discovered lead"""
         profile_data = profile_data or {}
 
         # Calculate status from score (valid: pending, viewed, engaged, hot, won, lost)
@@ -303,8 +372,7 @@ class SocialfyAgentIntegration:
             'created_at': datetime.now(timezone.utc).isoformat()
         }
         # Remove None values
-        lead_data = {k: v for k, v in lead_data.items() if v is not None}
-        return self.db.insert_lead(lead_data)
+        return {k: v for k, v in lead_data.items() if v is not None}
 
     def save_instagram_lead(self, instagram_data: Dict) -> Dict:
         """
@@ -460,13 +528,18 @@ class SocialfyAgentIntegration:
     # InboxMonitor Agent
     def save_received_message(self, lead_id: str, message: str) -> Dict:
         """Save a received message"""
-        return self.db.insert_message({
+        return self.db.insert_message(self._received_message_row(lead_id, message))
+
+    @staticmethod
+    def _received_message_row(lead_id: Optional[str], message: str) -> Dict:
+        """Build the socialfy_messages row for an inbound message"""
+        return {
             'lead_id': lead_id,
             'channel': 'instagram',
             'direction': 'inbound',
             'content': message,
             'status': 'received'
-        })
+        }
 
     # LeadClassifier Agent
     def save_classification(self, lead_id: str, classification: str, analysis: Dict) -> Dict:
@@ -498,6 +571,24 @@ class SocialfyAgentIntegration:
         })
 
 
+# Shared integration (created on first use, reused by the API server and the scrape worker)
+_integration: Optional[SocialfyAgentIntegration] = None
+_integration_lock = threading.Lock()
+
+
+def get_integration() -> SocialfyAgentIntegration:
+    """
+    Return the shared SocialfyAgentIntegration.
+    It holds no per-request state, so one instance (and its keep-alive session) serves every caller.
+    """
+    global _integration
+    if _integration is None:
+        with _integration_lock:
+            if _integration is None:
+                _integration = SocialfyAgentIntegration()
+    return _integration
+
+
 # ===========================================
 # TEST CONNECTION
 # ===========================================
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Teste do cache semântico de respostas (implementation/semantic_cache.py).
+Usa um client fake no lugar do Supabase: store() grava em memória e a RPC
+match_dm_response devolve a resposta mais parecida (cosine) do mesmo tenant/bucket.
+"""
+import sys
+import os
+import math
+import asyncio
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'implementation'))
+
+from semantic_cache import SemanticResponseCache, depersonalize, personalize
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, data=None):
+        self.status_code = status_code
+        self._data = data
+        self.text = str(data)
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeSupabase:
+    """Mimics dm_response_cache + match_dm_response over db.client.post"""
+
+    def __init__(self):
+        self.rows = []
+        self.client = self
+
+    async def post(self, path, json=None, headers=None):
+        if path == SemanticResponseCache._TABLE:
+            self.rows.append(json)
+            return FakeResponse(201)
+
+        best = None
+        for row in self.rows:
+            if (row["tenant_id"], row["score_bucket"], row["is_business"]) != (
+                json["p_tenant_id"], json["p_score_bucket"], json["p_is_business"]
+            ):
+                continue
+            similarity = cosine(row["embedding"], json["query_embedding"])
+            if best is None or similarity > best["similarity"]:
+                best = {"id": len(self.rows), "response": row["response"], "similarity": similarity}
+        if best is None or best["similarity"] < json["match_threshold"]:
+            return FakeResponse(200, [])
+        return FakeResponse(200, [best])
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    return dot / (math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b)))
+
+
+def test_store_then_lookup():
+    db = FakeSupabase()
+    cache = SemanticResponseCache(db, threshold=0.9)
+    embedding = [0.1, 0.7, 0.2]
+    reply = "Oi Maria! Vi que você trabalha com Marketing, @maria.souza, posso te mostrar?"
+
+    async def run():
+        await cache.store(
+            "tenant-a", "quanto custa?", embedding, 55, False,
+            depersonalize(reply, "maria.souza", "Maria Souza")
+        )
+        hit = await cache.lookup("tenant-a", [0.1, 0.69, 0.21], 58, False)
+        other_tenant = await cache.lookup("tenant-b", embedding, 55, False)
+        other_bucket = await cache.lookup("tenant-a", embedding, 95, False)
+        return hit, other_tenant, other_bucket
+
+    hit, other_tenant, other_bucket = asyncio.run(run())
+
+    assert len(db.rows) == 1
+    assert "Maria" not in db.rows[0]["response"]
+    assert other_tenant is None
+    assert other_bucket is None
+    assert personalize(hit, "joao.silva", "João Silva") == (
+        "Oi João! Vi que você trabalha com Marketing, @joao.silva, posso te mostrar?"
+    )
+
+
+def test_depersonalize_whole_words_only():
+    text = depersonalize("Mar, Marcos Lima e Marketing", "mar_lima", "Mar Lima")
+    assert text == "[[first_name]], Marcos Lima e Marketing"
+
+    text = depersonalize("Oi Ana Paula! Ana, tudo bem?", "anapaula", "Ana Paula")
+    assert text == "Oi [[full_name]]! [[first_name]], tudo bem?"
+
+
+if __name__ == "__main__":
+    test_store_then_lookup()
+    test_depersonalize_whole_words_only()
+    print("✅ semantic cache OK")